@@ -1,19 +1,46 @@
 # Clientes para interagir com APIs de IA externas (ex: OpenAI, Google Gemini).
 import requests
 import os
+import asyncio
 
 class BaseIAClient:
     """Classe base para clientes de IA."""
+    # Os clientes de modelos locais (ex: LocalIAInterface, Ollama) não precisam de API key.
+    requires_api_key = True
+
     def __init__(self, api_key=None, model_name=None):
         self.api_key = api_key or os.getenv("DEFAULT_IA_API_KEY")
         self.model_name = model_name
-        if not self.api_key and not isinstance(self, LocalIAInterface): # LocalIAInterface não precisa de API key
+        if not self.api_key and self.requires_api_key:
             print(f"Aviso: API Key não fornecida para {self.__class__.__name__} e DEFAULT_IA_API_KEY não definida.")
 
+    @property
+    def configured(self):
+        """Indica se o cliente tem o necessário (ex: API key) para fazer chamadas."""
+        return bool(self.api_key) or not self.requires_api_key
+
+    @property
+    def healthy(self):
+        """Falso enquanto o fornecedor estiver marcado como indisponível."""
+        return True
+
     def generate_text(self, prompt, max_tokens=150):
         """Gera texto com base num prompt."""
         raise NotImplementedError("Este método deve ser implementado pela subclasse.")
 
+    async def generate_text_async(self, prompt, max_tokens=None, temperature=None, top_p=None, timeout=None, use_cache=True):
+        """
+        Variante assíncrona de generate_text. Por omissão corre generate_text num executor;
+        os clientes assíncronos substituem-na.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.generate_text, prompt, max_tokens or 150)
+
+    async def stream_text_async(self, prompt, max_tokens=None, temperature=None, top_p=None, timeout=None, use_cache=True):
+        """Gera texto em fragmentos; por omissão entrega a resposta completa de uma vez."""
+        yield await self.generate_text_async(prompt, max_tokens=max_tokens, temperature=temperature,
+                                             top_p=top_p, timeout=timeout, use_cache=use_cache)
+
     def analyze_text(self, text, analysis_type="sentiment"):
         """Analisa texto para um determinado tipo de análise."""
         raise NotImplementedError("Este método deve ser implementado pela subclasse.")
@@ -0,0 +1,174 @@
+# Cliente assíncrono partilhado para a API do Google Gemini.
+import os
+import json
+import asyncio
+import importlib.util
+from contextlib import nullcontext
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+
+from apis.provider_guard import ProviderGuard
+from config import settings
+from core.llm_response_cache import CachedText, LLMResponseCache, llm_cache_key
+
+# HTTP/2 só é usado se o pacote opcional `h2` estiver instalado (pip install httpx[http2]).
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class GeminiClient:
+    """
+    Cliente da API do Gemini com um pool de ligações partilhado.
+
+    Todas as chamadas reutilizam o mesmo httpx.AsyncClient (keep-alive e, se disponível,
+    HTTP/2), criado na primeira utilização dentro do event loop; não ocupam threads do
+    executor. Os limites de ligações e os timeouts vêm de config/settings.py.
+    Com um LLMResponseCache, um pedido idêntico a um anterior é respondido do cache; com um
+    ProviderGuard, os pedidos à API respeitam a quota, são repetidos em erros transitórios e
+    falham logo (ProviderUnavailableError) enquanto o fornecedor estiver indisponível.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, model: str = settings.GEMINI_MODEL,
+                 base_url: str = settings.GEMINI_API_BASE_URL,
+                 max_connections: int = settings.GEMINI_MAX_CONNECTIONS,
+                 max_keepalive_connections: int = settings.GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+                 connect_timeout: float = settings.GEMINI_CONNECT_TIMEOUT,
+                 read_timeout: float = settings.GEMINI_READ_TIMEOUT,
+                 transport: Optional[httpx.AsyncBaseTransport] = None,
+                 cache: Optional[LLMResponseCache] = None,
+                 guard: Optional[ProviderGuard] = None):
+        self.api_key = api_key if api_key is not None else os.getenv("GEMINI_API_KEY")
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive_connections,
+                                   keepalive_expiry=settings.GEMINI_KEEPALIVE_EXPIRY)
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.transport = transport
+        self.cache = cache
+        self.guard = guard
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    @property
+    def healthy(self) -> bool:
+        """Falso enquanto o disjuntor do fornecedor estiver aberto (as chamadas falhariam logo)."""
+        return self.guard is None or self.guard.available
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Devolve o cliente HTTP do event loop atual, criando-o na primeira utilização."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            # As ligações de um cliente pertencem ao loop onde foram abertas.
+            self._client = httpx.AsyncClient(base_url=self.base_url, http2=HTTP2_AVAILABLE,
+                                             limits=self.limits, timeout=self.timeout, transport=self.transport,
+                                             headers={"x-goog-api-key": self.api_key or ""})
+            self._client_loop = loop
+        return self._client
+
+    async def generate_content(self, payload: Dict[str, Any], timeout: Optional[float] = None,
+                               use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Envia um pedido generateContent e devolve a resposta JSON.
+
+        Args:
+            use_cache: Com False o pedido vai sempre à API e a resposta não é guardada
+                       (p. ex. para gerações com temperatura alta que devem variar).
+
+        Raises:
+            httpx.HTTPError: em erros de ligação, timeout ou resposta HTTP de erro.
+            ProviderUnavailableError: se o disjuntor do fornecedor estiver aberto.
+        """
+        result, _from_cache = await self._generate_content(payload, timeout, use_cache)
+        return result
+
+    async def _generate_content(self, payload: Dict[str, Any], timeout: Optional[float],
+                                use_cache: bool) -> Tuple[Dict[str, Any], bool]:
+        """generate_content, indicando também se a resposta veio do cache."""
+        cache_key = llm_cache_key(self.model, payload) if self.cache is not None and use_cache else None
+        if cache_key is not None:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                return cached, True
+
+        request_timeout = httpx.Timeout(timeout, connect=self.timeout.connect) if timeout else self.timeout
+
+        async def post() -> Dict[str, Any]:
+            response = await self._get_client().post(f"/models/{self.model}:generateContent", json=payload,
+                                                     timeout=request_timeout)
+            response.raise_for_status()
+            return response.json()
+
+        result = await (self.guard.call(post) if self.guard is not None else post())
+        if cache_key is not None and result.get("candidates"):
+            await self.cache.put(cache_key, result)
+        return result, False
+
+    @staticmethod
+    def _text_payload(prompt: str, generation_config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"contents": [{"parts": [{"text": prompt}]}]}
+        if generation_config:
+            payload["generationConfig"] = generation_config
+        return payload
+
+    async def generate_text(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                            timeout: Optional[float] = None, use_cache: bool = True) -> str:
+        """Gera texto para um prompt e devolve o texto do primeiro candidato (um CachedText, se veio do cache)."""
+        result, from_cache = await self._generate_content(self._text_payload(prompt, generation_config),
+                                                          timeout, use_cache)
+        text = result['candidates'][0]['content']['parts'][0]['text']
+        return CachedText(text) if from_cache else text
+
+    async def stream_text(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                          timeout: Optional[float] = None, use_cache: bool = True) -> AsyncIterator[str]:
+        """
+        Gera texto para um prompt, entregando cada fragmento assim que o modelo o produz
+        (streamGenerateContent com server-sent events).
+
+        Uma resposta em cache é entregue de uma vez, como CachedText; uma resposta completa é guardada no
+        cache com a mesma chave de generate_text. Se o consumidor abandonar o gerador (p. ex.
+        o cliente desligou), o pedido ao fornecedor é fechado.
+
+        Raises:
+            httpx.HTTPError: em erros de ligação, timeout ou resposta HTTP de erro.
+            ProviderUnavailableError: se o disjuntor do fornecedor estiver aberto.
+        """
+        payload = self._text_payload(prompt, generation_config)
+        cache_key = llm_cache_key(self.model, payload) if self.cache is not None and use_cache else None
+        if cache_key is not None:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                yield CachedText(cached['candidates'][0]['content']['parts'][0]['text'])
+                return
+
+        request_timeout = httpx.Timeout(timeout, connect=self.timeout.connect) if timeout else self.timeout
+        fragments = []
+        async with (self.guard.session() if self.guard is not None else nullcontext()):
+            async with self._get_client().stream("POST", f"/models/{self.model}:streamGenerateContent",
+                                                 params={"alt": "sse"}, json=payload,
+                                                 timeout=request_timeout) as response:
+                if response.is_error:
+                    await response.aread()
+                    response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[len("data:"):])
+                    candidates = event.get("candidates") or [{}]
+                    text = "".join(part.get("text", "") for part in candidates[0].get("content", {}).get("parts", []))
+                    if text:
+                        fragments.append(text)
+                        yield text
+
+        if cache_key is not None and fragments:
+            await self.cache.put(cache_key, {"candidates": [{"content": {"parts": [{"text": "".join(fragments)}]}}]})
+
+    async def aclose(self):
+        """Fecha as ligações do pool."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,289 @@
+# Encaminhamento das chamadas de IA entre os fornecedores configurados (Gemini, Ollama, ...).
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from apis.external_ia_clients import BaseIAClient
+from apis.gemini_client import GeminiClient
+from apis.provider_guard import ProviderUnavailableError
+from core.llm_response_cache import CachedText
+from llm_integration.ollama_client import AsyncOllamaClient
+
+logger = logging.getLogger(__name__)
+
+
+class GeminiProvider(BaseIAClient):
+    """Fornecedor Gemini, sobre o GeminiClient partilhado (pool, cache e ProviderGuard)."""
+
+    def __init__(self, client: GeminiClient):
+        self.client = client
+        super().__init__(api_key=client.api_key, model_name=client.model)
+
+    @property
+    def configured(self):
+        return self.client.configured
+
+    @property
+    def healthy(self):
+        return self.client.healthy
+
+    @staticmethod
+    def _generation_config(max_tokens, temperature, top_p) -> Optional[Dict[str, Any]]:
+        config = {"maxOutputTokens": max_tokens, "temperature": temperature, "topP": top_p}
+        return {key: value for key, value in config.items() if value is not None} or None
+
+    def generate_text(self, prompt, max_tokens=150):
+        return asyncio.run(self.generate_text_async(prompt, max_tokens=max_tokens))
+
+    async def generate_text_async(self, prompt, max_tokens=None, temperature=None, top_p=None, timeout=None, use_cache=True):
+        return await self.client.generate_text(prompt, self._generation_config(max_tokens, temperature, top_p),
+                                               timeout=timeout, use_cache=use_cache)
+
+    async def stream_text_async(self, prompt, max_tokens=None, temperature=None, top_p=None, timeout=None, use_cache=True):
+        async for fragment in self.client.stream_text(prompt, self._generation_config(max_tokens, temperature, top_p),
+                                                      timeout=timeout, use_cache=use_cache):
+            yield fragment
+
+
+class OllamaProvider(BaseIAClient):
+    """Fornecedor Ollama (modelo local), sobre o AsyncOllamaClient."""
+
+    requires_api_key = False
+
+    def __init__(self, client: AsyncOllamaClient):
+        self.client = client
+        super().__init__(model_name=client.model)
+
+    @staticmethod
+    def _options(max_tokens, temperature, top_p, timeout) -> Dict[str, Any]:
+        options = {"max_tokens": max_tokens, "temperature": temperature, "top_p": top_p, "timeout": timeout}
+        return {key: value for key, value in options.items() if value is not None}
+
+    def generate_text(self, prompt, max_tokens=150):
+        return asyncio.run(self.generate_text_async(prompt, max_tokens=max_tokens))
+
+    async def generate_text_async(self, prompt, max_tokens=None, temperature=None, top_p=None, timeout=None, use_cache=True):
+        return await self.client.generate_text(prompt, **self._options(max_tokens, temperature, top_p, timeout))
+
+    async def stream_text_async(self, prompt, max_tokens=None, temperature=None, top_p=None, timeout=None, use_cache=True):
+        async for fragment in self.client.stream_text(prompt, **self._options(max_tokens, temperature, top_p, timeout)):
+            yield fragment
+
+
+class ProviderStats:
+    """Janela deslizante das últimas chamadas a um fornecedor: latências e erros."""
+
+    def __init__(self, window: int):
+        self.samples: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self.last_call: Optional[float] = None
+
+    def record(self, latency: float, ok: bool):
+        self.samples.append((latency, ok))
+        self.last_call = time.monotonic()
+
+    @property
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _latency, ok in self.samples if not ok) / len(self.samples)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Percentil (0-1) das latências das chamadas bem-sucedidas, ou None sem amostras."""
+        latencies = sorted(latency for latency, ok in self.samples if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(percentile * len(latencies)))]
+
+    def successes(self) -> int:
+        return sum(1 for _latency, ok in self.samples if ok)
+
+
+class LLMProviderRouter(BaseIAClient):
+    """
+    Cliente de IA que encaminha cada chamada para o fornecedor mais rápido disponível.
+
+    Para cada fornecedor guarda as latências e os erros das últimas `window` chamadas. Os
+    fornecedores saudáveis (taxa de erro até `max_error_rate` e sem disjuntor aberto) são
+    ordenados pela latência mediana; um fornecedor sem histórico é experimentado primeiro.
+    Se uma chamada falhar, é repetida no fornecedor seguinte.
+
+    Um fornecedor despromovido pela taxa de erro deixaria de ser chamado e o seu histórico
+    nunca mudaria; por isso, ao fim de `probe_interval` segundos sem chamadas volta a ser
+    experimentado (com fallback, se ainda falhar). Se responder, os erros antigos são esquecidos.
+
+    Com `hedge_percentile`, se o primeiro fornecedor não responder dentro desse percentil da
+    sua latência habitual (com pelo menos `hedge_min_samples` amostras), a mesma chamada é
+    enviada também ao segundo e fica a resposta que chegar primeiro.
+
+    As respostas servidas do cache do fornecedor (CachedText) não entram nas latências: com
+    ~0 ms, baixariam a mediana e o limiar de hedging sem dizer nada sobre o fornecedor.
+    """
+
+    requires_api_key = False
+
+    def __init__(self, providers: Dict[str, BaseIAClient], window: int = 50, max_error_rate: float = 0.5,
+                 hedge_percentile: Optional[float] = None, hedge_min_samples: int = 20, probe_interval: float = 30.0):
+        super().__init__(model_name="router")
+        self.providers = {name: provider for name, provider in providers.items() if provider.configured}
+        self.stats_by_provider = {name: ProviderStats(window) for name in self.providers}
+        self.max_error_rate = max_error_rate
+        self.probe_interval = probe_interval
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedges = 0
+        self.hedges_won = 0
+
+    @property
+    def configured(self):
+        return bool(self.providers)
+
+    @property
+    def healthy(self):
+        return any(provider.healthy for provider in self.providers.values())
+
+    def _is_healthy(self, name: str) -> bool:
+        return self.providers[name].healthy and self.stats_by_provider[name].error_rate <= self.max_error_rate
+
+    def _due_for_probe(self, name: str) -> bool:
+        last_call = self.stats_by_provider[name].last_call
+        return last_call is not None and time.monotonic() - last_call >= self.probe_interval
+
+    def _record(self, name: str, latency: float, ok: bool):
+        stats = self.stats_by_provider[name]
+        if ok and stats.error_rate > self.max_error_rate:
+            # Um fornecedor despromovido voltou a responder: os erros antigos deixam de contar.
+            stats.samples.clear()
+        stats.record(latency, ok)
+
+    def ranked_providers(self) -> List[str]:
+        """
+        Fornecedores por ordem de preferência: saudáveis (ou despromovidos à espera de nova
+        tentativa) primeiro, depois pela latência mediana.
+        """
+        def sort_key(name):
+            median = self.stats_by_provider[name].latency_percentile(0.5)
+            return (not (self._is_healthy(name) or self._due_for_probe(name)), median if median is not None else 0.0)
+        return sorted((name for name in self.providers if self.providers[name].healthy), key=sort_key)
+
+    def _hedge_delay(self, name: str) -> Optional[float]:
+        stats = self.stats_by_provider[name]
+        if self.hedge_percentile is None or stats.successes() < self.hedge_min_samples:
+            return None
+        return stats.latency_percentile(self.hedge_percentile)
+
+    async def _timed_call(self, name: str, prompt: str, kwargs: Dict[str, Any]) -> str:
+        started = time.perf_counter()
+        try:
+            result = await self.providers[name].generate_text_async(prompt, **kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._record(name, time.perf_counter() - started, False)
+            raise
+        if not isinstance(result, CachedText):
+            self._record(name, time.perf_counter() - started, True)
+        return result
+
+    def generate_text(self, prompt, max_tokens=150):
+        return asyncio.run(self.generate_text_async(prompt, max_tokens=max_tokens))
+
+    async def generate_text_async(self, prompt, max_tokens=None, temperature=None, top_p=None, timeout=None, use_cache=True):
+        """
+        Gera texto no fornecedor preferido, com fallback para os seguintes e hedging opcional.
+
+        Raises:
+            ProviderUnavailableError: se nenhum fornecedor estiver disponível.
+            O erro do último fornecedor tentado, se todos falharem.
+        """
+        queue = self.ranked_providers()
+        if not queue:
+            raise ProviderUnavailableError("Nenhum fornecedor de IA disponível.")
+        kwargs = dict(max_tokens=max_tokens, temperature=temperature, top_p=top_p, timeout=timeout, use_cache=use_cache)
+        pending: Dict[asyncio.Task, str] = {}
+        last_error: Optional[BaseException] = None
+        hedged = False
+
+        def launch():
+            name = queue.pop(0)
+            pending[asyncio.create_task(self._timed_call(name, prompt, kwargs))] = name
+            return name
+
+        primary = launch()
+        primary_started = time.perf_counter()
+        try:
+            while pending:
+                wait_timeout = None
+                hedge_delay = self._hedge_delay(primary) if not hedged and queue and len(pending) == 1 else None
+                if hedge_delay is not None:
+                    wait_timeout = max(0.0, hedge_delay - (time.perf_counter() - primary_started))
+                done, _ = await asyncio.wait(pending, timeout=wait_timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    self.hedges += 1
+                    secondary = launch()
+                    logger.info(f"Chamada a '{primary}' lenta; enviada também a '{secondary}'.")
+                    continue
+                for task in done:
+                    name = pending.pop(task)
+                    if task.exception() is None:
+                        if hedged and name != primary:
+                            self.hedges_won += 1
+                        return task.result()
+                    last_error = task.exception()
+                    logger.warning(f"Fornecedor de IA '{name}' falhou: {last_error}")
+                if not pending and queue:
+                    launch()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream_text_async(self, prompt, max_tokens=None, temperature=None, top_p=None, timeout=None, use_cache=True) -> AsyncIterator[str]:
+        """
+        Gera texto em fluxo no fornecedor preferido. Se este falhar antes do primeiro
+        fragmento, é usado o seguinte; depois do primeiro fragmento os erros são propagados.
+        """
+        providers = self.ranked_providers()
+        if not providers:
+            raise ProviderUnavailableError("Nenhum fornecedor de IA disponível.")
+        kwargs = dict(max_tokens=max_tokens, temperature=temperature, top_p=top_p, timeout=timeout, use_cache=use_cache)
+        for index, name in enumerate(providers):
+            started = time.perf_counter()
+            fragments = self.providers[name].stream_text_async(prompt, **kwargs)
+            try:
+                first = await fragments.__anext__()
+            except StopAsyncIteration:
+                return
+            except Exception as e:
+                self._record(name, time.perf_counter() - started, False)
+                logger.warning(f"Fornecedor de IA '{name}' falhou: {e}")
+                await fragments.aclose()
+                if index == len(providers) - 1:
+                    raise
+                continue
+            # Latência até ao primeiro fragmento: é a que conta numa resposta em fluxo.
+            if not isinstance(first, CachedText):
+                self._record(name, time.perf_counter() - started, True)
+            try:
+                yield first
+                async for fragment in fragments:
+                    yield fragment
+            finally:
+                await fragments.aclose()
+            return
+
+    def stats(self) -> Dict[str, Any]:
+        """Latência e taxa de erro por fornecedor, expostas em /api/v1/metrics."""
+        providers = {}
+        for name, stats in self.stats_by_provider.items():
+            p50, p95 = stats.latency_percentile(0.5), stats.latency_percentile(0.95)
+            providers[name] = {
+                "healthy": self._is_healthy(name),
+                "samples": len(stats.samples),
+                "error_rate": round(stats.error_rate, 3),
+                "latency_p50_ms": round(p50 * 1000) if p50 is not None else None,
+                "latency_p95_ms": round(p95 * 1000) if p95 is not None else None,
+            }
+        return {"providers": providers, "order": self.ranked_providers(), "hedges": self.hedges, "hedges_won": self.hedges_won}
@@ -0,0 +1,237 @@
+# Proteção das chamadas a fornecedores de IA: limite de ritmo, concorrência, novas tentativas e disjuntor.
+import time
+import random
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class ProviderUnavailableError(Exception):
+    """O fornecedor está marcado como indisponível (disjuntor aberto); a chamada não foi feita."""
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Erros transitórios: timeouts, falhas de ligação, 429 e 5xx."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (httpx.TimeoutException, httpx.TransportError))
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    if isinstance(error, httpx.HTTPStatusError):
+        value = error.response.headers.get("retry-after", "")
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+class TokenBucket:
+    """Limitador de ritmo: `rate` pedidos por segundo em média, com rajadas até `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    async def acquire(self):
+        """Espera até haver uma ficha disponível e consome-a."""
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """
+    Disjuntor: após `failure_threshold` falhas seguidas fica aberto durante `reset_timeout`
+    segundos, recusando chamadas; depois deixa passar um único pedido de teste ("half_open")
+    e fecha se este correr bem.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        """Verdadeiro enquanto as chamadas são recusadas sem contactar o fornecedor."""
+        if self.state == "open":
+            return time.monotonic() - self.opened_at < self.reset_timeout
+        return self.state == "half_open" and self._probe_in_flight
+
+    def allow(self) -> bool:
+        """Indica se uma chamada pode ser feita agora (num estado "half_open", só uma de cada vez)."""
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            self._probe_in_flight = False
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logger.warning(f"Disjuntor aberto após {self.consecutive_failures} falhas seguidas.")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """Liberta o pedido de teste que terminou sem resultado (p. ex. cancelado)."""
+        self._probe_in_flight = False
+
+
+class ProviderGuard:
+    """
+    Envolve as chamadas a um fornecedor de IA.
+
+    Cada tentativa consome uma ficha do TokenBucket e ocupa um de `max_concurrency` lugares.
+    Os erros transitórios são repetidos até `max_retries` vezes, com espera exponencial e
+    jitter (respeitando o Retry-After); as falhas contam para o disjuntor, que, aberto,
+    faz as chamadas falhar logo com ProviderUnavailableError para que se use o fallback.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float, burst: int, max_concurrency: int,
+                 max_retries: int, backoff_base: float, backoff_max: float,
+                 failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+
+    @property
+    def available(self) -> bool:
+        return not self.breaker.is_open
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # Jitter "completo": espalha as novas tentativas de pedidos que falharam ao mesmo tempo.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def call(self, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Executa `func` com as proteções do fornecedor.
+
+        Raises:
+            ProviderUnavailableError: se o disjuntor estiver aberto.
+            O último erro de `func`, se não for transitório ou se as tentativas se esgotarem.
+        """
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self.rejected += 1
+                raise ProviderUnavailableError(f"Fornecedor '{self.name}' temporariamente indisponível.")
+            try:
+                await self.bucket.acquire()
+                async with self._slots:
+                    self.in_flight += 1
+                    self.calls += 1
+                    try:
+                        result = await func()
+                    finally:
+                        self.in_flight -= 1
+            except Exception as e:
+                if not is_retryable_error(e):
+                    # Erro do pedido, não do fornecedor: não conta para o disjuntor.
+                    self.breaker.release_probe()
+                    raise
+                self.failures += 1
+                self.breaker.record_failure()
+                if attempt == self.max_retries or self.breaker.state == "open":
+                    raise
+                delay = self._backoff_delay(attempt, e)
+                logger.warning(f"Chamada a '{self.name}' falhou ({e}); nova tentativa em {delay:.1f}s.")
+                self.retries += 1
+                await asyncio.sleep(delay)
+            except BaseException:
+                self.breaker.release_probe()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    @asynccontextmanager
+    async def session(self):
+        """
+        Protege uma chamada em fluxo (streaming), que decorre dentro do bloco `async with`.
+
+        Aplica a quota, o limite de concorrência e o disjuntor, mas sem novas tentativas:
+        parte da resposta pode já ter sido entregue.
+        """
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise ProviderUnavailableError(f"Fornecedor '{self.name}' temporariamente indisponível.")
+        try:
+            await self.bucket.acquire()
+            async with self._slots:
+                self.in_flight += 1
+                self.calls += 1
+                try:
+                    yield
+                finally:
+                    self.in_flight -= 1
+        except Exception as e:
+            if is_retryable_error(e):
+                self.failures += 1
+                self.breaker.record_failure()
+            else:
+                self.breaker.release_probe()
+            raise
+        except BaseException:
+            self.breaker.release_probe()
+            raise
+        else:
+            self.breaker.record_success()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de utilização, expostos em /api/v1/metrics."""
+        return {
+            "circuit_state": "open" if self.breaker.is_open else self.breaker.state,
+            "times_opened": self.breaker.times_opened,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
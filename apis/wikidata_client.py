@@ -0,0 +1,50 @@
+# Cliente assíncrono da pesquisa de entidades do Wikidata (fonte de autoridade na busca federada).
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from config import settings
+
+
+class WikidataClient:
+    """Procura entidades no Wikidata (wbsearchentities) pelo rótulo, com um pool de ligações partilhado."""
+
+    def __init__(self, base_url: str = settings.WIKIDATA_API_URL, language: str = "pt",
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url
+        self.language = language
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Devolve o cliente HTTP do event loop atual, criando-o na primeira utilização."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(transport=self.transport, timeout=10,
+                                             headers={"User-Agent": "MemoriA/1.0 (catalogacao de patrimonio)"})
+            self._client_loop = loop
+        return self._client
+
+    async def search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        Entidades cujo rótulo corresponde à pergunta, no formato dos resultados da busca.
+
+        Raises:
+            httpx.HTTPError: em erros de ligação, timeout ou resposta HTTP de erro.
+        """
+        response = await self._get_client().get(self.base_url, params={
+            "action": "wbsearchentities", "search": query, "language": self.language,
+            "uselang": self.language, "format": "json", "limit": min(limit, 50),
+        })
+        response.raise_for_status()
+        return [{"id": entity.get("concepturi") or entity["id"], "title": entity.get("label", ""),
+                 "author": "", "description": entity.get("description", "")}
+                for entity in response.json().get("search", [])]
+
+    async def aclose(self):
+        """Fecha as ligações do pool."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -6,4 +6,164 @@
 # }
 # BACKEND_API_URL = "http://localhost:8000/api"
 # DEFAULT_ONTOLOGY_PATH = "ontologies/default_ontology.owl"
+import os
 
+# --- OCR ---
+# Número de processos usados para o OCR paralelo de PDFs digitalizados.
+# Com 1 (ou menos) o OCR é feito página a página no processo atual.
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", str(os.cpu_count() or 1)))
+# Resolução de renderização das páginas enviadas ao Tesseract (a máxima, em modo adaptativo).
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+# Modo adaptativo (desligado por omissão): a resolução de cada página é escolhida pela altura
+# das linhas de texto (entre OCR_MIN_DPI e OCR_DPI) e as páginas com confiança média abaixo de
+# OCR_MIN_CONFIDENCE são repetidas a OCR_DPI. Muda o texto reconhecido; validar com os
+# documentos do acervo antes de o ligar.
+OCR_ADAPTIVE_DPI = os.getenv("OCR_ADAPTIVE_DPI", "false").lower() in ("1", "true", "yes")
+OCR_MIN_DPI = int(os.getenv("OCR_MIN_DPI", "150"))
+OCR_TARGET_LINE_PX = int(os.getenv("OCR_TARGET_LINE_PX", "32"))
+OCR_MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", "60"))
+# Renderização enviada ao OCR: "rgb" (a de sempre), "gray" (tons de cinzento) ou "binary" (Otsu).
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "rgb")
+# Idioma do Tesseract.
+OCR_LANG = os.getenv("OCR_LANG", "por")
+# Motor de OCR: "tesserocr" (reconhecedores persistentes, recorre ao pytesseract se não
+# estiver instalado) ou "pytesseract" (um processo tesseract por imagem).
+OCR_BACKEND = os.getenv("OCR_BACKEND", "tesserocr")
+# Reconhecedores persistentes mantidos no processo da API (OCR em série e imagens).
+OCR_ENGINE_POOL_SIZE = int(os.getenv("OCR_ENGINE_POOL_SIZE", "2"))
+# Mínimo de caracteres (sem espaços) para considerar utilizável a camada de texto de
+# uma página de PDF; abaixo disso a página é enviada para OCR.
+OCR_MIN_TEXT_LAYER_CHARS = int(os.getenv("OCR_MIN_TEXT_LAYER_CHARS", "20"))
+
+# --- Cache de extração de documentos ---
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# Diretório do cache em disco (texto por página e itens estruturados).
+EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", os.path.join(PROJECT_ROOT, "cache", "extraction"))
+# Tamanho máximo do cache; acima disso as entradas menos usadas são removidas.
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# --- Uploads ---
+# Tamanho máximo (bytes) dos documentos e dos ficheiros de ontologia carregados;
+# acima disso o pedido é recusado com 413.
+UPLOAD_MAX_DOCUMENT_BYTES = int(os.getenv("UPLOAD_MAX_DOCUMENT_BYTES", str(500 * 1024 * 1024)))
+UPLOAD_MAX_ONTOLOGY_BYTES = int(os.getenv("UPLOAD_MAX_ONTOLOGY_BYTES", str(20 * 1024 * 1024)))
+# Tamanho máximo de um pedido de processamento em lote (todos os ficheiros ou o arquivo zip).
+UPLOAD_MAX_BATCH_BYTES = int(os.getenv("UPLOAD_MAX_BATCH_BYTES", str(4 * 1024 * 1024 * 1024)))
+# Limites de cada arquivo zip de um lote: total descompactado (bytes) e número de membros
+# (incluindo pastas e ficheiros ignorados). Um arquivo acima de qualquer deles é recusado por inteiro.
+UPLOAD_MAX_ZIP_EXTRACTED_BYTES = int(os.getenv("UPLOAD_MAX_ZIP_EXTRACTED_BYTES", str(8 * 1024 * 1024 * 1024)))
+UPLOAD_MAX_ZIP_MEMBERS = int(os.getenv("UPLOAD_MAX_ZIP_MEMBERS", "10000"))
+
+# --- Processamento de documentos ---
+# Threads do executor onde correm o OCR e a extração, fora do event loop da API.
+DOCUMENT_PROCESSING_THREADS = int(os.getenv("DOCUMENT_PROCESSING_THREADS", "4"))
+# Número máximo de tarefas de processamento de documentos em execução simultânea.
+DOCUMENT_JOB_MAX_CONCURRENCY = int(os.getenv("DOCUMENT_JOB_MAX_CONCURRENCY", "2"))
+# Número máximo de documentos aceites num lote (ficheiros enviados ou membros de arquivos zip).
+DOCUMENT_BATCH_MAX_DOCUMENTS = int(os.getenv("DOCUMENT_BATCH_MAX_DOCUMENTS", "1000"))
+# Carregar o spaCy, o PyMuPDF e o motor de OCR em segundo plano logo após o arranque.
+# Com "false" são carregados apenas na primeira utilização por cada rota.
+DOCUMENT_WARMUP_ON_STARTUP = os.getenv("DOCUMENT_WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# --- Extração de itens (NLP) ---
+# Tamanho dos blocos de texto enviados à extração e sobreposição entre blocos consecutivos.
+NLP_CHUNK_CHARS = int(os.getenv("NLP_CHUNK_CHARS", "8000"))
+NLP_CHUNK_OVERLAP_CHARS = int(os.getenv("NLP_CHUNK_OVERLAP_CHARS", "400"))
+# Máximo de blocos de texto de um documento enviados à IA em simultâneo.
+NLP_LLM_MAX_CONCURRENCY = int(os.getenv("NLP_LLM_MAX_CONCURRENCY", "4"))
+
+# --- API do Gemini ---
+GEMINI_API_BASE_URL = os.getenv("GEMINI_API_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash-latest")
+# Pool de ligações partilhado por todas as chamadas (extração de itens e chatbot).
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "20"))
+GEMINI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GEMINI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+GEMINI_KEEPALIVE_EXPIRY = float(os.getenv("GEMINI_KEEPALIVE_EXPIRY", "30"))
+# Timeouts (segundos) de ligação e, por omissão, de leitura da resposta.
+GEMINI_CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "10"))
+GEMINI_READ_TIMEOUT = float(os.getenv("GEMINI_READ_TIMEOUT", "90"))
+# Quota: pedidos por minuto (média) e rajada máxima; pedidos em curso em simultâneo.
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "10"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+# Novas tentativas em 429/5xx/timeouts, com espera exponencial (segundos) e jitter.
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "1"))
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "30"))
+# Disjuntor: falhas seguidas até o abrir e segundos até voltar a tentar.
+GEMINI_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("GEMINI_CIRCUIT_FAILURE_THRESHOLD", "5"))
+GEMINI_CIRCUIT_RESET_SECONDS = float(os.getenv("GEMINI_CIRCUIT_RESET_SECONDS", "60"))
+
+# --- Cache de respostas do modelo de linguagem ---
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Respostas mantidas em memória (LRU) e validade de cada resposta, em segundos.
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Diretório do nível em disco (vazio para o desativar) e o seu tamanho máximo.
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "")
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# A cache serve sobretudo os prompts de extração (determinísticos). As respostas do chatbot usam
+# temperatura 0.7 e são conversacionais: só ficam em cache com "true".
+CHATBOT_CACHE_RESPONSES = os.getenv("CHATBOT_CACHE_RESPONSES", "false").lower() in ("1", "true", "yes")
+# Orçamento de tokens (estimados) do contexto dos prompts do chatbot e máximo por item recuperado.
+CHATBOT_CONTEXT_MAX_TOKENS = int(os.getenv("CHATBOT_CONTEXT_MAX_TOKENS", "2000"))
+CHATBOT_CONTEXT_ITEM_MAX_TOKENS = int(os.getenv("CHATBOT_CONTEXT_ITEM_MAX_TOKENS", "200"))
+
+# --- Índice vetorial local (recuperação do chatbot) ---
+# Embeddings do título e resumo de cada item persistido, calculados pelo Ollama (OLLAMA_EMBEDDING_MODEL).
+VECTOR_INDEX_ENABLED = os.getenv("VECTOR_INDEX_ENABLED", "false").lower() in ("1", "true", "yes")
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", os.path.join(PROJECT_ROOT, "cache", "vectors"))
+# Itens recuperados por pergunta e semelhança (cosseno) mínima para um item contar.
+CHATBOT_VECTOR_TOP_K = int(os.getenv("CHATBOT_VECTOR_TOP_K", "20"))
+VECTOR_INDEX_MIN_SCORE = float(os.getenv("VECTOR_INDEX_MIN_SCORE", "0.3"))
+# Repositórios (separados por vírgulas) cujo índice é preenchido com os objetos da API Guará no
+# arranque, se ainda não estiver completo. Também se pode pedir em POST /api/v1/vector-index/{repo}/backfill.
+VECTOR_INDEX_BACKFILL_REPOSITORIES = [name.strip() for name in os.getenv("VECTOR_INDEX_BACKFILL_REPOSITORIES", "").split(",") if name.strip()]
+
+# --- Procura aproximada de títulos (busca e deteção de duplicados) ---
+# Distância de edição máxima, após normalização, para dois títulos serem o mesmo (1 em títulos curtos).
+TITLE_MATCH_MAX_DISTANCE = int(os.getenv("TITLE_MATCH_MAX_DISTANCE", "2"))
+
+# --- Busca federada (/api/v1/search) ---
+# Fontes consultadas por omissão: "local", "repositories" (todos os da API Guará) e/ou "wikidata".
+SEARCH_DEFAULT_SOURCES = [source.strip() for source in os.getenv("SEARCH_DEFAULT_SOURCES", "local,repositories").split(",") if source.strip()]
+# Tempo máximo (segundos) de cada fonte e da busca toda; as fontes atrasadas ficam de fora.
+SEARCH_SOURCE_TIMEOUT = float(os.getenv("SEARCH_SOURCE_TIMEOUT", "2"))
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", "3"))
+# Validade (segundos) da lista de repositórios da API Guará usada na busca.
+SEARCH_REPOSITORY_CACHE_SECONDS = float(os.getenv("SEARCH_REPOSITORY_CACHE_SECONDS", "300"))
+# Ficheiro onde o índice de busca local (fonte "local") é guardado, para sobreviver a reinícios.
+# Só contém os itens catalogados por esta API; vazio desativa (o índice fica só em memória).
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", os.path.join(PROJECT_ROOT, "cache", "search", "documents.jsonl"))
+# Paginação por cursor: resultados pedidos a cada fonte na primeira página, guardados (numa
+# fotografia da ordenação) durante SEARCH_CURSOR_TTL_SECONDS para as páginas seguintes.
+SEARCH_PAGINATION_DEPTH = int(os.getenv("SEARCH_PAGINATION_DEPTH", "100"))
+SEARCH_CURSOR_TTL_SECONDS = float(os.getenv("SEARCH_CURSOR_TTL_SECONDS", "300"))
+# Pesquisa de entidades no Wikidata como fonte de autoridade (fonte "wikidata").
+WIKIDATA_SEARCH_ENABLED = os.getenv("WIKIDATA_SEARCH_ENABLED", "false").lower() in ("1", "true", "yes")
+WIKIDATA_API_URL = os.getenv("WIKIDATA_API_URL", "https://www.wikidata.org/w/api.php")
+
+# --- Ollama (modelos locais) ---
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama2")
+# Modelo de embeddings (vazio para usar OLLAMA_MODEL) e textos enviados por pedido.
+OLLAMA_EMBEDDING_MODEL = os.getenv("OLLAMA_EMBEDDING_MODEL", "")
+OLLAMA_EMBED_BATCH_SIZE = int(os.getenv("OLLAMA_EMBED_BATCH_SIZE", "64"))
+# Tempo que o Ollama mantém o modelo carregado após cada pedido (ex: "30m", "-1" para sempre).
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Timeout de leitura (segundos) e ligações simultâneas ao servidor Ollama.
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "120"))
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "4"))
+# Usar também o Ollama como fornecedor de IA, ao lado do Gemini (ver LLM_ROUTER_*).
+OLLAMA_ENABLED = os.getenv("OLLAMA_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# --- Encaminhamento entre fornecedores de IA ---
+# Chamadas recentes consideradas por fornecedor e taxa de erro a partir da qual passa para o fim da fila.
+LLM_ROUTER_WINDOW = int(os.getenv("LLM_ROUTER_WINDOW", "50"))
+LLM_ROUTER_MAX_ERROR_RATE = float(os.getenv("LLM_ROUTER_MAX_ERROR_RATE", "0.5"))
+# Segundos sem chamadas após os quais um fornecedor despromovido volta a ser experimentado.
+LLM_ROUTER_PROBE_SECONDS = float(os.getenv("LLM_ROUTER_PROBE_SECONDS", "30"))
+# Percentil (0-1) da latência do fornecedor a partir do qual a chamada é repetida no seguinte
+# (0 desativa) e chamadas bem-sucedidas necessárias antes de o fazer.
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
@@ -2,7 +2,7 @@
 # Irá utilizar o DataAcquirer, ReferenceLinker e RDFStoreInterface.
 
 class Cataloger:
-    def __init__(self, ontology_config=None, rdf_store=None, data_acquirer=None, reference_linker=None):
+    def __init__(self, ontology_config=None, rdf_store=None, data_acquirer=None, reference_linker=None, search_engine=None):
         """
         Inicializa o Cataloger.
 
@@ -11,11 +11,13 @@ class Cataloger:
             rdf_store (RDFStoreInterface): Interface para o repositório RDF.
             data_acquirer (DataAcquirer): Módulo para adquirir dados de várias fontes.
             reference_linker (ReferenceLinker): Módulo para encontrar e ligar referências.
+            search_engine (SearchEngine): Índice de busca local, atualizado com cada item catalogado.
         """
         self.ontology_config = ontology_config if ontology_config else {}
         self.rdf_store = rdf_store
         self.data_acquirer = data_acquirer
         self.reference_linker = reference_linker
+        self.search_engine = search_engine
         print("Cataloger inicializado.")
         if not self.ontology_config:
             print("Aviso: Configuração da ontologia não fornecida ao Cataloger.")
@@ -81,6 +83,11 @@ class Cataloger:
         else:
             print("Nenhum triplo RDF foi gerado (ou a geração é apenas simulada). Nenhuma persistência no RDFStore.")
 
+        # 5. Tornar o item pesquisável na busca local
+        if self.search_engine:
+            self.search_engine.add_item(item_subject_uri, item_data.get("title", ""), item_data.get("author"),
+                                        item_data.get("description"), item_data.get("place"), item_data.get("date"))
+
         print(f"Item '{item_data.get('title')}' processado pelo Cataloger.")
         return item_data
 
@@ -1,10 +1,16 @@
 # memoria/core/chatbot_service.py
 
-import os
-import requests
 import json
+import time
 import asyncio
-from typing import Tuple, Dict, Any, List
+from typing import Tuple, Dict, Any, List, Optional, AsyncIterator
+from apis.external_ia_clients import BaseIAClient
+from apis.gemini_client import GeminiClient
+from apis.llm_router import GeminiProvider
+from apis.provider_guard import ProviderUnavailableError
+from config import settings
+from core.rag_context import ContextBuilder
+from core.vector_index import SemanticIndex
 from storage.sparql_api_client import SPARQLAPIClient
 import logging
 
@@ -16,71 +22,63 @@ class ChatbotService:
     """
     Serviço de chatbot que utiliza RAG (Retrieval-Augmented Generation)
     para responder a perguntas com base nos dados do repositório SPARQL.
+
+    Perguntas iguais (mesmo repositório e mensagem normalizada) feitas em simultâneo
+    partilham uma única busca e uma única geração ("single-flight").
     """
 
-    def __init__(self, sparql_client: SPARQLAPIClient):
+    def __init__(self, sparql_client: SPARQLAPIClient, gemini_client: Optional[GeminiClient] = None,
+                 llm: Optional[BaseIAClient] = None, semantic_index: Optional[SemanticIndex] = None):
         self.sparql_client = sparql_client
-        self.gemini_api_key = os.getenv("GEMINI_API_KEY")
-        if not self.gemini_api_key:
-            logger.warning("AVISO: Chave da API do Gemini não encontrada. O Chatbot terá funcionalidade limitada.")
-
-    def _format_sparql_results(self, results: List[Dict[str, Any]]) -> str:
-        """Formata os resultados da busca SPARQL para um texto legível e conciso."""
-        if not results:
-            return "Nenhuma informação específica encontrada na base de dados."
-
-        # Constrói uma string de contexto a partir dos resultados
-        context_parts = []
-        for item in results:
-            titulo = item.get('titulo', {}).get('value', 'N/A')
-            resumo = item.get('resumo', {}).get('value', '')
-            context_parts.append(f"Item: {titulo}. Detalhes: {resumo}")
-
-        return " ".join(context_parts)
-
-    async def _call_gemini(self, prompt: str) -> str:
-        """Chama a API do Gemini com um prompt e retorna a resposta."""
-        if not self.gemini_api_key:
+        # Índice vetorial local; com ele, a busca só vai à API Guará para repositórios ainda não indexados.
+        self.semantic_index = semantic_index
+        self.gemini_client = gemini_client or GeminiClient()
+        # Cliente de IA usado nas respostas (p. ex. o LLMProviderRouter); por omissão, o Gemini.
+        self.llm = llm or GeminiProvider(self.gemini_client)
+        self._in_flight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.context_builder = ContextBuilder(settings.CHATBOT_CONTEXT_MAX_TOKENS, settings.CHATBOT_CONTEXT_ITEM_MAX_TOKENS)
+        if not self.llm.configured:
+            logger.warning("AVISO: Nenhum fornecedor de IA configurado (chave da API do Gemini não encontrada). O Chatbot terá funcionalidade limitada.")
+
+    def _format_sparql_results(self, user_message: str, results: List[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Formata os resultados da busca SPARQL para o prompt: os mais relevantes para a
+        pergunta, sem duplicados, dentro do orçamento de tokens do contexto. Devolve também
+        o resumo da seleção (itens usados e descartados).
+        """
+        context_data, _kept, selection = self.context_builder.build(user_message, results)
+        if selection["dropped"]:
+            logger.info(f"Contexto do prompt: {selection['kept']} de {selection['retrieved']} itens "
+                        f"({selection['tokens']} tokens estimados).")
+        return context_data, selection
+
+    def _fallback_reply(self, context_data: str) -> str:
+        """Resposta sem IA, usada enquanto o fornecedor está indisponível: mostra o que foi encontrado."""
+        return ("De momento não consigo elaborar uma resposta, mas eis o que encontrei no acervo: "
+                f"{context_data}")
+
+    async def _call_gemini(self, prompt: str, fallback_reply: Optional[str] = None) -> str:
+        """Chama o fornecedor de IA com um prompt e retorna a resposta."""
+        if not self.llm.configured:
             return "Lamento, a funcionalidade de conversação com IA não está configurada no momento."
 
-        api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent?key={self.gemini_api_key}"
-        payload = {
-            "contents": [{"parts": [{"text": prompt}]}],
-            "generationConfig": {
-                "temperature": 0.7,
-                "topP": 0.95,
-            }
-        }
-
         try:
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: requests.post(api_url, json=payload, timeout=60)
-            )
-            response.raise_for_status()
-            api_result = response.json()
-            return api_result['candidates'][0]['content']['parts'][0]['text']
+            return await self.llm.generate_text_async(prompt, temperature=0.7, top_p=0.95, timeout=60,
+                                                      use_cache=settings.CHATBOT_CACHE_RESPONSES)
+        except ProviderUnavailableError as e:
+            logger.warning(f"{e} A responder sem IA.")
+            if fallback_reply:
+                return fallback_reply
+            return "Desculpe, ocorreu um erro ao tentar gerar a resposta. Por favor, tente novamente mais tarde."
         except Exception as e:
-            logger.error(f"Erro ao chamar a API do Gemini: {e}")
+            logger.error(f"Erro ao chamar o fornecedor de IA: {e}")
             return "Desculpe, ocorreu um erro ao tentar gerar a resposta. Por favor, tente novamente mais tarde."
 
-    async def process_message(self, user_message: str, repository_name: str) -> Tuple[str, List[Dict[str, Any]]]:
-        """
-        Processa a mensagem do utilizador, aplicando a lógica RAG.
-        """
-        logger.info(f"Processando mensagem para o repositório '{repository_name}': '{user_message}'")
-
-        repo_config = {
-            "repository_query_url": f"http://localhost:3030/{repository_name}/query"
-        }
-
-        # 1. Recuperação (Retrieval) - Buscar dados no repositório
-        search_results = self.sparql_client.list_objects(user_message, repo_config)
-        context_data = self._format_sparql_results(search_results)
-
-        # 2. Geração (Generation) - Construir o prompt para a IA
-        prompt = f"""
+    def _build_prompt(self, user_message: str, context_data: str) -> str:
+        """Constrói o prompt de geração com a pergunta e o contexto recuperado."""
+        return f"""
         Você é 'MemoriA', um assistente de IA especializado em contar histórias sobre património cultural.
         A sua tarefa é responder à pergunta do utilizador de forma envolvente, usando a informação contextual da nossa base de dados.
 
@@ -100,9 +98,111 @@ class ChatbotService:
         A sua resposta:
         """
 
+    async def _retrieve(self, user_message: str, repository_name: str) -> List[Dict[str, Any]]:
+        """
+        Recuperação (Retrieval): procura no repositório os itens relacionados com a mensagem.
+
+        Usa o índice vetorial local; enquanto o índice do repositório não estiver completo
+        (preenchido com os objetos já existentes), junta-lhe os resultados da API Guará.
+        """
+        local_results: List[Dict[str, Any]] = []
+        if self.semantic_index is not None:
+            try:
+                local_results = await self.semantic_index.search(repository_name, user_message, settings.CHATBOT_VECTOR_TOP_K)
+                if local_results and self.semantic_index.is_complete(repository_name):
+                    return local_results
+            except Exception as e:
+                logger.warning(f"Busca no índice vetorial falhou; a usar a API Guará: {e}")
+
+        repo_config = {
+            "repository_query_url": f"http://localhost:3030/{repository_name}/query"
+        }
+        # O cliente SPARQL é síncrono: corre fora do event loop.
+        loop = asyncio.get_running_loop()
+        remote_results = await loop.run_in_executor(None, self.sparql_client.list_objects, user_message, repo_config)
+        seen = {item.get("obj", {}).get("value") for item in local_results}
+        return local_results + [item for item in remote_results
+                                if item.get("obj", {}).get("value") is None or item["obj"]["value"] not in seen]
+
+    @staticmethod
+    def _normalize_message(user_message: str) -> str:
+        return " ".join(user_message.casefold().split())
+
+    async def process_message(self, user_message: str, repository_name: str) -> Tuple[str, List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Processa a mensagem do utilizador, aplicando a lógica RAG. Devolve a resposta, os
+        resultados da busca e o resumo do contexto usado no prompt.
+
+        Se já estiver em curso a mesma pergunta para o mesmo repositório, espera pelo seu
+        resultado em vez de repetir a busca e a chamada à IA.
+        """
+        self.requests += 1
+        key = (repository_name, self._normalize_message(user_message))
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            logger.info(f"Pergunta repetida para o repositório '{repository_name}' agrupada com a que está em curso.")
+        else:
+            task = asyncio.create_task(self._answer_message(user_message, repository_name))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _task: self._in_flight.pop(key, None))
+        # shield: um pedido cancelado (cliente desligou) não cancela a resposta dos restantes.
+        return await asyncio.shield(task)
+
+    async def _answer_message(self, user_message: str, repository_name: str) -> Tuple[str, List[Dict[str, Any]], Dict[str, Any]]:
+        logger.info(f"Processando mensagem para o repositório '{repository_name}': '{user_message}'")
+
+        # 1. Recuperação (Retrieval) - Buscar dados no repositório
+        search_results = await self._retrieve(user_message, repository_name)
+        context_data, context_info = self._format_sparql_results(user_message, search_results)
+
+        # 2. Geração (Generation) - Construir o prompt para a IA
+        prompt = self._build_prompt(user_message, context_data)
+
         # 3. Chamar a IA para obter a resposta final
-        ai_response = await self._call_gemini(prompt)
+        ai_response = await self._call_gemini(prompt, fallback_reply=self._fallback_reply(context_data))
 
         # Retorna a resposta da IA e os dados de origem para o frontend
-        return ai_response, search_results
+        return ai_response, search_results, context_info
 
+    async def stream_message(self, user_message: str, repository_name: str) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Variante em fluxo de process_message: gera eventos (tipo, dados) à medida que ficam prontos.
+
+        Primeiro ("sources", resultados da busca), depois ("token", fragmento de texto) por cada
+        fragmento produzido pelo modelo e, no fim, ("done", {"ttft_ms": ..., "context": ...}). Em caso de erro é
+        entregue ("error", mensagem) ou, com o fornecedor indisponível, a resposta sem IA como
+        um único "token". Se o consumidor abandonar o gerador, o pedido ao modelo é fechado.
+        """
+        logger.info(f"Processando mensagem (fluxo) para o repositório '{repository_name}': '{user_message}'")
+        started = time.perf_counter()
+        search_results = await self._retrieve(user_message, repository_name)
+        yield "sources", search_results
+
+        context_data, context_info = self._format_sparql_results(user_message, search_results)
+        if not self.llm.configured:
+            yield "token", "Lamento, a funcionalidade de conversação com IA não está configurada no momento."
+            yield "done", {"ttft_ms": None, "context": context_info}
+            return
+
+        ttft_ms = None
+        try:
+            async for fragment in self.llm.stream_text_async(self._build_prompt(user_message, context_data),
+                                                             temperature=0.7, top_p=0.95, timeout=60,
+                                                             use_cache=settings.CHATBOT_CACHE_RESPONSES):
+                if ttft_ms is None:
+                    ttft_ms = round((time.perf_counter() - started) * 1000)
+                    logger.info(f"Primeiro fragmento da resposta em {ttft_ms} ms.")
+                yield "token", fragment
+        except ProviderUnavailableError as e:
+            logger.warning(f"{e} A responder sem IA.")
+            yield "token", self._fallback_reply(context_data)
+        except Exception as e:
+            logger.error(f"Erro ao chamar o fornecedor de IA (fluxo): {e}")
+            yield "error", "Desculpe, ocorreu um erro ao tentar gerar a resposta. Por favor, tente novamente mais tarde."
+            return
+        yield "done", {"ttft_ms": ttft_ms, "context": context_info}
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de utilização, expostos em /api/v1/metrics."""
+        return {"requests": self.requests, "coalesced": self.coalesced, "in_flight": len(self._in_flight)}
@@ -0,0 +1,175 @@
+# memoria/core/document_job_service.py
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+from core.document_processor_service import DocumentProcessorService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("completed", "failed")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class DocumentJobService:
+    """
+    Processa documentos como tarefas em segundo plano.
+
+    A submissão devolve logo um ID de tarefa; o OCR e a extração correm no executor do
+    DocumentProcessorService, com no máximo `max_concurrent_jobs` documentos em simultâneo.
+    O estado de cada tarefa fica disponível em `jobs`, como em PersistenceService.processing_status.
+    O processamento síncrono (process_now) conta para o mesmo limite.
+    Um lote agrupa várias tarefas submetidas de uma vez; os seus documentos partilham o
+    mesmo limite de concorrência e cada resultado fica disponível assim que termina.
+    """
+
+    def __init__(self, document_processor: DocumentProcessorService, max_concurrent_jobs: int,
+                 max_finished_jobs: int = 1000, max_finished_batches: int = 100):
+        self.document_processor = document_processor
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.max_finished_jobs = max_finished_jobs
+        self.max_finished_batches = max_finished_batches
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrent_jobs)
+        self._tasks = set()
+
+    def submit(self, filepath: str, filename: str, file_id: str, ontology_config: Dict[str, Any],
+               content_hash: Optional[str] = None, batch_id: Optional[str] = None) -> str:
+        """Regista uma nova tarefa de processamento e agenda-a; devolve o ID da tarefa."""
+        job_id = str(uuid.uuid4())
+        self.jobs[job_id] = {
+            "job_id": job_id,
+            "batch_id": batch_id,
+            "status": "pending",
+            "file_id": file_id,
+            "filename": filename,
+            "submitted_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        task = asyncio.create_task(self._run_job(job_id, filepath, ontology_config, content_hash))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        logger.info(f"Tarefa de documento {job_id} ({filename}) submetida.")
+        self._prune_finished_jobs()
+        return job_id
+
+    async def process_now(self, filepath: str, ontology_config: Dict[str, Any],
+                          content_hash: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Processa um documento e espera pelo resultado (rota síncrona), ocupando um dos
+        `max_concurrent_jobs` lugares partilhados com as tarefas em segundo plano.
+        """
+        async with self._semaphore:
+            return await self.document_processor.process_document_for_multiple_items(
+                filepath, ontology_config, content_hash=content_hash
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.jobs.get(job_id)
+
+    def submit_batch(self, documents: List[Dict[str, Any]], ontology_config: Dict[str, Any],
+                     rejected: Optional[List[Dict[str, Any]]] = None) -> str:
+        """
+        Regista um lote de documentos e agenda uma tarefa por documento; devolve o ID do lote.
+
+        Args:
+            documents: Dicionários com "filepath", "filename", "file_id" e "content_hash".
+            rejected: Ficheiros recusados na receção ({"filename", "error"}), reportados no estado do lote.
+        """
+        batch_id = str(uuid.uuid4())
+        self.batches[batch_id] = {
+            "batch_id": batch_id,
+            "submitted_at": _now(),
+            "job_ids": [],
+            "rejected": rejected or [],
+        }
+        for document in documents:
+            job_id = self.submit(document["filepath"], document["filename"], document["file_id"], ontology_config,
+                                 content_hash=document.get("content_hash"), batch_id=batch_id)
+            self.batches[batch_id]["job_ids"].append(job_id)
+        logger.info(f"Lote {batch_id} submetido com {len(documents)} documentos.")
+        self._prune_finished_batches()
+        return batch_id
+
+    def get_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Estado de um lote: progresso, estado de cada documento e resultados dos já terminados."""
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return None
+        documents = [self.jobs[job_id] for job_id in batch["job_ids"] if job_id in self.jobs]
+        counts = {status: 0 for status in ("pending", "processing", "completed", "failed")}
+        for job in documents:
+            counts[job["status"]] += 1
+        finished = counts["completed"] + counts["failed"]
+        if finished == len(documents):
+            status = "completed"
+        elif counts["pending"] == len(documents):
+            status = "pending"
+        else:
+            status = "processing"
+        return {
+            "batch_id": batch_id,
+            "status": status,
+            "submitted_at": batch["submitted_at"],
+            "total": len(documents),
+            "finished": finished,
+            "counts": counts,
+            "documents": documents,
+            "rejected": batch["rejected"],
+        }
+
+    def _batch_finished(self, batch: Dict[str, Any]) -> bool:
+        return all(self.jobs[job_id]["status"] in FINISHED_STATUSES
+                   for job_id in batch["job_ids"] if job_id in self.jobs)
+
+    async def _run_job(self, job_id: str, filepath: str, ontology_config: Dict[str, Any],
+                       content_hash: Optional[str]):
+        job = self.jobs[job_id]
+        async with self._semaphore:
+            job["status"] = "processing"
+            job["started_at"] = _now()
+            logger.info(f"Iniciando processamento da tarefa de documento {job_id}.")
+            try:
+                result = await self.document_processor.process_document_for_multiple_items(
+                    filepath, ontology_config, content_hash=content_hash
+                )
+                if "error" in result:
+                    job["status"] = "failed"
+                    job["error"] = result["error"]
+                else:
+                    job["status"] = "completed"
+                    job["result"] = result
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = str(e)
+                logger.error(f"Falha ao processar a tarefa de documento {job_id}: {e}")
+            job["finished_at"] = _now()
+            logger.info(f"Tarefa de documento {job_id} terminada com estado '{job['status']}'.")
+
+    def _prune_finished_jobs(self):
+        """
+        Esquece as tarefas terminadas mais antigas quando há mais de `max_finished_jobs`.
+
+        As tarefas de um lote ficam enquanto o lote existir; são esquecidas com ele.
+        """
+        finished = [job_id for job_id, job in self.jobs.items()
+                    if job["status"] in FINISHED_STATUSES and job["batch_id"] not in self.batches]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    def _prune_finished_batches(self):
+        """Esquece os lotes terminados mais antigos (e as suas tarefas) quando há mais de `max_finished_batches`."""
+        finished = [batch_id for batch_id, batch in self.batches.items() if self._batch_finished(batch)]
+        for batch_id in finished[:max(0, len(finished) - self.max_finished_batches)]:
+            for job_id in self.batches.pop(batch_id)["job_ids"]:
+                self.jobs.pop(job_id, None)
@@ -4,75 +4,408 @@ import io
 import re
 import uuid
 import json
+import time
 import asyncio  # <-- CORREÇÃO: Importação em falta adicionada
-import pytesseract
-import spacy
+import threading
+import functools
 from PIL import Image
-import fitz  # PyMuPDF
-from typing import Dict, Any, List
-import requests
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Iterator, AsyncIterator
+import httpx
+from apis.external_ia_clients import BaseIAClient
+from apis.gemini_client import GeminiClient
+from apis.llm_router import GeminiProvider
+from apis.provider_guard import ProviderUnavailableError
+from config import settings
+from core.extraction_cache import ExtractionCache, hash_file, ontology_fingerprint
+from core.ocr_backends import OCRBackend, get_ocr_backend
+from core.ocr_preprocessing import PROBE_DPI, binarize, choose_dpi, estimate_line_height
 
 # --- Bloco de inicialização ---
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), "..", "uploads")
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+# O spaCy e o PyMuPDF (fitz) não são importados aqui: o arranque da API e de cada worker
+# não paga o seu carregamento, que acontece na primeira utilização ou no aquecimento
+# em segundo plano (ver DocumentProcessorService.warm_up).
 NLP_MODEL_NAME = "pt_core_news_sm"
-try:
-    nlp = spacy.load(NLP_MODEL_NAME)
-    print(f"Modelo spaCy '{NLP_MODEL_NAME}' carregado com sucesso.")
-except OSError:
-    print(
-        f"ERRO: Modelo spaCy '{NLP_MODEL_NAME}' não encontrado. Execute 'python -m spacy download {NLP_MODEL_NAME}' e reinicie o servidor.")
-    nlp = None
+_nlp_model = None
+_nlp_model_loaded = False
+_nlp_model_lock = threading.Lock()
+
+
+def load_nlp_model():
+    """Carrega o modelo spaCy uma única vez por processo; devolve None se não estiver instalado."""
+    global _nlp_model, _nlp_model_loaded
+    if _nlp_model_loaded:
+        return _nlp_model
+    with _nlp_model_lock:
+        if not _nlp_model_loaded:
+            import spacy
+            try:
+                _nlp_model = spacy.load(NLP_MODEL_NAME)
+                print(f"Modelo spaCy '{NLP_MODEL_NAME}' carregado com sucesso.")
+            except OSError:
+                print(
+                    f"ERRO: Modelo spaCy '{NLP_MODEL_NAME}' não encontrado. Execute 'python -m spacy download {NLP_MODEL_NAME}' e reinicie o servidor.")
+                _nlp_model = None
+            _nlp_model_loaded = True
+    return _nlp_model
+
+
+def nlp_model_status() -> str:
+    """Estado do modelo spaCy: "por_carregar", "carregado" ou "indisponivel"."""
+    if not _nlp_model_loaded:
+        return "por_carregar"
+    return "carregado" if _nlp_model is not None else "indisponivel"
+
 
+# Versão do pipeline de extração: incrementar quando o OCR ou a extração de itens
+# mudarem, para invalidar os resultados guardados no cache.
+PIPELINE_VERSION = "2"
 
 # --- Fim do Bloco de inicialização ---
 
 
+# --- OCR de páginas (partilhado entre o processo principal e o pool de OCR) ---
+_worker_document = None  # (caminho, documento fitz) aberto em cada processo do pool
+_worker_backend = None  # motor de OCR criado uma vez em cada processo do pool
+# O PyMuPDF não é thread-safe: no processo da API, os documentos são lidos por vários threads
+# do executor (pedidos e tarefas em simultâneo), pelo que cada chamada ao fitz passa por aqui.
+_fitz_lock = threading.RLock()
+
+
+def _init_ocr_worker(backend_name: str, lang: str):
+    """Inicializador dos processos do pool: carrega o motor de OCR uma única vez por processo."""
+    global _worker_backend
+    _worker_backend = get_ocr_backend(backend_name, lang)
+
+
+@contextmanager
+def _rendered_page(page, dpi: int, preprocess: str):
+    """
+    Renderiza uma página do PDF como imagem PIL ("rgb", "gray" ou "binary").
+
+    A imagem partilha o buffer do pixmap (sem cópia) e ambos são libertados à saída do
+    bloco, para que apenas uma página renderizada exista em memória de cada vez.
+    """
+    import fitz  # PyMuPDF
+
+    mode = "RGB" if preprocess == "rgb" else "L"
+    with _fitz_lock:
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csRGB if mode == "RGB" else fitz.csGRAY)
+    img = Image.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, "raw", mode, pix.stride, 1)
+    try:
+        if preprocess == "binary":
+            binary_img = binarize(img)
+            img.close()
+            img = binary_img
+        yield img
+    finally:
+        img.close()
+        with _fitz_lock:
+            del pix
+
+
+def _choose_page_dpi(page, options: Dict[str, Any]) -> int:
+    """Escolhe a resolução de OCR a partir da altura das linhas numa renderização de sondagem."""
+    with _rendered_page(page, PROBE_DPI, "gray") as probe:
+        line_height = estimate_line_height(probe)
+    return choose_dpi(line_height, PROBE_DPI, options["target_line_px"], options["min_dpi"], options["dpi"])
+
+
+def _ocr_page(page, backend: OCRBackend, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Aplica OCR a uma página do PDF e devolve {"texto", "dpi", "confianca", "tempo_ms"}.
+
+    Em modo adaptativo, a página é reconhecida à resolução escolhida por _choose_page_dpi e
+    só é repetida à resolução máxima se a confiança ficar abaixo de options["min_confidence"].
+    """
+    start = time.perf_counter()
+    if not options["adaptive"]:
+        with _rendered_page(page, options["dpi"], options["preprocess"]) as img:
+            text = backend.image_to_string(img)
+        return {"texto": text, "dpi": options["dpi"], "confianca": None,
+                "tempo_ms": round((time.perf_counter() - start) * 1000)}
+
+    dpi = _choose_page_dpi(page, options)
+    with _rendered_page(page, dpi, options["preprocess"]) as img:
+        text, confidence = backend.recognize(img)
+
+    if confidence is not None and confidence < options["min_confidence"] and dpi < options["dpi"]:
+        with _rendered_page(page, options["dpi"], options["preprocess"]) as img:
+            retry_text, retry_confidence = backend.recognize(img)
+        if retry_confidence is None or retry_confidence >= confidence:
+            text, confidence, dpi = retry_text, retry_confidence, options["dpi"]
+
+    return {"texto": text, "dpi": dpi, "confianca": round(confidence, 1) if confidence is not None else None,
+            "tempo_ms": round((time.perf_counter() - start) * 1000)}
+
+
+def _ocr_pdf_page(filepath: str, page_index: int, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Executado nos processos do pool: reconhece uma única página de um PDF.
+
+    O documento fica aberto no processo entre chamadas, para não o reabrir a cada página.
+    """
+    import fitz  # PyMuPDF
+
+    global _worker_document
+    if _worker_document is None or _worker_document[0] != filepath:
+        if _worker_document is not None:
+            _worker_document[1].close()
+        _worker_document = (filepath, fitz.open(filepath))
+    return _ocr_page(_worker_document[1][page_index], _worker_backend, options)
+
+
 class OCRService:
     """Serviço para realizar OCR em imagens e PDFs."""
 
-    def extract_text(self, filepath: str) -> str:
+    def __init__(self, max_workers: Optional[int] = None, dpi: int = settings.OCR_DPI,
+                 lang: str = settings.OCR_LANG,
+                 min_text_layer_chars: int = settings.OCR_MIN_TEXT_LAYER_CHARS,
+                 backend: str = settings.OCR_BACKEND, engine_pool_size: int = settings.OCR_ENGINE_POOL_SIZE,
+                 adaptive: bool = settings.OCR_ADAPTIVE_DPI, min_dpi: int = settings.OCR_MIN_DPI,
+                 target_line_px: int = settings.OCR_TARGET_LINE_PX,
+                 min_confidence: float = settings.OCR_MIN_CONFIDENCE, preprocess: str = settings.OCR_PREPROCESS):
+        """
+        Args:
+            max_workers: Número de processos para o OCR paralelo de PDFs digitalizados.
+                         Por omissão usa OCR_MAX_WORKERS; com 1 o OCR é feito em série.
+            dpi: Resolução de renderização das páginas (a máxima, em modo adaptativo).
+            lang: Idioma do Tesseract.
+            min_text_layer_chars: Mínimo de caracteres (sem espaços) para que a camada de
+                                  texto de uma página seja usada em vez do OCR.
+            backend: Motor de OCR ("tesserocr" ou "pytesseract"); ver core/ocr_backends.py.
+            engine_pool_size: Reconhecedores persistentes no processo da API (OCR em série e
+                              imagens); cada processo do pool de OCR usa um.
+            adaptive: Escolhe a resolução de cada página pela altura das linhas de texto e
+                      repete a 'dpi' as páginas com confiança abaixo de 'min_confidence'.
+            min_dpi: Resolução mínima em modo adaptativo.
+            target_line_px: Altura pretendida, em píxeis, das linhas de texto renderizadas.
+            min_confidence: Confiança média (0-100) abaixo da qual a página é repetida.
+            preprocess: Renderização enviada ao OCR: "gray", "binary" (Otsu) ou "rgb".
+        """
+        self.max_workers = settings.OCR_MAX_WORKERS if max_workers is None else max_workers
+        self.dpi = dpi
+        self.lang = lang
+        self.min_text_layer_chars = min_text_layer_chars
+        self.backend_name = backend
+        self.engine_pool_size = engine_pool_size
+        self.page_options = {
+            "dpi": dpi,
+            "adaptive": adaptive,
+            "min_dpi": min(min_dpi, dpi),
+            "target_line_px": target_line_px,
+            "min_confidence": min_confidence,
+            "preprocess": preprocess,
+        }
+        self._executor = None
+        self._warmed_up = False
+
+    @property
+    def cache_signature(self) -> str:
+        """Parâmetros que alteram o texto extraído; fazem parte da chave do cache."""
+        options = ";".join(f"{key}={value}" for key, value in sorted(self.page_options.items()))
+        return f"lang={self.lang};min_chars={self.min_text_layer_chars};{options}"
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Cria o pool de processos na primeira utilização e reutiliza-o nos pedidos seguintes."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_ocr_worker,
+                                                 initargs=(self.backend_name, self.lang))
+            print(f"[OCRService] Pool de OCR iniciado com {self.max_workers} processos.")
+        return self._executor
+
+    def _backend(self) -> OCRBackend:
+        """Motor de OCR do processo atual, partilhado entre pedidos."""
+        return get_ocr_backend(self.backend_name, self.lang, self.engine_pool_size)
+
+    def warm_up(self):
+        """Carrega o PyMuPDF e o motor de OCR deste processo antes do primeiro documento."""
+        import fitz  # noqa: F401 (PyMuPDF)
+
+        self._backend()
+        self._warmed_up = True
+
+    def status(self) -> str:
+        """Estado do OCR: "por_carregar" ou "carregado"."""
+        return "carregado" if self._warmed_up else "por_carregar"
+
+    def shutdown(self):
+        """Termina o pool de processos de OCR, se tiver sido criado."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _has_text_layer(self, layer_text: str) -> bool:
+        return len("".join(layer_text.split())) >= self.min_text_layer_chars
+
+    def iter_pages(self, filepath: str) -> Iterator[Dict[str, Any]]:
+        """
+        Extrai o texto de um documento página a página, em ordem, como um gerador.
+
+        Em PDFs, cada página usa a sua camada de texto quando esta é utilizável e só as
+        restantes passam pelo OCR (em paralelo, se houver mais de um processo; no máximo
+        2 * max_workers páginas em curso). Cada página é entregue assim que está pronta:
+        {"pagina": 1, "metodo": "texto" | "ocr", "texto": "..."}; as páginas com OCR indicam
+        também "dpi", "confianca" e "tempo_ms".
+        Os erros de leitura ou de OCR são propagados a quem consome o gerador.
+        """
         filename = filepath.lower()
         print(f"[OCRService] A extrair texto de: {filepath}")
         if filename.endswith(('.png', '.jpg', '.jpeg')):
-            try:
-                return pytesseract.image_to_string(Image.open(filepath), lang='por')
-            except Exception as e:
-                print(f"ERRO OCR ao processar imagem {filepath}: {e}")
-                return ""
+            start = time.perf_counter()
+            with Image.open(filepath) as img:
+                text, confidence = self._backend().recognize(img)
+            yield {"pagina": 1, "metodo": "ocr", "texto": text, "dpi": None,
+                   "confianca": round(confidence, 1) if confidence is not None else None,
+                   "tempo_ms": round((time.perf_counter() - start) * 1000)}
         elif filename.endswith('.pdf'):
-            try:
+            import fitz  # PyMuPDF, carregado só quando há PDFs para ler
+
+            with _fitz_lock:
                 doc = fitz.open(filepath)
-                text = "".join(page.get_text() for page in doc)
-                doc.close()
-                if not text.strip():
-                    print("PDF sem texto extraível, tentando OCR página a página...")
-                    doc = fitz.open(filepath)
-                    full_text_ocr = ""
-                    for i, page in enumerate(doc):
-                        pix = page.get_pixmap(dpi=300)
-                        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                        full_text_ocr += pytesseract.image_to_string(img, lang='por') + "\n"
+                page_count = doc.page_count
+            try:
+                parallel = self.max_workers > 1 and page_count > 1
+                max_in_flight = 2 * self.max_workers
+                pending = deque()  # (número da página, método, texto, resultado do OCR ou Future)
+                ocr_pages = 0
+                for index in range(page_count):
+                    with _fitz_lock:
+                        page = doc[index]
+                        layer_text = page.get_text()
+                    if self._has_text_layer(layer_text):
+                        pending.append((index + 1, "texto", layer_text))
+                    else:
+                        ocr_pages += 1
+                        if parallel:
+                            future = self._get_executor().submit(_ocr_pdf_page, filepath, index, self.page_options)
+                            pending.append((index + 1, "ocr", future))
+                        else:
+                            pending.append((index + 1, "ocr", _ocr_page(page, self._backend(), self.page_options)))
+
+                    while pending and (len(pending) > max_in_flight or not isinstance(pending[0][2], Future)
+                                       or pending[0][2].done()):
+                        yield self._resolve_page(*pending.popleft())
+
+                while pending:
+                    yield self._resolve_page(*pending.popleft())
+                if ocr_pages:
+                    print(f"PDF com {ocr_pages} de {page_count} páginas sem texto extraível, processadas com OCR.")
+            finally:
+                with _fitz_lock:
+                    page = None
                     doc.close()
-                    return full_text_ocr
-                return text
-            except Exception as e:
-                print(f"ERRO ao processar PDF {filepath}: {e}")
-                return ""
-        return ""
+
+    @staticmethod
+    def _resolve_page(page_number: int, method: str, content) -> Dict[str, Any]:
+        if method == "ocr":
+            result = content.result() if isinstance(content, Future) else content
+            return {"pagina": page_number, "metodo": "ocr", "texto": result["texto"] + "\n", "dpi": result["dpi"],
+                    "confianca": result["confianca"], "tempo_ms": result["tempo_ms"]}
+        return {"pagina": page_number, "metodo": "texto", "texto": content}
+
+    def extract_pages(self, filepath: str) -> List[Dict[str, Any]]:
+        """Versão não incremental de iter_pages; devolve [] se a extração falhar."""
+        try:
+            return list(self.iter_pages(filepath))
+        except Exception as e:
+            print(f"ERRO ao extrair texto de {filepath}: {e}")
+            return []
+
+    def extract_text(self, filepath: str) -> str:
+        return "".join(page["texto"] for page in self.extract_pages(filepath))
+
+
+class TextChunker:
+    """
+    Agrupa texto recebido aos bocados (p. ex. página a página) em blocos de tamanho limitado.
+
+    Os cortes são feitos preferencialmente em fronteiras de página e, dentro de uma página,
+    em fronteiras de parágrafo, linha ou frase. Cada bloco começa com os últimos
+    `overlap_chars` caracteres do anterior, para que nada se perca nas fronteiras.
+    Só o bloco em construção fica em memória.
+    """
+
+    def __init__(self, chunk_chars: int, overlap_chars: int = 0):
+        self.chunk_chars = chunk_chars
+        # Com no máximo 1/4 de sobreposição e cortes depois de 1/2 bloco, cada corte avança.
+        self.overlap_chars = max(0, min(overlap_chars, chunk_chars // 4))
+        self._buffer = ""
+        self._fresh = 0  # caracteres do buffer que ainda não saíram em nenhum bloco
+
+    def feed(self, text: str) -> List[str]:
+        """Acrescenta texto e devolve os blocos que ficaram completos."""
+        chunks = []
+        if self._fresh and len(self._buffer) + len(text) > self.chunk_chars:
+            chunks.append(self._emit(len(self._buffer)))
+        self._buffer += text
+        self._fresh += len(text)
+        while len(self._buffer) > self.chunk_chars:
+            chunks.append(self._emit(self._boundary()))
+        return [chunk for chunk in chunks if chunk.strip()]
+
+    def flush(self) -> List[str]:
+        """Devolve o último bloco, se houver texto ainda não entregue."""
+        chunk = self._buffer if self._fresh else ""
+        self._buffer, self._fresh = "", 0
+        return [chunk] if chunk.strip() else []
+
+    def _boundary(self) -> int:
+        window = self._buffer[:self.chunk_chars]
+        for separator in ("\n\n", "\n", ". ", " "):
+            position = window.rfind(separator, self.chunk_chars // 2)
+            if position != -1:
+                return position + len(separator)
+        return self.chunk_chars
+
+    def _emit(self, end: int) -> str:
+        chunk, rest = self._buffer[:end], self._buffer[end:]
+        overlap = chunk[len(chunk) - self.overlap_chars:] if self.overlap_chars else ""
+        if " " in overlap:
+            overlap = overlap[overlap.index(" ") + 1:]
+        self._buffer = overlap + rest
+        self._fresh = len(rest)
+        return chunk
 
 
 class NLPService:
     """Serviço de NLP para extrair múltiplos itens estruturados de um texto."""
 
-    def __init__(self):
-        self.nlp_model = nlp
-        self.gemini_api_key = os.getenv("GEMINI_API_KEY")
-        if not self.gemini_api_key:
+    def __init__(self, executor: Optional[Executor] = None,
+                 llm_max_concurrency: int = settings.NLP_LLM_MAX_CONCURRENCY,
+                 gemini_client: Optional[GeminiClient] = None, llm: Optional[BaseIAClient] = None):
+        """
+        Args:
+            executor: Executor onde corre a extração heurística (CPU), fora do event loop.
+                      Se omitido, usa o executor por omissão do loop.
+            llm_max_concurrency: Máximo de blocos de texto enviados à IA em simultâneo.
+            gemini_client: Cliente do Gemini partilhado com os outros serviços; se omitido, é criado um.
+            llm: Cliente de IA usado na extração (p. ex. o LLMProviderRouter); se omitido, usa o Gemini.
+        """
+        self._nlp_model = None
+        self.executor = executor
+        self.llm_max_concurrency = max(1, llm_max_concurrency)
+        self.gemini_client = gemini_client or GeminiClient()
+        self.llm = llm or GeminiProvider(self.gemini_client)
+        if not self.llm.configured:
             print(
-                "\nAVISO: Variável de ambiente GEMINI_API_KEY não encontrada. A extração por IA será desativada. O sistema usará heurísticas locais.\n")
+                "\nAVISO: Nenhum fornecedor de IA configurado (GEMINI_API_KEY não encontrada). A extração por IA será desativada. O sistema usará heurísticas locais.\n")
+
+    @property
+    def nlp_model(self):
+        """Modelo spaCy, carregado na primeira utilização."""
+        if self._nlp_model is None:
+            self._nlp_model = load_nlp_model()
+        return self._nlp_model
+
+    @nlp_model.setter
+    def nlp_model(self, model):
+        self._nlp_model = model
 
     def _create_item_template(self, ontology_config: Dict[str, Any]) -> Dict[str, Any]:
         """Cria um dicionário em branco para um novo item."""
@@ -87,12 +420,8 @@ class NLPService:
             }
         }
 
-    def _extract_items_with_heuristics(self, text: str, ontology_config: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Função de fallback melhorada, focada em extrair dados da infobox."""
-        if not self.nlp_model:
-            raise ValueError("Modelo NLP (spaCy) não está carregado.")
-
-        print("Executando extração com heurísticas melhoradas (fallback)...")
+    def _match_heuristic_items(self, text: str, ontology_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Aplica as regras heurísticas a um bloco de texto."""
         items = []
         infobox_pattern = r'Principais\s*trabalhos\s*(.*?)\n'
         match = re.search(infobox_pattern, text, re.DOTALL | re.IGNORECASE)
@@ -110,11 +439,22 @@ class NLPService:
                 work_item["properties"] = {k: v for k, v in work_item["properties"].items() if v}
                 items.append(work_item)
 
-        print(f"Itens extraídos com heurísticas: {len(items)}")
         return items
 
-    async def _extract_items_with_llm(self, text: str, ontology_config: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Usa o Gemini para extrair itens de forma estruturada."""
+    @staticmethod
+    def _title_key(item: Dict[str, Any], ontology_config: Dict[str, Any]) -> str:
+        """Chave usada para eliminar itens repetidos entre blocos de texto."""
+        title = item.get("properties", {}).get(ontology_config.get("TITLE_PROPERTY")) or ""
+        return " ".join(str(title).lower().split())
+
+    async def _request_llm_items(self, text: str, ontology_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Pede à IA os itens de um texto.
+
+        Raises:
+            ProviderUnavailableError, httpx.HTTPError: se o fornecedor de IA falhar.
+            ValueError: se a resposta não trouxer um array JSON válido.
+        """
         print("Executando extração com a API do Gemini...")
 
         title_prop = ontology_config.get("TITLE_PROPERTY")
@@ -135,89 +475,307 @@ class NLPService:
 
         Texto para análise:
         ---
-        {text[:8000]}
+        {text}
         ---
         """
 
-        api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent?key={self.gemini_api_key}"
-        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        content = await self.llm.generate_text_async(prompt, timeout=90)
+
+        json_match = re.search(r'\[.*\]', content, re.DOTALL)
+        if not json_match:
+            raise ValueError(f"Nenhum array JSON válido encontrado na resposta da IA. Resposta recebida: {content}")
 
         try:
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(None, lambda: requests.post(api_url, json=payload, timeout=90))
-            response.raise_for_status()
-            api_result = response.json()
-
-            content = api_result['candidates'][0]['content']['parts'][0]['text']
-
-            json_match = re.search(r'\[.*\]', content, re.DOTALL)
-            if not json_match:
-                print(f"ERRO: Nenhum array JSON válido encontrado na resposta da IA. Resposta recebida: {content}")
-                return []
-
-            cleaned_content = json_match.group(0)
-            parsed_response = json.loads(cleaned_content)
-
-            final_items = []
-            for res_item in parsed_response:
-                item_template = self._create_item_template(ontology_config)
-                item_template["properties"].update(res_item)
-                item_template["properties"][ontology_config.get(
-                    "DESCRIPTION_PROPERTY")] = f"Item '{res_item.get(title_prop, 'N/A')}' extraído e contextualizado via IA."
-                item_template["properties"] = {k: v for k, v in item_template["properties"].items() if v}
-                final_items.append(item_template)
-
-            return final_items
-
-        except requests.exceptions.RequestException as e:
-            print(f"ERRO: Falha na chamada à API do Gemini: {e}")
-        except json.JSONDecodeError:
-            print(f"ERRO: Falha ao processar JSON da resposta da IA. Resposta recebida: {content}")
-        except Exception as e:
-            print(f"ERRO: Erro inesperado durante a extração com IA: {e}")
+            parsed_response = json.loads(json_match.group(0))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Falha ao processar JSON da resposta da IA. Resposta recebida: {content}") from e
+
+        final_items = []
+        for res_item in parsed_response:
+            item_template = self._create_item_template(ontology_config)
+            item_template["properties"].update(res_item)
+            item_template["properties"][ontology_config.get(
+                "DESCRIPTION_PROPERTY")] = f"Item '{res_item.get(title_prop, 'N/A')}' extraído e contextualizado via IA."
+            item_template["properties"] = {k: v for k, v in item_template["properties"].items() if v}
+            final_items.append(item_template)
 
-        return []
+        return final_items
 
     async def extract_multiple_structured_items(self, text: str, ontology_config: Dict[str, Any]) -> List[
         Dict[str, Any]]:
         """Orquestra a extração, priorizando IA se configurada, com fallback para heurísticas."""
-        if self.gemini_api_key:
-            try:
-                items = await self._extract_items_with_llm(text, ontology_config)
-                if items:
-                    print(f"Extração com IA bem-sucedida. {len(items)} itens encontrados.")
-                    return items
-                print("AVISO: Extração com IA não retornou itens. Usando heurísticas como fallback.")
-            except Exception as e:
-                print(f"ERRO: A extração com IA falhou: {e}. Usando heurísticas como fallback.")
+        async def single_text():
+            yield text
+
+        return await self.extract_items_from_text_stream(single_text(), ontology_config)
+
+    async def extract_items_from_text_stream(self, texts: AsyncIterator[str], ontology_config: Dict[str, Any],
+                                             outcome: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Extrai itens de um texto recebido aos bocados (p. ex. página a página), sem o reunir em memória.
+
+        O texto é agrupado em blocos sobrepostos (NLP_CHUNK_CHARS), cortados em fronteiras de
+        página ou de frase. Cada bloco é enviado à IA assim que fica completo, com no máximo
+        NLP_LLM_MAX_CONCURRENCY chamadas em simultâneo, e as listas de itens de cada bloco são
+        fundidas sem repetir títulos. As heurísticas são aplicadas a cada bloco à medida que
+        chega e só são usadas se a IA não estiver configurada ou não devolver itens.
+
+        Args:
+            outcome: Se dado, é preenchido com a origem dos itens ("source": "llm" ou
+                     "heuristics") e com "complete": se a IA respondeu a todos os blocos.
+                     Itens de uma extração incompleta (disjuntor aberto, falha da IA) não
+                     devem ficar em cache.
+        """
+        if outcome is None:
+            outcome = {}
+        outcome.update(source="heuristics", complete=False)
+        loop = asyncio.get_running_loop()
+        # O primeiro acesso pode carregar o modelo spaCy: é feito fora do event loop.
+        nlp_model = await loop.run_in_executor(self.executor, lambda: self.nlp_model)
+        chunker = TextChunker(settings.NLP_CHUNK_CHARS, settings.NLP_CHUNK_OVERLAP_CHARS)
+        llm_slots = asyncio.Semaphore(self.llm_max_concurrency)
+        llm_tasks: List[asyncio.Task] = []
+        pending_llm_tasks = set()
+        heuristic_items: Dict[str, Dict[str, Any]] = {}
+        has_text = False
+        llm_skipped = False
+
+        async def call_llm(chunk: str) -> List[Dict[str, Any]]:
+            async with llm_slots:
+                return await self._request_llm_items(chunk, ontology_config)
+
+        async def handle_chunk(chunk: str):
+            nonlocal has_text, llm_skipped
+            has_text = True
+            if not (self.llm.configured and self.llm.healthy):
+                llm_skipped = True
+            else:
+                # Limita os blocos à espera da IA, para não acumular o documento em memória.
+                while len(pending_llm_tasks) >= 2 * self.llm_max_concurrency:
+                    await asyncio.wait(pending_llm_tasks, return_when=asyncio.FIRST_COMPLETED)
+                task = asyncio.create_task(call_llm(chunk))
+                llm_tasks.append(task)
+                pending_llm_tasks.add(task)
+                task.add_done_callback(pending_llm_tasks.discard)
+            if nlp_model:
+                chunk_items = await loop.run_in_executor(self.executor, self._match_heuristic_items, chunk, ontology_config)
+                for item in chunk_items:
+                    heuristic_items.setdefault(self._title_key(item, ontology_config), item)
+
+        try:
+            async for text in texts:
+                for chunk in chunker.feed(text):
+                    await handle_chunk(chunk)
+            for chunk in chunker.flush():
+                await handle_chunk(chunk)
+        except BaseException:
+            for task in llm_tasks:
+                task.cancel()
+            raise
+
+        if llm_tasks:
+            print(f"Extração com IA distribuída por {len(llm_tasks)} blocos de texto.")
+            results = await asyncio.gather(*llm_tasks, return_exceptions=True)
+            chunk_item_lists = []
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"ERRO: A extração com IA falhou num bloco de texto: {result}")
+                else:
+                    chunk_item_lists.append(result)
+            items = self._merge_chunk_items(chunk_item_lists, ontology_config)
+            if items:
+                print(f"Extração com IA bem-sucedida. {len(items)} itens encontrados.")
+                outcome.update(source="llm", complete=not llm_skipped and len(chunk_item_lists) == len(results))
+                return items
+            print("AVISO: Extração com IA não retornou itens. Usando heurísticas como fallback.")
+
+        if not has_text:
+            return []
+        if not nlp_model:
+            raise ValueError("Modelo NLP (spaCy) não está carregado.")
+        print(f"Itens extraídos com heurísticas: {len(heuristic_items)}")
+        return list(heuristic_items.values())
 
-        return self._extract_items_with_heuristics(text, ontology_config)
+    def _merge_chunk_items(self, chunk_item_lists: List[List[Dict[str, Any]]],
+                           ontology_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Funde as listas de itens dos vários blocos, pela ordem dos blocos.
+
+        Itens com o mesmo título (sem distinguir maiúsculas e espaços) são fundidos num só,
+        completando as propriedades em falta com as das ocorrências seguintes.
+        """
+        merged: Dict[str, Dict[str, Any]] = {}
+        untitled = []
+        for chunk_items in chunk_item_lists:
+            for item in chunk_items:
+                key = self._title_key(item, ontology_config)
+                if not key:
+                    untitled.append(item)
+                elif key not in merged:
+                    merged[key] = item
+                else:
+                    properties = merged[key]["properties"]
+                    for prop, value in item.get("properties", {}).items():
+                        properties.setdefault(prop, value)
+        return list(merged.values()) + untitled
+
+
+class _ExtractionSummary:
+    """O que o DocumentProcessorService guarda de um documento enquanto o texto passa em fluxo."""
+
+    SAMPLE_CHARS = 1000
+
+    def __init__(self):
+        self.sample = ""
+        self.pages: List[Dict[str, Any]] = []
+        self.has_text = False
+        self.failed = False
+
+    def add(self, page: Dict[str, Any]):
+        text = page["texto"]
+        if len(self.sample) < self.SAMPLE_CHARS:
+            self.sample += text[:self.SAMPLE_CHARS - len(self.sample)]
+        self.has_text = self.has_text or bool(text.strip())
+        report = {"pagina": page["pagina"], "metodo": page["metodo"], "caracteres": len(text)}
+        for key in ("dpi", "confianca", "tempo_ms"):
+            if key in page:
+                report[key] = page[key]
+        self.pages.append(report)
 
 
 class DocumentProcessorService:
     """Orquestra o processo de extração e mapeamento de múltiplos itens."""
 
-    def __init__(self, ocr_service: OCRService, nlp_service: NLPService):
+    def __init__(self, ocr_service: OCRService, nlp_service: NLPService,
+                 cache: Optional[ExtractionCache] = None, executor: Optional[Executor] = None):
+        """
+        Args:
+            cache: Cache de extração opcional, endereçado pelo conteúdo do ficheiro.
+            executor: Executor limitado onde correm o OCR, o hash e o acesso ao cache, para não
+                      bloquear o event loop. Se omitido, usa o executor por omissão do loop.
+        """
         self.ocr_service = ocr_service
         self.nlp_service = nlp_service
+        self.cache = cache
+        self.executor = executor
         print("DocumentProcessorService inicializado.")
 
-    async def process_document_for_multiple_items(self, filepath: str, ontology_config: Dict[str, Any]) -> Dict[
-        str, Any]:
+    def warm_up(self):
+        """Carrega antecipadamente o modelo spaCy, o PyMuPDF e o motor de OCR (bloqueante)."""
+        self.nlp_service.nlp_model
+        self.ocr_service.warm_up()
+
+    def component_status(self) -> Dict[str, str]:
+        """Estado de carregamento das dependências pesadas do processamento de documentos."""
+        return {"modelo_nlp": nlp_model_status(), "ocr": self.ocr_service.status()}
+
+    def _open_page_source(self, filepath: str, content_hash: Optional[str], pipeline_key: str):
+        """Devolve (iterador de páginas, escritor do cache ou None), usando o cache quando possível."""
+        if self.cache and content_hash:
+            cached_pages = self.cache.iter_pages(content_hash, pipeline_key)
+            if cached_pages is not None:
+                print(f"[DocumentProcessor] Texto de {content_hash[:12]} obtido do cache.")
+                return cached_pages, None
+            return self.ocr_service.iter_pages(filepath), self.cache.open_page_writer(content_hash, pipeline_key)
+        return self.ocr_service.iter_pages(filepath), None
+
+    @staticmethod
+    def _next_page(pages: Iterator[Dict[str, Any]], writer) -> Optional[Dict[str, Any]]:
+        page = next(pages, None)
+        if page is not None and writer is not None:
+            writer.write(page)
+        return page
+
+    async def _stream_page_texts(self, filepath: str, pages: Iterator[Dict[str, Any]], writer,
+                                 summary: _ExtractionSummary) -> AsyncIterator[str]:
+        """
+        Percorre as páginas no executor, uma de cada vez, e entrega o texto de cada uma.
+
+        Cada página é registada no resumo e no cache à medida que passa; a entrada do cache
+        só é confirmada se o documento for lido até ao fim.
+        """
+        loop = asyncio.get_running_loop()
+        completed = False
+        try:
+            while True:
+                page = await loop.run_in_executor(self.executor, self._next_page, pages, writer)
+                if page is None:
+                    completed = True
+                    break
+                summary.add(page)
+                yield page["texto"]
+        except Exception as e:
+            summary.failed = True
+            print(f"ERRO ao extrair texto de {filepath}: {e}")
+        finally:
+            if hasattr(pages, "close"):
+                pages.close()
+            if writer is not None:
+                if completed and summary.has_text:
+                    await loop.run_in_executor(self.executor, writer.commit)
+                else:
+                    writer.abort()
+
+    async def process_document_for_multiple_items(self, filepath: str, ontology_config: Dict[str, Any],
+                                                  content_hash: Optional[str] = None) -> Dict[str, Any]:
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"Ficheiro não encontrado em {filepath}")
 
-        extracted_text = self.ocr_service.extract_text(filepath)
-        if not extracted_text or not extracted_text.strip():
-            return {"error": "Não foi possível extrair texto do documento."}
+        loop = asyncio.get_running_loop()
+        pipeline_key = f"v{PIPELINE_VERSION};{self.ocr_service.cache_signature}"
+        if self.cache and not content_hash:
+            content_hash = await loop.run_in_executor(self.executor, hash_file, filepath)
+
+        structured_items = None
+        outcome: Dict[str, Any] = {}
+        if self.cache:
+            ontology_key = ontology_fingerprint(ontology_config)
+            cached = await loop.run_in_executor(
+                self.executor, self.cache.get_extraction, content_hash, pipeline_key, ontology_key
+            )
+            if cached is not None:
+                print(f"[DocumentProcessor] Itens de {content_hash[:12]} obtidos do cache.")
+                if cached["sample"] is not None:
+                    # A amostra e o relatório das páginas estão guardados com os itens: não é preciso ler o documento.
+                    return {
+                        "texto_extraido_amostra": cached["sample"] + "...",
+                        "itens_catalogados": cached["items"],
+                        "paginas": cached["pages"],
+                    }
+                structured_items = cached["items"]
+
+        pages, writer = await loop.run_in_executor(
+            self.executor, self._open_page_source, filepath, content_hash, pipeline_key
+        )
+        summary = _ExtractionSummary()
+        page_texts = self._stream_page_texts(filepath, pages, writer, summary)
 
         try:
-            structured_items = await self.nlp_service.extract_multiple_structured_items(extracted_text, ontology_config)
-            return {
-                "texto_extraido_amostra": extracted_text[:1000] + "...",
-                "itens_catalogados": structured_items,
-            }
+            if structured_items is not None:
+                # Entrada antiga do cache, só com os itens: o texto é percorrido para a amostra e o relatório.
+                async for _ in page_texts:
+                    pass
+            else:
+                structured_items = await self.nlp_service.extract_items_from_text_stream(page_texts, ontology_config, outcome)
         except ValueError as e:
             print(f"Erro de processamento: {e}")
             return {"error": str(e)}
+        finally:
+            await page_texts.aclose()
+
+        if summary.failed or not summary.has_text:
+            return {"error": "Não foi possível extrair texto do documento."}
 
+        # Só ficam em cache os itens de uma extração completa pela IA: as heurísticas usadas com o
+        # disjuntor aberto ou após uma falha da IA ficariam presas ao documento.
+        if self.cache and structured_items and outcome.get("source") == "llm" and outcome.get("complete"):
+            await loop.run_in_executor(
+                self.executor, functools.partial(self.cache.put_items, content_hash, pipeline_key, ontology_key,
+                                                 structured_items, sample=summary.sample, pages=summary.pages)
+            )
+
+        return {
+            "texto_extraido_amostra": summary.sample + "...",
+            "itens_catalogados": structured_items,
+            "paginas": summary.pages,
+        }
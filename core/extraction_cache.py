@@ -0,0 +1,218 @@
+# memoria/core/extraction_cache.py
+"""
+Cache em disco dos resultados da extração de documentos.
+
+As entradas são endereçadas pelo conteúdo do ficheiro (SHA-256): o texto extraído
+(página a página) depende do hash e da versão do pipeline; os itens estruturados
+dependem ainda da ontologia ativa. O tamanho total é limitado e as entradas menos
+usadas recentemente são removidas primeiro.
+"""
+import os
+import json
+import uuid
+import hashlib
+import threading
+from typing import Dict, Any, List, Optional, Iterator
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(filepath: str) -> str:
+    """Calcula o SHA-256 do conteúdo de um ficheiro."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ontology_fingerprint(ontology_config: Dict[str, Any]) -> str:
+    """Identificador estável de uma configuração de ontologia, usado nas chaves do cache."""
+    serialized = json.dumps(ontology_config, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()[:16]
+
+
+class DiskCache:
+    """
+    Cache LRU em disco, limitado em bytes, com uma entrada por ficheiro.
+
+    A recência de cada entrada é a data de modificação do ficheiro, atualizada a cada
+    leitura bem-sucedida; a remoção começa pelas entradas mais antigas.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, *key_parts: str, suffix: str) -> str:
+        key = hashlib.sha256("|".join(key_parts).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def _read_json(self, path: str) -> Optional[Any]:
+        """Lê uma entrada JSON e marca-a como usada; devolve None se não existir ou estiver corrompida."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        self._touch(path)
+        return value
+
+    # --- Armazenamento e remoção ---
+
+    def _touch(self, path: str):
+        try:
+            os.utime(path, None)
+        except FileNotFoundError:
+            pass
+
+    def _tmp_path(self, path: str) -> str:
+        return f"{path}.{uuid.uuid4().hex}.tmp"
+
+    def _write(self, path: str, content: str):
+        """Escreve uma entrada de forma atómica e aplica o limite de tamanho do cache."""
+        tmp_path = self._tmp_path(path)
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+        except OSError as e:
+            print(f"ERRO: Falha ao escrever no cache {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._commit(tmp_path, path)
+
+    def _commit(self, tmp_path: str, path: str):
+        try:
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"ERRO: Falha ao escrever no cache {path}: {e}")
+            return
+        self._evict()
+
+    def _evict(self):
+        """Remove as entradas menos usadas recentemente até o cache caber em max_bytes."""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if not entry.is_file() or entry.name.endswith(".tmp"):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            for _mtime, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= self.max_bytes:
+                    break
+            print(f"[{type(self).__name__}] Entradas antigas removidas; tamanho atual: {total} bytes.")
+
+
+class ExtractionCache(DiskCache):
+    """Cache LRU em disco, limitado em bytes, para texto extraído e itens estruturados."""
+
+    PAGES_SUFFIX = ".pages.jsonl"
+    ITEMS_SUFFIX = ".items.json"
+
+    # --- Chaves ---
+
+    def _pages_path(self, content_hash: str, pipeline_key: str) -> str:
+        return self._path(content_hash, pipeline_key, suffix=self.PAGES_SUFFIX)
+
+    def _items_path(self, content_hash: str, pipeline_key: str, ontology_key: str) -> str:
+        return self._path(content_hash, pipeline_key, ontology_key, suffix=self.ITEMS_SUFFIX)
+
+    # --- Texto por página ---
+
+    def get_pages(self, content_hash: str, pipeline_key: str) -> Optional[List[Dict[str, Any]]]:
+        """Devolve as páginas extraídas em cache, ou None se não existirem."""
+        pages = self.iter_pages(content_hash, pipeline_key)
+        if pages is None:
+            return None
+        try:
+            return list(pages)
+        except json.JSONDecodeError:
+            return None
+
+    def iter_pages(self, content_hash: str, pipeline_key: str) -> Optional[Iterator[Dict[str, Any]]]:
+        """Devolve um iterador que lê as páginas em cache uma a uma, ou None se não existirem."""
+        path = self._pages_path(content_hash, pipeline_key)
+        if not os.path.exists(path):
+            return None
+        self._touch(path)
+        return self._read_jsonl(path)
+
+    @staticmethod
+    def _read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def put_pages(self, content_hash: str, pipeline_key: str, pages: List[Dict[str, Any]]):
+        """Guarda as páginas extraídas (uma página JSON por linha)."""
+        writer = self.open_page_writer(content_hash, pipeline_key)
+        for page in pages:
+            writer.write(page)
+        writer.commit()
+
+    def open_page_writer(self, content_hash: str, pipeline_key: str) -> "CachePageWriter":
+        """Abre um escritor incremental de páginas; a entrada só fica visível após commit()."""
+        return CachePageWriter(self, self._pages_path(content_hash, pipeline_key))
+
+    # --- Itens estruturados ---
+
+    def get_extraction(self, content_hash: str, pipeline_key: str, ontology_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Devolve o resultado em cache ({"items", "sample", "pages"}), ou None se não existir.
+        Nas entradas antigas, só com os itens, "sample" e "pages" são None.
+        """
+        value = self._read_json(self._items_path(content_hash, pipeline_key, ontology_key))
+        if isinstance(value, list):
+            return {"items": value, "sample": None, "pages": None}
+        return value
+
+    def get_items(self, content_hash: str, pipeline_key: str, ontology_key: str) -> Optional[List[Dict[str, Any]]]:
+        """Devolve os itens estruturados em cache, ou None se não existirem."""
+        extraction = self.get_extraction(content_hash, pipeline_key, ontology_key)
+        return extraction["items"] if extraction is not None else None
+
+    def put_items(self, content_hash: str, pipeline_key: str, ontology_key: str, items: List[Dict[str, Any]],
+                  sample: Optional[str] = None, pages: Optional[List[Dict[str, Any]]] = None):
+        """Guarda os itens estruturados extraídos de um documento, com a amostra do texto e o relatório das páginas."""
+        self._write(self._items_path(content_hash, pipeline_key, ontology_key),
+                    json.dumps({"items": items, "sample": sample, "pages": pages}, ensure_ascii=False))
+
+
+class CachePageWriter:
+    """Escreve as páginas de um documento no cache à medida que são extraídas."""
+
+    def __init__(self, cache: ExtractionCache, path: str):
+        self.cache = cache
+        self.path = path
+        self.tmp_path = cache._tmp_path(path)
+        self._file = open(self.tmp_path, "w", encoding="utf-8")
+
+    def write(self, page: Dict[str, Any]):
+        self._file.write(json.dumps(page, ensure_ascii=False) + "\n")
+
+    def commit(self):
+        """Torna a entrada visível no cache (substituição atómica)."""
+        self._file.close()
+        self.cache._commit(self.tmp_path, self.path)
+
+    def abort(self):
+        """Descarta as páginas escritas, por exemplo quando a extração falhou a meio."""
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
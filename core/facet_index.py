@@ -0,0 +1,178 @@
+# memoria/core/facet_index.py
+"""
+Facetas (autor, local, data) dos itens catalogados, para filtrar a busca e contar resultados.
+
+Cada item ocupa uma linha (um bit) e cada valor de faceta guarda um bitmap (um int de
+Python) com os bits dos itens que o têm. Filtrar é um AND entre facetas e um OR entre
+valores da mesma faceta; contar as facetas de um conjunto de resultados é um AND e um
+popcount (int.bit_count) por valor, sem voltar a percorrer os itens. As linhas dos itens
+retirados são reaproveitadas.
+
+Os bitmaps não são reescritos a cada item: `bitmap | 1 << linha` copia o int inteiro, pelo
+que indexar N itens com um valor comum custaria O(N²). As linhas acrescentadas e retiradas
+ficam pendentes por valor e são aplicadas de uma vez (um bitmap novo por valor) antes de
+filtrar ou contar; um preenchimento de milhares de itens escreve cada bitmap uma só vez.
+"""
+import re
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+from core.text_utils import fold_text
+
+FACET_FIELDS = ("author", "place", "date")
+
+_YEAR_RE = re.compile(r"\b(\d{4})\b")
+
+
+def facet_key(field: str, value: Any) -> str:
+    """Valor normalizado de uma faceta; as datas são agrupadas por ano ('23 de outubro de 1906' -> '1906')."""
+    text = " ".join(str(value).split())
+    if field == "date":
+        year = _YEAR_RE.search(text)
+        if year:
+            return year.group(1)
+    return fold_text(text)
+
+
+def _values(value: Any) -> List[str]:
+    if value is None:
+        return []
+    values = value if isinstance(value, (list, tuple, set)) else [value]
+    return [str(v) for v in values if v is not None and str(v).strip()]
+
+
+def _bitmap(rows: Iterable[int]) -> int:
+    bits = bytearray()
+    for row in rows:
+        byte = row >> 3
+        if byte >= len(bits):
+            bits.extend(bytes(byte + 1 - len(bits)))
+        bits[byte] |= 1 << (row & 7)
+    return int.from_bytes(bits, "little")
+
+
+def _rows(bitmap: int) -> List[int]:
+    binary = bin(bitmap)[:1:-1]
+    return [row for row, bit in enumerate(binary) if bit == "1"]
+
+
+class FacetIndex:
+    """Bitmaps por valor de faceta, mantidos incrementalmente."""
+
+    def __init__(self, fields: Sequence[str] = FACET_FIELDS):
+        self.fields = tuple(fields)
+        self._keys: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._bitmaps: Dict[str, Dict[str, int]] = {field: {} for field in self.fields}
+        # Alterações por aplicar aos bitmaps: {campo: {valor: {linha: presente}}}; a última de cada linha vale.
+        self._pending: Dict[str, Dict[str, Dict[int, bool]]] = {field: {} for field in self.fields}
+        self._sizes: Dict[str, Dict[str, int]] = {field: {} for field in self.fields}
+        self._labels: Dict[str, Dict[str, str]] = {field: {} for field in self.fields}
+        self._item_values: Dict[str, Dict[str, List[str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, item_id: str, values: Mapping[str, Any]):
+        """Indexa (ou substitui) as facetas de um item: {"author": "...", "place": [...], ...}."""
+        self.remove(item_id)
+        row = self._free.pop() if self._free else len(self._keys)
+        if row == len(self._keys):
+            self._keys.append(item_id)
+        else:
+            self._keys[row] = item_id
+        self._rows[item_id] = row
+        indexed: Dict[str, List[str]] = {}
+        for field in self.fields:
+            for value in _values(values.get(field)):
+                key = facet_key(field, value)
+                if not key or key in indexed.get(field, ()):
+                    continue
+                self._sizes[field][key] = self._sizes[field].get(key, 0) + 1
+                self._pending[field].setdefault(key, {})[row] = True
+                # O primeiro valor visto dá o rótulo ('Paris', não 'paris'); nas datas, o ano.
+                self._labels[field].setdefault(key, key if field == "date" and _YEAR_RE.fullmatch(key) else " ".join(value.split()))
+                indexed.setdefault(field, []).append(key)
+        self._item_values[item_id] = indexed
+
+    def remove(self, item_id: str) -> bool:
+        row = self._rows.pop(item_id, None)
+        if row is None:
+            return False
+        for field, keys in self._item_values.pop(item_id).items():
+            for key in keys:
+                size = self._sizes[field][key] - 1
+                if size:
+                    self._sizes[field][key] = size
+                    self._pending[field].setdefault(key, {})[row] = False
+                else:
+                    del self._sizes[field][key]
+                    del self._labels[field][key]
+                    self._bitmaps[field].pop(key, None)
+                    self._pending[field].pop(key, None)
+        self._keys[row] = None
+        self._free.append(row)
+        return True
+
+    def _flush(self, field: str):
+        """Aplica aos bitmaps do campo as linhas acrescentadas e retiradas desde a última vez."""
+        bitmaps = self._bitmaps[field]
+        for key, changes in self._pending[field].items():
+            added = _bitmap(row for row, present in changes.items() if present)
+            removed = _bitmap(row for row, present in changes.items() if not present)
+            bitmaps[key] = (bitmaps.get(key, 0) & ~removed) | added
+        self._pending[field].clear()
+
+    def mask_for(self, item_ids: Iterable[str]) -> int:
+        """Bitmap dos itens dados (os que não estão no índice são ignorados)."""
+        return _bitmap(self._rows[item_id] for item_id in item_ids if item_id in self._rows)
+
+    def filter_mask(self, filters: Mapping[str, Sequence[str]]) -> Optional[int]:
+        """
+        Bitmap dos itens que passam os filtros: em cada faceta basta um dos valores, e todas as
+        facetas filtradas têm de passar. Sem filtros devolve None (nenhuma restrição).
+
+        Raises:
+            ValueError: se uma faceta não existir.
+        """
+        mask: Optional[int] = None
+        for field, wanted in filters.items():
+            if not wanted:
+                continue
+            if field not in self._bitmaps:
+                raise ValueError(f"Faceta desconhecida: '{field}'.")
+            self._flush(field)
+            field_mask = 0
+            for value in wanted:
+                field_mask |= self._bitmaps[field].get(facet_key(field, value), 0)
+            mask = field_mask if mask is None else mask & field_mask
+        return mask
+
+    def ids(self, mask: int) -> List[str]:
+        """Ids dos itens de um bitmap, pela ordem das linhas."""
+        return [self._keys[row] for row in _rows(mask) if row < len(self._keys) and self._keys[row] is not None]
+
+    def contains(self, mask: int, item_id: str) -> bool:
+        row = self._rows.get(item_id)
+        return row is not None and bool(mask >> row & 1)
+
+    def counts(self, mask: Optional[int] = None, limit: int = 20) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Contagens de cada faceta no conjunto de itens `mask` (todos os itens, se None):
+        {"author": [{"value", "count"}, ...], ...}, dos valores mais frequentes para os menos.
+        """
+        facets: Dict[str, List[Dict[str, Any]]] = {}
+        for field in self.fields:
+            self._flush(field)
+            labels = self._labels[field]
+            counted = []
+            for key, bitmap in self._bitmaps[field].items():
+                count = (bitmap if mask is None else bitmap & mask).bit_count()
+                if count:
+                    counted.append((count, labels[key]))
+            counted.sort(key=lambda entry: (-entry[0], entry[1]))
+            facets[field] = [{"value": label, "count": count} for count, label in counted[:limit]]
+        return facets
+
+    def stats(self) -> Dict[str, Any]:
+        return {"items": len(self._rows), "values": {field: len(self._sizes[field]) for field in self.fields}}
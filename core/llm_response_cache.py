@@ -0,0 +1,102 @@
+# memoria/core/llm_response_cache.py
+"""
+Cache das respostas do modelo de linguagem.
+
+A chave de cada resposta é o hash do modelo e do pedido completo (prompt e configuração
+de geração), pelo que só um pedido idêntico reutiliza a resposta. Há um nível em memória
+(LRU, limitado em entradas) e um nível opcional em disco (LRU, limitado em bytes),
+partilhado entre reinícios e workers. As entradas expiram ao fim de `ttl_seconds`.
+"""
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from core.extraction_cache import DiskCache
+
+
+class CachedText(str):
+    """Texto de uma resposta servida do cache, sem chamada ao fornecedor (o LLMProviderRouter não a cronometra)."""
+
+
+def llm_cache_key(model: str, payload: Dict[str, Any]) -> str:
+    """Chave estável de um pedido: modelo, prompt e configuração de geração."""
+    serialized = json.dumps({"model": model, "payload": payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class LLMResponseDiskCache(DiskCache):
+    """Nível em disco do LLMResponseCache: uma resposta JSON (com a validade) por ficheiro."""
+
+    SUFFIX = ".llm.json"
+
+    def get(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        entry = self._read_json(self._path(key, suffix=self.SUFFIX))
+        if entry is None:
+            return None
+        return entry["expires_at"], entry["response"]
+
+    def put(self, key: str, expires_at: float, response: Dict[str, Any]):
+        entry = {"expires_at": expires_at, "response": response}
+        self._write(self._path(key, suffix=self.SUFFIX), json.dumps(entry, ensure_ascii=False))
+
+
+class LLMResponseCache:
+    """Cache de dois níveis (memória e, opcionalmente, disco) para respostas do modelo."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, disk_cache: Optional[LLMResponseDiskCache] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_cache = disk_cache
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Devolve a resposta em cache ainda válida, ou None."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+
+        if self.disk_cache is not None:
+            disk_entry = await asyncio.get_running_loop().run_in_executor(None, self.disk_cache.get, key)
+            if disk_entry is not None and disk_entry[0] > time.time():
+                self._remember(key, disk_entry)
+                self.hits += 1
+                self.disk_hits += 1
+                return disk_entry[1]
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, response: Dict[str, Any]):
+        """Guarda uma resposta nos dois níveis."""
+        entry = (time.time() + self.ttl_seconds, response)
+        self._remember(key, entry)
+        if self.disk_cache is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.disk_cache.put, key, *entry)
+
+    def _remember(self, key: str, entry: Tuple[float, Dict[str, Any]]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de utilização, expostos em /api/v1/metrics."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "memory_entries": len(self._entries),
+            "disk_enabled": self.disk_cache is not None,
+        }
@@ -0,0 +1,153 @@
+# memoria/core/ocr_backends.py
+"""
+Motores de OCR usados pelo OCRService.
+
+O motor por omissão é o tesserocr, que mantém instâncias da API do Tesseract carregadas
+em memória e as reutiliza entre páginas e pedidos. Se o tesserocr não estiver instalado
+(ou não conseguir inicializar), é usado o pytesseract, que lança um processo `tesseract`
+por imagem.
+"""
+import queue
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+import pytesseract
+
+
+class OCRBackend:
+    """Interface comum dos motores de OCR. O idioma é fixado na criação do motor."""
+
+    name = "base"
+
+    def __init__(self, lang: str):
+        self.lang = lang
+
+    def image_to_string(self, image) -> str:
+        """Reconhece o texto de uma imagem PIL."""
+        raise NotImplementedError("Este método deve ser implementado pela subclasse.")
+
+    def recognize(self, image) -> Tuple[str, Optional[float]]:
+        """Reconhece o texto de uma imagem e devolve (texto, confiança média 0-100 ou None)."""
+        return self.image_to_string(image), None
+
+    def close(self):
+        """Liberta os recursos do motor."""
+        pass
+
+
+class PytesseractBackend(OCRBackend):
+    """Motor baseado no pytesseract: um processo `tesseract` por imagem."""
+
+    name = "pytesseract"
+
+    def image_to_string(self, image) -> str:
+        return pytesseract.image_to_string(image, lang=self.lang)
+
+    def recognize(self, image) -> Tuple[str, Optional[float]]:
+        """
+        Numa só execução do tesseract, obtém o texto de image_to_string (com a disposição do
+        Tesseract) e o TSV de image_to_data, de onde vem a confiança média das palavras.
+        """
+        text, tsv = pytesseract.run_and_get_multiple_output(image, extensions=["txt", "tsv"], lang=self.lang)
+        rows = [line.split("\t") for line in tsv.splitlines()]
+        confidences = []
+        if rows:
+            conf_column, text_column = rows[0].index("conf"), rows[0].index("text")
+            for row in rows[1:]:
+                if len(row) <= text_column or not row[text_column].strip():
+                    continue
+                confidence = float(row[conf_column])
+                if confidence >= 0:
+                    confidences.append(confidence)
+        mean_confidence = sum(confidences) / len(confidences) if confidences else None
+        return text, mean_confidence
+
+
+class TesserocrBackend(OCRBackend):
+    """
+    Motor baseado no tesserocr, com um pool de reconhecedores de longa duração.
+
+    Cada reconhecedor (PyTessBaseAPI) carrega o traineddata uma única vez e é reutilizado.
+    São criados a pedido, até `pool_size`; um pedido que encontre todos ocupados espera.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, lang: str, pool_size: int = 1, api_factory: Optional[Callable[[str], object]] = None):
+        super().__init__(lang)
+        if api_factory is None:
+            import tesserocr  # Dependência opcional
+            api_factory = lambda language: tesserocr.PyTessBaseAPI(lang=language)
+        self.pool_size = max(1, pool_size)
+        self._api_factory = api_factory
+        self._available = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        # Cria já o primeiro reconhecedor, para que um traineddata em falta seja detetado aqui.
+        self._available.put(self._create_api())
+
+    def _create_api(self):
+        api = self._api_factory(self.lang)
+        self._created += 1
+        return api
+
+    def _acquire(self):
+        try:
+            return self._available.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.pool_size:
+                return self._create_api()
+        return self._available.get()
+
+    def image_to_string(self, image) -> str:
+        return self.recognize(image)[0]
+
+    def recognize(self, image) -> Tuple[str, Optional[float]]:
+        api = self._acquire()
+        try:
+            api.SetImage(image)
+            return api.GetUTF8Text(), float(api.MeanTextConf())
+        finally:
+            self._available.put(api)
+
+    def close(self):
+        while True:
+            try:
+                self._available.get_nowait().End()
+            except queue.Empty:
+                break
+
+
+BACKENDS = {
+    PytesseractBackend.name: PytesseractBackend,
+    TesserocrBackend.name: TesserocrBackend,
+}
+
+
+def create_ocr_backend(name: str, lang: str, pool_size: int = 1) -> OCRBackend:
+    """Cria o motor pedido, recorrendo ao pytesseract se este não estiver disponível."""
+    if name == TesserocrBackend.name:
+        try:
+            return TesserocrBackend(lang, pool_size=pool_size)
+        except (ImportError, RuntimeError) as e:
+            print(f"AVISO: Motor OCR 'tesserocr' indisponível ({e}). A usar pytesseract.")
+            return PytesseractBackend(lang)
+    if name not in BACKENDS:
+        print(f"AVISO: Motor OCR '{name}' desconhecido. A usar pytesseract.")
+    return PytesseractBackend(lang)
+
+
+# Um motor por (nome, idioma) em cada processo: no processo da API e em cada processo do pool de OCR.
+_process_backends: Dict[Tuple[str, str], OCRBackend] = {}
+_process_backends_lock = threading.Lock()
+
+
+def get_ocr_backend(name: str, lang: str, pool_size: int = 1) -> OCRBackend:
+    """Devolve o motor deste processo, criando-o na primeira utilização."""
+    key = (name, lang)
+    with _process_backends_lock:
+        if key not in _process_backends:
+            _process_backends[key] = create_ocr_backend(name, lang, pool_size)
+        return _process_backends[key]
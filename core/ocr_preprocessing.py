@@ -0,0 +1,90 @@
+# memoria/core/ocr_preprocessing.py
+"""
+Pré-processamento das páginas digitalizadas antes do OCR.
+
+A resolução de cada página é escolhida a partir da altura das linhas de texto, medida
+numa renderização rápida a baixa resolução: texto grande não precisa de 300 DPI para
+ser bem reconhecido, e menos píxeis tornam o Tesseract proporcionalmente mais rápido.
+"""
+from typing import Optional
+
+from PIL import Image
+
+# Resolução da renderização de sondagem usada para medir o texto.
+PROBE_DPI = 72
+# Diferença mínima de luminosidade (0-255) entre uma linha de texto e o fundo.
+INK_DELTA = 10
+
+
+def estimate_line_height(gray_image: Image.Image) -> Optional[float]:
+    """
+    Estima a altura mediana (em píxeis) das linhas de texto de uma imagem em tons de cinzento.
+
+    Cada linha de píxeis é reduzida à sua luminosidade média (Image.BOX, em C); as linhas de
+    texto aparecem como sequências de linhas mais escuras do que o fundo. Devolve None se
+    não for encontrado texto.
+    """
+    width, height = gray_image.size
+    if not width or not height:
+        return None
+    profile = list(gray_image.resize((1, height), Image.BOX).getdata())
+    background = sorted(profile)[(len(profile) * 3) // 4]
+    threshold = background - INK_DELTA
+
+    runs = []
+    run = 0
+    for value in profile:
+        if value < threshold:
+            run += 1
+        elif run:
+            runs.append(run)
+            run = 0
+    if run:
+        runs.append(run)
+
+    runs = sorted(r for r in runs if r >= 2)
+    if not runs:
+        return None
+    return float(runs[len(runs) // 2])
+
+
+def choose_dpi(line_height: Optional[float], probe_dpi: int, target_line_px: int,
+               min_dpi: int, max_dpi: int) -> int:
+    """Resolução para que as linhas de texto fiquem com cerca de `target_line_px` de altura."""
+    if not line_height:
+        return max_dpi
+    dpi = int(round(probe_dpi * target_line_px / line_height / 10.0)) * 10
+    return max(min_dpi, min(max_dpi, dpi))
+
+
+def otsu_threshold(gray_image: Image.Image) -> int:
+    """Limiar de binarização de Otsu calculado a partir do histograma da imagem."""
+    histogram = gray_image.histogram()[:256]
+    total = sum(histogram)
+    if not total:
+        return 127
+    sum_total = sum(i * count for i, count in enumerate(histogram))
+    sum_background = 0.0
+    weight_background = 0
+    best_threshold, best_variance = 127, -1.0
+    for i, count in enumerate(histogram):
+        weight_background += count
+        if weight_background == 0:
+            continue
+        weight_foreground = total - weight_background
+        if weight_foreground == 0:
+            break
+        sum_background += i * count
+        mean_background = sum_background / weight_background
+        mean_foreground = (sum_total - sum_background) / weight_foreground
+        variance = weight_background * weight_foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_threshold, best_variance = i, variance
+    return best_threshold
+
+
+def binarize(gray_image: Image.Image) -> Image.Image:
+    """Converte uma imagem em tons de cinzento para preto e branco (modo "L", 0/255)."""
+    threshold = otsu_threshold(gray_image)
+    lookup = [0] * (threshold + 1) + [255] * (255 - threshold)
+    return gray_image.point(lookup)
@@ -1,8 +1,11 @@
 # memoria/core/persistence_service.py
 import asyncio
-from typing import List, Dict, Any
-from config import ontology_config  # Para aceder às propriedades da ontologia
+from typing import List, Dict, Any, Optional
+from config import ontology_config, settings  # Para aceder às propriedades da ontologia
 from storage.sparql_api_client import SPARQLAPIClient
+from core.search_engine import SearchEngine
+from core.title_index import TitleIndex
+from core.vector_index import SemanticIndex
 import logging
 #from aiohttp import ClientSession
 
@@ -16,9 +19,15 @@ class PersistenceService:
     verificando duplicados e preparando para futuras relações.
     """
 
-    def __init__(self, sparql_api_client: SPARQLAPIClient):
+    def __init__(self, sparql_api_client: SPARQLAPIClient, semantic_index: Optional[SemanticIndex] = None,
+                 search_engine: Optional[SearchEngine] = None):
         self.queue = asyncio.Queue()
         self.sparql_client = sparql_api_client
+        # Índices locais atualizados com cada item criado: o vetorial do chatbot e o da busca.
+        self.semantic_index = semantic_index
+        self.search_engine = search_engine
+        # Títulos já vistos em cada repositório, para detetar duplicados (mesmo título normalizado) sem ir à API Guará.
+        self.title_indexes: Dict[str, TitleIndex] = {}
         self.worker_task = None
         self.processing_status = {}  # Guarda o status por ID de tarefa
 
@@ -48,29 +57,46 @@ class PersistenceService:
 
             try:
                 for item in items:
-                    # Pequeno delay para não sobrecarregar a API Guará
-                    await asyncio.sleep(0.5)
-
                     title = item.get("properties", {}).get(ontology_config.TITLE_PROPERTY)
                     if not title:
                         self._log_result(task_id, item, "error", "Item sem título não pode ser processado.")
                         continue
 
-                    # 1. Verificar duplicados através da API Guará
+                    # 1a. Verificar duplicados no índice local de títulos. Só o mesmo título normalizado
+                    # (sem acentos, maiúsculas ou pontuação) é duplicado: a uma letra de distância
+                    # ("Carta de Maria" / "Carta de Mario") pode estar outro objeto, que segue para a API Guará.
+                    title_index = self._title_index(repo_config)
+                    local_matches = title_index.lookup(title, limit=1)
+                    if local_matches and local_matches[0]["distance"] == 0:
+                        existing_uri = local_matches[0]["id"]
+                        message = f"Item já existe no repositório ('{local_matches[0]['title']}'). URI: {existing_uri}"
+                        self._log_result(task_id, item, "duplicate", message, existing_uri)
+                        continue
+                    if local_matches:
+                        logger.info(f"Possível duplicado de '{title}': '{local_matches[0]['title']}' "
+                                    f"({local_matches[0]['id']}); a verificar na API Guará.")
+
+                    # Pequeno delay para não sobrecarregar a API Guará
+                    await asyncio.sleep(0.5)
+
+                    # 1b. Verificar duplicados através da API Guará
                     logger.info(f"Verificando duplicados para: '{title}'")
-                    existing_items = self.sparql_client.list_objects(title, repo_config)
+                    existing_items = self.sparql_client.list_objects(title, repo_config, limit=1)
 
                     if existing_items:
                         # 2a. Se existe, regista como duplicado
                         existing_uri = existing_items[0].get("obj", {}).get("value")
                         message = f"Item já existe no repositório. URI: {existing_uri}"
                         self._log_result(task_id, item, "duplicate", message, existing_uri)
+                        title_index.add(existing_uri or title, title)
                     else:
                         # 2b. Se não existe, cria o novo item
                         payload = self._prepare_payload(item)
                         result = self.sparql_client.create_dimensional_object(payload, repo_config)
                         new_uri = result.get("object_uri")
                         self._log_result(task_id, item, "created", f"Item criado com sucesso.", new_uri)
+                        title_index.add(new_uri or title, title)
+                        await self._index_item(repo_config, item, payload, new_uri)
 
             except Exception as e:
                 self.processing_status[task_id]['status'] = 'failed'
@@ -83,6 +109,32 @@ class PersistenceService:
             logger.info(f"Processamento da tarefa {task_id} concluído.")
             self.queue.task_done()
 
+    def _title_index(self, repo_config: Dict[str, str]) -> TitleIndex:
+        repository = repo_config.get("repository_name") or repo_config.get("repository_query_url", "")
+        if repository not in self.title_indexes:
+            self.title_indexes[repository] = TitleIndex(settings.TITLE_MATCH_MAX_DISTANCE)
+        return self.title_indexes[repository]
+
+    async def _index_item(self, repo_config: Dict[str, str], item: Dict[str, Any], payload: Dict[str, Any],
+                          uri: Optional[str]):
+        """Acrescenta o item criado aos índices locais (uma falha não afeta a tarefa)."""
+        item_id = uri or payload["titulo"]
+        if self.search_engine is not None:
+            properties = item.get("properties", {})
+            await self.search_engine.add_item_async(item_id, payload["titulo"], properties.get(ontology_config.AUTHOR_PROPERTY),
+                                                    payload.get("descricao"), properties.get("pc:temLocal"),
+                                                    properties.get("pc:temData"))
+
+        repository = repo_config.get("repository_name")
+        if self.semantic_index is None or not repository:
+            return
+        binding = {"obj": {"value": item_id}, "titulo": {"value": payload["titulo"]},
+                   "resumo": {"value": payload.get("resumo") or ""}}
+        try:
+            await self.semantic_index.add_items(repository, [(item_id, binding)])
+        except Exception as e:
+            logger.warning(f"Não foi possível indexar '{payload['titulo']}' no índice vetorial: {e}")
+
     def _log_result(self, task_id, item, status, message, uri=None):
         """Regista o resultado do processamento de um único item."""
         self.processing_status[task_id]["processed_items"] += 1
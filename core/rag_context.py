@@ -0,0 +1,126 @@
+# memoria/core/rag_context.py
+"""
+Montagem do contexto dos prompts RAG do chatbot.
+
+Os itens devolvidos pela busca são ordenados pela relevância para a pergunta (termos da
+pergunta no título e no resumo, pesados pela raridade entre os resultados), os quase
+duplicados são descartados e os restantes entram no contexto, por ordem, até se esgotar
+um orçamento de tokens. Cada item é truncado a um máximo próprio, para que um resumo
+longo não ocupe o orçamento todo.
+"""
+import math
+from typing import Any, Dict, List, Set, Tuple
+
+from core.text_utils import STOPWORDS, tokenize
+
+# Estimativa sem tokenizador: em média ~4 caracteres por token.
+CHARS_PER_TOKEN = 4
+# Semelhança (Jaccard das palavras) a partir da qual dois itens são o mesmo.
+DUPLICATE_SIMILARITY = 0.9
+# Um item que só caberia com menos tokens do que isto não entra no contexto.
+MIN_ITEM_TOKENS = 16
+
+# Palavras comuns nas perguntas ao chatbot que não dizem nada sobre os itens procurados.
+_QUESTION_STOPWORDS = STOPWORDS | {"quem", "qual", "quais", "como", "onde", "sobre", "conta", "historia"}
+
+NO_CONTEXT = "Nenhuma informação específica encontrada na base de dados."
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _terms(text: str) -> List[str]:
+    return tokenize(text, _QUESTION_STOPWORDS)
+
+
+def _truncate(text: str, max_tokens: int) -> Tuple[str, bool]:
+    """Corta o texto a `max_tokens` (estimados), numa fronteira de palavra."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text, False
+    cut = text[:max_chars - 1].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,.;:") + "…", True
+
+
+def _value(item: Dict[str, Any], key: str, default: str = "") -> str:
+    return item.get(key, {}).get("value", default)
+
+
+class ContextBuilder:
+    """Constrói o contexto de um prompt RAG dentro de um orçamento de tokens."""
+
+    def __init__(self, max_tokens: int, max_item_tokens: int):
+        self.max_tokens = max_tokens
+        self.max_item_tokens = max_item_tokens
+
+    @staticmethod
+    def rank(question: str, items: List[Dict[str, Any]]) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Ordena os itens pela relevância para a pergunta. Um termo da pergunta vale mais no
+        título do que no resumo e mais se aparecer em poucos resultados; em caso de empate
+        mantém-se a ordem da busca.
+        """
+        question_terms = set(_terms(question))
+        documents = [(set(_terms(_value(item, "titulo"))), set(_terms(_value(item, "resumo")))) for item in items]
+        document_frequency: Dict[str, int] = {}
+        for title_terms, summary_terms in documents:
+            for term in question_terms & (title_terms | summary_terms):
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+
+        scored = []
+        for item, (title_terms, summary_terms) in zip(items, documents):
+            score = 0.0
+            for term in question_terms:
+                if term in title_terms or term in summary_terms:
+                    weight = math.log(1 + len(items) / document_frequency[term])
+                    score += weight * (3.0 if term in title_terms else 1.0)
+            scored.append((score, item))
+        scored.sort(key=lambda entry: entry[0], reverse=True)
+        return scored
+
+    def build(self, question: str, items: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Devolve o texto do contexto, os itens usados (por ordem de relevância) e um resumo
+        da seleção (itens recuperados, usados, descartados, duplicados, truncados e tokens).
+        """
+        used_tokens = 0
+        kept: List[Dict[str, Any]] = []
+        kept_terms: List[Set[str]] = []
+        parts: List[str] = []
+        duplicates = truncated = 0
+
+        for _score, item in self.rank(question, items):
+            title, summary = _value(item, "titulo", "N/A"), _value(item, "resumo")
+            terms = set(_terms(f"{title} {summary}"))
+            if any(self._similarity(terms, other) >= DUPLICATE_SIMILARITY for other in kept_terms):
+                duplicates += 1
+                continue
+
+            remaining = self.max_tokens - used_tokens
+            item_budget = min(self.max_item_tokens, remaining)
+            if item_budget < MIN_ITEM_TOKENS:
+                continue
+            part, was_truncated = _truncate(f"Item: {title}. Detalhes: {summary}", item_budget)
+            truncated += was_truncated
+            used_tokens += estimate_tokens(part) + 1
+            kept.append(item)
+            kept_terms.append(terms)
+            parts.append(part)
+
+        selection = {
+            "retrieved": len(items),
+            "kept": len(kept),
+            "dropped": len(items) - len(kept),
+            "duplicates": duplicates,
+            "truncated": truncated,
+            "tokens": used_tokens,
+            "max_tokens": self.max_tokens,
+        }
+        return (" ".join(parts) if parts else NO_CONTEXT), kept, selection
+
+    @staticmethod
+    def _similarity(first: Set[str], second: Set[str]) -> float:
+        if not first and not second:
+            return 1.0
+        return len(first & second) / len(first | second)
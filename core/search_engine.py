@@ -1,11 +1,651 @@
 # Módulo para funcionalidades de busca em acervos e na internet.
+"""
+Busca local sobre os itens catalogados.
+
+Cada item é indexado num índice invertido (termo -> frequência por item) com os campos
+título, autor e descrição, pesados de forma diferente, e ordenado com BM25. Com um
+VectorIndex e um embedder, os itens são também procurados por semelhança semântica e as
+duas ordenações são combinadas por reciprocal rank fusion (RRF): cada item soma
+1 / (rrf_k + posição) em cada ordenação em que aparece. Os títulos ficam ainda num
+TitleIndex, para que uma pergunta com erros ("Dirigivel N 6") encontre o título certo.
+
+O índice é atualizado item a item (Cataloger e PersistenceService) e responde em memória,
+sem ir à API Guará. Com `documents_path`, cada alteração é também acrescentada a um registo
+JSON Lines (DocumentLog), reaplicado no arranque: o índice sobrevive a reinícios mesmo sem
+índice vetorial. Só contém os itens catalogados ou persistidos por esta API; os que já
+existiam na API Guará são encontrados pela fonte "repositories". A busca federada (search) consulta em simultâneo o índice local, os
+repositórios da API Guará e fontes externas, cada uma com o seu timeout e todas dentro de
+um prazo global: uma fonte lenta fica de fora em vez de atrasar a resposta. Os resultados
+são paginados por cursor ou emitidos em fluxo (search_stream) à medida que cada fonte
+responde. A primeira página guarda a ordenação juntada (até `pagination_depth` resultados de
+cada fonte) durante `snapshot_seconds`; as seguintes são lidas dessa fotografia, sem voltar às fontes,
+pelo que nem a pontuação RRF nem as fontes que responderam mudam entre páginas. As facetas (autor, local, data) dos itens locais ficam num
+FacetIndex, que filtra a busca e conta as facetas dos resultados.
+"""
+import os
+import json
+import math
+import time
+import base64
+import functools
+import heapq
+import uuid
+import tempfile
+import asyncio
+import logging
+from collections import Counter, OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from core.facet_index import FacetIndex
+from core.text_utils import tokenize
+from core.title_index import TitleIndex, normalize_title
+from core.vector_index import Embedder, VectorIndex
+
+logger = logging.getLogger(__name__)
+
+# Fonte externa da busca federada: função assíncrona (pergunta, limite) -> resultados.
+SourceSearch = Callable[[str, int], Awaitable[List[Dict[str, Any]]]]
+
+# Peso de cada campo na frequência dos termos (uma ocorrência no título vale por três na descrição).
+FIELD_WEIGHTS = {"title": 3.0, "author": 2.0, "description": 1.0}
+
+
+def _sort_key(entry: Dict[str, Any], validate_reliability: bool) -> Tuple[bool, float, str]:
+    """Ordem total dos resultados da busca federada: fiáveis primeiro, pontuação, e o id a desempatar."""
+    unreliable = not entry["reliable"] if validate_reliability else False
+    return unreliable, -entry["score"], str(entry.get("id") or entry.get("title", ""))
+
+
+def _filters_key(filters: Optional[Dict[str, Sequence[str]]]) -> Dict[str, List[str]]:
+    return {field: sorted(values) for field, values in sorted((filters or {}).items()) if values}
+
+
+def encode_cursor(query: str, sources: Sequence[str], validate_reliability: bool,
+                  after: Tuple[bool, float, str], returned: int,
+                  filters: Optional[Dict[str, Sequence[str]]] = None, snapshot: Optional[str] = None) -> str:
+    """Cursor opaco (base64 de JSON) com a fotografia da ordenação e a posição do último resultado de uma página."""
+    payload = {"q": query, "s": sorted(sources), "v": validate_reliability, "f": _filters_key(filters),
+               "after": list(after), "returned": returned, "snapshot": snapshot}
+    return base64.urlsafe_b64encode(json.dumps(payload, ensure_ascii=False).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, query: str, sources: Sequence[str], validate_reliability: bool,
+                  filters: Optional[Dict[str, Sequence[str]]] = None) -> Dict[str, Any]:
+    """
+    Raises:
+        ValueError: se o cursor estiver mal formado ou tiver sido criado para outra busca.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        after = payload["after"]
+        position = {"after": (bool(after[0]), float(after[1]), str(after[2])), "returned": int(payload["returned"]),
+                    "snapshot": payload.get("snapshot")}
+    except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+        raise ValueError(f"Cursor de paginação inválido: {e}") from e
+    if (payload.get("q") != query or payload.get("s") != sorted(sources) or payload.get("v") != validate_reliability
+            or payload.get("f", {}) != _filters_key(filters)):
+        raise ValueError("O cursor de paginação pertence a outra busca.")
+    return position
+
+
+class DocumentLog:
+    """Registo em disco (JSON Lines) das adições e remoções do índice local, compactado quando cresce."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = 0
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Reaplica o registo; devolve os documentos por id. Uma última linha incompleta (escrita
+        interrompida) é ignorada e o registo é reescrito sem ela, para as próximas linhas não a continuarem.
+        """
+        documents: Dict[str, Dict[str, Any]] = {}
+        if not os.path.exists(self.path):
+            return documents
+        torn = False
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Registo do índice de busca '{self.path}' termina numa linha incompleta.")
+                    torn = True
+                    break
+                if "add" in entry:
+                    documents[entry["add"]["id"]] = entry["add"]
+                else:
+                    documents.pop(entry["remove"], None)
+                self.entries += 1
+        if torn:
+            self.compact(documents.values())
+        return documents
+
+    def append(self, entry: Dict[str, Any]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.entries += 1
+
+    def compact(self, documents: Iterable[Dict[str, Any]]):
+        """Reescreve o registo só com as adições dos documentos atuais (substituição atómica)."""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", suffix=".tmp")
+        entries = 0
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for document in documents:
+                f.write(json.dumps({"add": document}, ensure_ascii=False) + "\n")
+                entries += 1
+        os.replace(tmp_path, self.path)
+        self.entries = entries
+
 
 class SearchEngine:
-    def __init__(self):
-        pass
+    def __init__(self, vector_index: Optional[VectorIndex] = None, embedder: Optional[Embedder] = None,
+                 k1: float = 1.2, b: float = 0.75, rrf_k: int = 60, title_max_distance: int = 2,
+                 sparql_client=None, external_sources: Optional[Dict[str, SourceSearch]] = None,
+                 source_timeout: float = 2.0, deadline: float = 3.0, repository_cache_seconds: float = 300,
+                 pagination_depth: int = 100, snapshot_seconds: float = 300, max_snapshots: int = 256,
+                 documents_path: Optional[str] = None):
+        """
+        Args:
+            vector_index: Índice dos embeddings dos itens; com `embedder`, ativa a busca semântica.
+                          Os itens já guardados nele são também indexados para BM25 no arranque.
+            embedder: Função assíncrona que devolve os embeddings de uma lista de textos.
+            k1, b: Parâmetros do BM25 (saturação da frequência e normalização pelo tamanho).
+            rrf_k: Constante da reciprocal rank fusion.
+            title_max_distance: Distância de edição máxima na procura aproximada de títulos.
+            sparql_client: Cliente da API Guará, para consultar os repositórios na busca federada.
+            external_sources: Fontes externas (web/autoridades) por nome.
+            source_timeout, deadline: Tempo máximo por fonte e da busca federada toda (segundos).
+            repository_cache_seconds: Validade da lista de repositórios da API Guará.
+            pagination_depth: Resultados pedidos a cada fonte na primeira página e guardados na
+                              fotografia que as páginas seguintes percorrem.
+            snapshot_seconds, max_snapshots: Validade e número máximo das fotografias guardadas.
+            documents_path: Ficheiro onde os itens do índice local são guardados (ver DocumentLog);
+                            sem ele, o índice só vive em memória.
+        """
+        self.vector_index = vector_index if embedder is not None else None
+        self.embedder = embedder
+        self.k1 = k1
+        self.b = b
+        self.rrf_k = rrf_k
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._doc_lengths: Dict[str, float] = {}
+        self._total_length = 0.0
+        self.titles = TitleIndex(title_max_distance)
+        self.facets = FacetIndex()
+        self._pending_embeddings: Set[asyncio.Task] = set()
+        self.sparql_client = sparql_client
+        self.external_sources = external_sources or {}
+        self.source_timeout = source_timeout
+        self.deadline = deadline
+        self.pagination_depth = pagination_depth
+        self.snapshot_seconds = snapshot_seconds
+        self.max_snapshots = max_snapshots
+        # Fotografias da ordenação juntada: id -> (expira_em, resultados, estados das fontes).
+        self._snapshots: "OrderedDict[str, Tuple[float, List[Dict[str, Any]], Dict[str, Dict[str, Any]]]]" = OrderedDict()
+        self.repository_cache_seconds = repository_cache_seconds
+        self._repositories: Optional[List[str]] = None
+        self._repositories_at = 0.0
+        if self.vector_index is not None:
+            for document in self.vector_index.items:
+                self._index_terms(document)
+        self._document_log: Optional[DocumentLog] = None
+        if documents_path:
+            os.makedirs(os.path.dirname(documents_path) or ".", exist_ok=True)
+            self._document_log = DocumentLog(documents_path)
+            for document in self._document_log.load().values():
+                self._index_terms(document)
+            logger.info(f"Índice de busca local carregado de '{documents_path}' com {len(self._documents)} itens.")
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    @staticmethod
+    def _document(item_id: str, title: str, author: Optional[str], description: Optional[str],
+                  place: Optional[str] = None, date: Optional[str] = None) -> Dict[str, Any]:
+        return {"id": item_id, "title": title or "", "author": author or "", "description": description or "",
+                "place": place or "", "date": date or ""}
+
+    def _index_terms(self, document: Dict[str, Any]):
+        item_id = document["id"]
+        if item_id in self._documents:
+            self._unindex_terms(item_id)
+        frequencies: Counter = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(document[field]):
+                frequencies[term] += weight
+        length = sum(frequencies.values())
+        self._documents[item_id] = document
+        self.titles.add(item_id, document["title"])
+        self.facets.add(item_id, {"author": document["author"], "place": document.get("place"), "date": document.get("date")})
+        self._doc_terms[item_id] = dict(frequencies)
+        self._doc_lengths[item_id] = length
+        self._total_length += length
+        for term, frequency in frequencies.items():
+            self._postings.setdefault(term, {})[item_id] = frequency
+
+    def _unindex_terms(self, item_id: str) -> bool:
+        if item_id not in self._documents:
+            return False
+        for term in self._doc_terms.pop(item_id):
+            posting = self._postings[term]
+            del posting[item_id]
+            if not posting:
+                del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(item_id)
+        self.titles.remove(item_id)
+        self.facets.remove(item_id)
+        del self._documents[item_id]
+        return True
+
+    def _log_change(self, entry: Dict[str, Any]):
+        """Acrescenta a alteração ao DocumentLog, compactando-o quando tem o dobro das linhas necessárias."""
+        if self._document_log is None:
+            return
+        try:
+            self._document_log.append(entry)
+            if self._document_log.entries > max(1000, 2 * len(self._documents)):
+                self._document_log.compact(self._documents.values())
+        except OSError as e:
+            logger.warning(f"Não foi possível guardar a alteração do índice de busca: {e}")
+
+    def add_item(self, item_id: str, title: str, author: Optional[str] = None, description: Optional[str] = None,
+                 place: Optional[str] = None, date: Optional[str] = None):
+        """
+        Indexa (ou reindexa) um item. O embedding, se houver busca semântica, é calculado em
+        segundo plano quando há um event loop a correr; para esperar por ele, usar add_item_async.
+        """
+        document = self._document(item_id, title, author, description, place, date)
+        self._index_terms(document)
+        self._log_change({"add": document})
+        if self.vector_index is None:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(self._embed_documents([document]))
+        except RuntimeError:
+            logger.warning(f"Item '{item_id}' indexado sem embedding (nenhum event loop ativo).")
+            return
+        self._pending_embeddings.add(task)
+        task.add_done_callback(self._pending_embeddings.discard)
+
+    async def add_item_async(self, item_id: str, title: str, author: Optional[str] = None, description: Optional[str] = None,
+                             place: Optional[str] = None, date: Optional[str] = None):
+        """Indexa um item, incluindo o embedding."""
+        document = self._document(item_id, title, author, description, place, date)
+        self._index_terms(document)
+        self._log_change({"add": document})
+        if self.vector_index is not None:
+            await self._embed_documents([document])
+
+    async def _embed_documents(self, documents: List[Dict[str, Any]]):
+        try:
+            vectors = await self.embedder([f"{doc['title']}. {doc['description']}" for doc in documents])
+            entries = [(doc["id"], doc, vector) for doc, vector in zip(documents, vectors)]
+            await asyncio.get_running_loop().run_in_executor(None, self.vector_index.add, entries)
+        except Exception as e:
+            logger.warning(f"Não foi possível calcular o embedding de {len(documents)} item(ns): {e}")
+
+    def remove_item(self, item_id: str) -> bool:
+        """Retira um item do índice; devolve False se não existia."""
+        removed = self._unindex_terms(item_id)
+        if removed:
+            self._log_change({"remove": item_id})
+        if self.vector_index is not None:
+            self.vector_index.remove([item_id])
+        return removed
+
+    def bm25(self, query: str, limit: int, allowed: Optional[Set[str]] = None) -> List[Tuple[float, str]]:
+        """Os `limit` itens (de entre `allowed`, se dado) com maior pontuação BM25 para a pergunta, como (pontuação, id)."""
+        if not self._documents:
+            return []
+        total = len(self._documents)
+        average_length = self._total_length / total or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (total - len(posting) + 0.5) / (len(posting) + 0.5))
+            for item_id, frequency in posting.items():
+                if allowed is not None and item_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[item_id] / average_length)
+                scores[item_id] = scores.get(item_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return heapq.nlargest(limit, ((score, item_id) for item_id, score in scores.items()))
+
+    async def _dense(self, query: str, limit: int) -> List[Tuple[float, str]]:
+        if self.vector_index is None or not len(self.vector_index):
+            return []
+        try:
+            query_vector = (await self.embedder([query]))[0]
+        except Exception as e:
+            logger.warning(f"Busca semântica indisponível; a usar só BM25: {e}")
+            return []
+        return [(score, item["id"]) for score, item in self.vector_index.search(query_vector, limit)]
+
+    def _fuse(self, rankings: Sequence[List[Tuple[float, str]]], limit: int) -> List[Tuple[float, str]]:
+        fused: Dict[str, float] = {}
+        for ranking in rankings:
+            for position, (_score, item_id) in enumerate(ranking, start=1):
+                fused[item_id] = fused.get(item_id, 0.0) + 1.0 / (self.rrf_k + position)
+        return heapq.nlargest(limit, ((score, item_id) for item_id, score in fused.items()))
+
+    def _allowed(self, filters: Optional[Dict[str, Sequence[str]]]) -> Optional[Set[str]]:
+        """Ids dos itens locais que passam os filtros de facetas (None: sem filtros)."""
+        mask = self.facets.filter_mask(filters) if filters else None
+        return None if mask is None else set(self.facets.ids(mask))
+
+    async def search_local(self, query: str, limit: int = 20,
+                           filters: Optional[Dict[str, Sequence[str]]] = None) -> List[Dict[str, Any]]:
+        """
+        Procura itens no índice local.
+
+        Args:
+            filters: Valores de facetas a exigir, p. ex. {"place": ["Paris"], "date": ["1906"]}.
+
+        Returns:
+            Itens ({"id", "title", "author", "description", "place", "date", "score", "source"})
+            por ordem de relevância.
+        """
+        allowed = self._allowed(filters)
+        # Cada ordenação contribui com mais candidatos do que o pedido, para a fusão ter por onde escolher.
+        depth = max(limit * 2, 50)
+        fuzzy_titles = [(-match["distance"], match["id"]) for match in self.titles.lookup(query, limit=depth)]
+        rankings = [self.bm25(query, depth, allowed), await self._dense(query, depth), fuzzy_titles]
+        if allowed is not None:
+            rankings = [[(score, item_id) for score, item_id in ranking if item_id in allowed] for ranking in rankings]
+        rankings = [ranking for ranking in rankings if ranking]
+        if not rankings:
+            return []
+        ranked = self._fuse(rankings, limit) if len(rankings) > 1 else rankings[0][:limit]
+        return [{**self._documents[item_id], "score": round(score, 6), "source": "local"}
+                for score, item_id in ranked if item_id in self._documents]
+
+    def facet_counts(self, query: str, filters: Optional[Dict[str, Sequence[str]]] = None,
+                     limit: int = 20) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Contagens das facetas dos itens locais que correspondem à pergunta (algum termo ou um
+        título próximo) e passam os filtros: {"author": [{"value", "count"}], "place": ..., "date": ...}.
+        """
+        matching: Set[str] = {match["id"] for match in self.titles.lookup(query, limit=len(self.titles) or 1)}
+        for term in set(tokenize(query)):
+            matching.update(self._postings.get(term, ()))
+        mask = self.facets.mask_for(matching)
+        filter_mask = self.facets.filter_mask(filters) if filters else None
+        if filter_mask is not None:
+            mask &= filter_mask
+        return self.facets.counts(mask, limit)
+
+    async def _repository_names(self) -> List[str]:
+        """Repositórios da API Guará (dataset_id), guardados durante `repository_cache_seconds`."""
+        if self._repositories is None or time.monotonic() - self._repositories_at > self.repository_cache_seconds:
+            bindings = await asyncio.get_running_loop().run_in_executor(None, self.sparql_client.list_repositories)
+            self._repositories = [binding["uri"]["value"].split("#")[-1] for binding in bindings
+                                  if binding.get("uri", {}).get("value")]
+            self._repositories_at = time.monotonic()
+        return self._repositories
+
+    async def _search_repository(self, repository: str, query: str, limit: int) -> List[Dict[str, Any]]:
+        repo_config = {"repository_query_url": f"http://localhost:3030/{repository}/query"}
+        # O cliente SPARQL é síncrono: corre fora do event loop.
+        bindings = await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self.sparql_client.list_objects, query, repo_config, limit=limit))
+        return [{"id": binding.get("obj", {}).get("value", ""), "title": binding.get("titulo", {}).get("value", ""),
+                 "author": "", "description": binding.get("resumo", {}).get("value", "")}
+                for binding in bindings[:limit]]
+
+    async def _resolve_sources(self, sources: Sequence[str]) -> List[str]:
+        """Expande "repositories" em "guara:<repositório>" para cada repositório da API Guará."""
+        resolved = []
+        for source in sources:
+            if source == "repositories" and self.sparql_client is not None:
+                resolved.extend(f"guara:{name}" for name in await self._repository_names())
+            elif source not in resolved:
+                resolved.append(source)
+        return resolved
+
+    async def _query_source(self, source: str, query: str, limit: int,
+                            filters: Optional[Dict[str, Sequence[str]]] = None) -> List[Dict[str, Any]]:
+        if source == "local":
+            return await self.search_local(query, limit, filters)
+        if source.startswith("guara:") and self.sparql_client is not None:
+            results = await self._search_repository(source[len("guara:"):], query, limit)
+        elif source in self.external_sources:
+            results = await self.external_sources[source](query, limit)
+        else:
+            raise ValueError(f"Fonte de busca desconhecida: '{source}'.")
+        # As outras fontes não trazem facetas: com filtros, só ficam os itens que também estão no índice local.
+        allowed = self._allowed(filters)
+        return results if allowed is None else [result for result in results if result.get("id") in allowed]
+
+    async def _timed_query(self, source: str, query: str, limit: int, timeout: float,
+                           filters: Optional[Dict[str, Sequence[str]]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        started = time.perf_counter()
+        try:
+            results = await asyncio.wait_for(self._query_source(source, query, limit, filters), timeout)
+            status = {"status": "ok", "count": len(results)}
+        except asyncio.TimeoutError:
+            results, status = [], {"status": "timeout"}
+        except Exception as e:
+            logger.warning(f"Fonte de busca '{source}' falhou: {e}")
+            results, status = [], {"status": "error", "error": str(e)}
+        status["elapsed_ms"] = round((time.perf_counter() - started) * 1000)
+        return results, status
+
+    def _merge(self, per_source: Dict[str, List[Dict[str, Any]]], validate_reliability: bool, limit: int) -> List[Dict[str, Any]]:
+        """
+        Junta os resultados das fontes por reciprocal rank fusion. O mesmo item (mesmo URI ou
+        mesmo título normalizado) vindo de várias fontes aparece uma vez, com todas elas em "sources".
+        """
+        merged: Dict[str, Dict[str, Any]] = {}
+        keys_by_title: Dict[str, str] = {}
+        for source, results in per_source.items():
+            reliable = source not in self.external_sources
+            for position, result in enumerate(results, start=1):
+                title_key = normalize_title(result.get("title", ""))
+                key = result.get("id") or title_key
+                if key not in merged and title_key in keys_by_title:
+                    # Mesmo título noutra fonte: é o mesmo item (dentro da mesma fonte podem ser itens diferentes).
+                    same_title = keys_by_title[title_key]
+                    if source not in merged[same_title]["sources"]:
+                        key = same_title
+                entry = merged.get(key)
+                if entry is None:
+                    entry = merged[key] = {**result, "score": 0.0, "source": source, "sources": [], "reliable": reliable}
+                    if title_key:
+                        keys_by_title.setdefault(title_key, key)
+                entry["score"] += 1.0 / (self.rrf_k + position)
+                entry["reliable"] = entry["reliable"] or reliable
+                if source not in entry["sources"]:
+                    entry["sources"].append(source)
+        for entry in merged.values():
+            entry["score"] = round(entry["score"], 6)
+        return sorted(merged.values(), key=lambda entry: _sort_key(entry, validate_reliability))[:limit]
+
+    async def _start_queries(self, query: str, sources: Sequence[str], limit: int, source_timeout: float, deadline: float,
+                             filters: Optional[Dict[str, Sequence[str]]] = None) -> Tuple[Dict[asyncio.Task, str], Dict[str, Dict[str, Any]], float]:
+        """Lança a consulta de cada fonte; devolve as tarefas, os estados já conhecidos e o fim do prazo."""
+        ends_at = time.monotonic() + deadline
+        statuses: Dict[str, Dict[str, Any]] = {}
+        try:
+            resolved = await asyncio.wait_for(self._resolve_sources(sources), min(source_timeout, deadline))
+        except Exception as e:
+            logger.warning(f"Não foi possível obter a lista de repositórios da API Guará: {e}")
+            statuses["repositories"] = {"status": "timeout" if isinstance(e, asyncio.TimeoutError) else "error"}
+            resolved = [source for source in sources if source != "repositories"]
+        tasks = {asyncio.create_task(self._timed_query(source, query, limit, source_timeout, filters)): source
+                 for source in resolved}
+        return tasks, statuses, ends_at
+
+    @staticmethod
+    def _expire(pending, tasks: Dict[asyncio.Task, str], statuses: Dict[str, Dict[str, Any]], deadline: float):
+        for task in pending:
+            task.cancel()
+            statuses[tasks[task]] = {"status": "timeout", "elapsed_ms": round(deadline * 1000)}
+
+    async def search(self, query, sources=("local",), validate_reliability=True, limit: int = 20,
+                     source_timeout: Optional[float] = None, deadline: Optional[float] = None,
+                     cursor: Optional[str] = None, filters: Optional[Dict[str, Sequence[str]]] = None) -> Dict[str, Any]:
+        """
+        Realiza uma busca federada: consulta as fontes em simultâneo e junta os resultados.
+
+        Args:
+            sources: "local" (índice em memória), "repositories" (todos os repositórios da API
+                     Guará), "guara:<repositório>" ou o nome de uma fonte externa (p. ex. "wikidata").
+            validate_reliability: Os resultados de fontes externas (web/autoridades) ficam depois
+                                  dos do acervo, que já foram catalogados.
+            limit: Número máximo de resultados (tamanho da página).
+            source_timeout: Tempo máximo (segundos) de cada fonte.
+            deadline: Tempo máximo (segundos) da busca toda; as fontes que não responderem a tempo
+                      ficam de fora e são assinaladas como "timeout".
+            cursor: "next_cursor" da página anterior, para obter a seguinte.
+            filters: Valores de facetas a exigir ({"author"|"place"|"date": [valores]}).
+
+        Returns:
+            {"results": [...], "sources": {fonte: {"status", "count", "elapsed_ms"}},
+             "next_cursor": str | None, "facets": contagens das facetas (ver facet_counts)}
+
+        Raises:
+            ValueError: se o cursor for inválido ou de outra busca, ou se uma faceta não existir.
+        """
+        source_timeout = self.source_timeout if source_timeout is None else source_timeout
+        deadline = self.deadline if deadline is None else deadline
+        position = decode_cursor(cursor, query, sources, validate_reliability, filters) if cursor else None
+        facets = self.facet_counts(query, filters)
+
+        snapshot_id = position["snapshot"] if position else None
+        snapshot = self._get_snapshot(snapshot_id)
+        if snapshot is None:
+            # Primeira página, ou fotografia expirada (ou de outro processo): volta às fontes e
+            # continua depois do último resultado devolvido, pela ordem total (fiabilidade, pontuação, id).
+            depth = max(self.pagination_depth, (position["returned"] if position else 0) + limit + 1)
+            ranked, statuses = await self._ranked(query, sources, validate_reliability, depth, source_timeout,
+                                                  deadline, filters)
+            snapshot_id = self._put_snapshot(ranked, statuses)
+        else:
+            ranked, statuses = snapshot
+        if position:
+            after = tuple(position["after"])
+            ranked = [entry for entry in ranked if _sort_key(entry, validate_reliability) > after]
+        page = ranked[:limit]
+        next_cursor = None
+        if len(ranked) > limit:
+            returned = (position["returned"] if position else 0) + len(page)
+            next_cursor = encode_cursor(query, sources, validate_reliability,
+                                        _sort_key(page[-1], validate_reliability), returned, filters, snapshot_id)
+        return {"results": page, "sources": statuses, "next_cursor": next_cursor, "facets": facets}
+
+    async def _ranked(self, query: str, sources: Sequence[str], validate_reliability: bool, depth: int,
+                      source_timeout: float, deadline: float,
+                      filters: Optional[Dict[str, Sequence[str]]]) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        """Consulta as fontes (até `depth` resultados cada) e devolve a ordenação juntada e os estados."""
+        tasks, statuses, ends_at = await self._start_queries(query, sources, depth, source_timeout, deadline, filters)
+        done, pending = await asyncio.wait(tasks, timeout=max(0.0, ends_at - time.monotonic())) if tasks else (set(), set())
+        self._expire(pending, tasks, statuses, deadline)
+
+        per_source: Dict[str, List[Dict[str, Any]]] = {}
+        for task, source in tasks.items():
+            if task in done:
+                per_source[source], statuses[source] = task.result()
+        # Fica tudo o que as fontes devolveram (até `depth` de cada uma), para as páginas seguintes.
+        return self._merge(per_source, validate_reliability, sum(map(len, per_source.values()))), statuses
+
+    def _get_snapshot(self, snapshot_id: Optional[str]):
+        entry = self._snapshots.get(snapshot_id) if snapshot_id else None
+        if entry is None:
+            return None
+        expires_at, ranked, statuses = entry
+        if expires_at < time.monotonic():
+            del self._snapshots[snapshot_id]
+            return None
+        return ranked, statuses
+
+    def _put_snapshot(self, ranked: List[Dict[str, Any]], statuses: Dict[str, Dict[str, Any]]) -> str:
+        snapshot_id = uuid.uuid4().hex
+        self._snapshots[snapshot_id] = (time.monotonic() + self.snapshot_seconds, ranked, statuses)
+        while len(self._snapshots) > self.max_snapshots:
+            self._snapshots.popitem(last=False)
+        return snapshot_id
+
+    async def search_stream(self, query, sources=("local",), limit: int = 20, source_timeout: Optional[float] = None,
+                            deadline: Optional[float] = None,
+                            filters: Optional[Dict[str, Sequence[str]]] = None,
+                            validate_reliability: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Busca federada em fluxo: os resultados de cada fonte saem assim que ela responde, sem
+        esperar pelas outras (o índice local responde logo; a API Guará pode demorar segundos).
+        Um item já emitido por outra fonte (mesmo URI ou título) não se repete.
+
+        Com `validate_reliability`, tal como em search, os resultados de fontes externas ficam
+        depois dos fiáveis: são retidos até todas as fontes fiáveis terminarem (ou o prazo acabar).
+        São emitidos no máximo `limit` resultados; atingido o limite, as fontes ainda por
+        responder são canceladas e ficam com o estado "skipped".
+
+        Yields:
+            {"type": "result", "result": {...}} por resultado e, no fim,
+            {"type": "done", "sources": {fonte: {"status", "count", "elapsed_ms"}}, "facets": {...}}.
+        """
+        source_timeout = self.source_timeout if source_timeout is None else source_timeout
+        deadline = self.deadline if deadline is None else deadline
+        facets = self.facet_counts(query, filters)
+        tasks, statuses, ends_at = await self._start_queries(query, sources, limit, source_timeout, deadline, filters)
+        seen: Set[str] = set()
+        pending = set(tasks)
+        deferred: List[Tuple[str, Dict[str, Any]]] = []
+        emitted = 0
+        try:
+            while pending and emitted < limit:
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, ends_at - time.monotonic()),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                ready: List[Tuple[str, Dict[str, Any]]] = []
+                for task in done:
+                    source = tasks[task]
+                    results, statuses[source] = task.result()
+                    batch = deferred if validate_reliability and source in self.external_sources else ready
+                    batch.extend((source, result) for result in results)
+                if deferred and all(tasks[task] in self.external_sources for task in pending):
+                    ready, deferred = ready + deferred, []
+                for event in self._stream_events(ready, seen, limit - emitted):
+                    emitted += 1
+                    yield event
+            if emitted >= limit:
+                for task in pending:
+                    task.cancel()
+                    statuses[tasks[task]] = {"status": "skipped"}
+            else:
+                self._expire(pending, tasks, statuses, deadline)
+        finally:
+            for task in pending:
+                task.cancel()
+        for event in self._stream_events(deferred, seen, limit - emitted):
+            yield event
+        yield {"type": "done", "sources": statuses, "facets": facets}
 
-    def search(self, query, sources, validate_reliability=True):
-        # Lógica para realizar buscas em acervos definidos e na internet
-        # Incluir opção para validar a confiabilidade das fontes
-        pass
+    def _stream_events(self, results: List[Tuple[str, Dict[str, Any]]], seen: Set[str],
+                       budget: int) -> Iterator[Dict[str, Any]]:
+        """Até `budget` eventos "result" de search_stream, sem os itens já emitidos (mesmo URI ou título)."""
+        for source, result in results:
+            if budget <= 0:
+                return
+            keys = {key for key in (result.get("id"), normalize_title(result.get("title", ""))) if key}
+            if keys & seen:
+                continue
+            seen.update(keys)
+            budget -= 1
+            yield {"type": "result", "result": {**result, "source": source,
+                                                "reliable": source not in self.external_sources}}
 
+    def stats(self) -> Dict[str, Any]:
+        """Tamanho do índice, exposto em /api/v1/metrics."""
+        return {
+            "items": len(self._documents),
+            "terms": len(self._postings),
+            "title_trigrams": self.titles.stats()["trigrams"],
+            "facet_values": self.facets.stats()["values"],
+            "vector_items": len(self.vector_index) if self.vector_index is not None else None,
+            "pagination_snapshots": len(self._snapshots),
+        }
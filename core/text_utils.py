@@ -0,0 +1,25 @@
+# memoria/core/text_utils.py
+"""Normalização de texto partilhada pelos índices de busca e pela montagem do contexto RAG."""
+import re
+import unicodedata
+from typing import Iterable, List
+
+_WORD_RE = re.compile(r"\w+")
+
+# Palavras funcionais do português, ignoradas na indexação e nas perguntas.
+STOPWORDS = frozenset({
+    "a", "o", "as", "os", "de", "do", "da", "dos", "das", "e", "em", "no", "na", "nos", "nas",
+    "um", "uma", "uns", "umas", "que", "com", "por", "para", "pelo", "pela", "ao", "aos", "se",
+    "me", "foi", "sao", "ser", "ou",
+})
+
+
+def fold_text(text: str) -> str:
+    """Minúsculas e sem acentos, para comparar "Petrópolis" com "petropolis"."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str, stopwords: Iterable[str] = STOPWORDS) -> List[str]:
+    """Palavras do texto, normalizadas com fold_text, sem as `stopwords`."""
+    return [word for word in _WORD_RE.findall(fold_text(text)) if word not in stopwords]
@@ -0,0 +1,159 @@
+# memoria/core/title_index.py
+"""
+Índice de títulos tolerante a erros (OCR, extração por IA, acentos em falta).
+
+Os títulos são normalizados (minúsculas, sem acentos nem pontuação) e indexados pelos seus
+trigramas de caracteres. Uma procura com distância de edição até k só pode encontrar
+títulos que partilhem com ela todos os trigramas menos, no máximo, 3k (cada edição
+destrói até três); por isso basta juntar os candidatos das 3k + 1 listas de trigramas mais
+raras da pergunta, filtrá-los pelo comprimento e pela contagem de trigramas comuns e
+confirmar a distância com um Levenshtein limitado a k. Os números têm de coincidir
+exatamente ("Dirigível Nº 6" e "Dirigível Nº 7" são itens diferentes). Assim a procura não percorre as
+listas dos trigramas frequentes (" da", "de ") e mantém-se rápida com centenas de
+milhares de títulos.
+"""
+import re
+from array import array
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from core.text_utils import fold_text
+
+_NON_ALNUM_RE = re.compile(r"[^0-9a-z]+")
+_NUMBER_RE = re.compile(r"\d+")
+
+
+def normalize_title(title: str) -> str:
+    """Minúsculas, sem acentos nem pontuação: 'Dirigível Nº 6' -> 'dirigivel no 6'."""
+    return _NON_ALNUM_RE.sub(" ", fold_text(title)).strip()
+
+
+def trigrams(normalized: str) -> Set[str]:
+    padded = f" {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_levenshtein(a: str, b: str, max_distance: int) -> Optional[int]:
+    """Distância de edição entre `a` e `b`, ou None se for maior do que `max_distance`."""
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    if len(a) > len(b):
+        a, b = b, a
+    # Só se calcula a faixa diagonal de largura 2k + 1; fora dela a distância já excede k.
+    over = max_distance + 1
+    previous = [j if j <= max_distance else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        low, high = max(1, i - max_distance), min(len(b), i + max_distance)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= max_distance else over
+        for j in range(low, high + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost, over)
+        if min(current[low - 1:high + 1]) > max_distance:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= max_distance else None
+
+
+def allowed_distance(normalized: str, max_distance: int) -> int:
+    """Erros admitidos conforme o comprimento: nenhum até 3 caracteres, 1 até 8, depois `max_distance`."""
+    if len(normalized) <= 3:
+        return 0
+    if len(normalized) <= 8:
+        return min(1, max_distance)
+    return max_distance
+
+
+class TitleIndex:
+    """Índice de trigramas de títulos, com procura aproximada por distância de edição."""
+
+    def __init__(self, max_distance: int = 2):
+        self.max_distance = max_distance
+        self._keys: List[Optional[str]] = []
+        self._titles: List[str] = []
+        self._normalized: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._postings: Dict[str, array] = {}
+        self._exact: Dict[str, Set[int]] = {}
+        self._removed = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, key: str, title: str):
+        """Indexa (ou substitui) o título de um item."""
+        if key in self._rows:
+            self.remove(key)
+        normalized = normalize_title(title)
+        if not normalized:
+            return
+        row = len(self._keys)
+        self._keys.append(key)
+        self._titles.append(title)
+        self._normalized.append(normalized)
+        self._rows[key] = row
+        self._exact.setdefault(normalized, set()).add(row)
+        for gram in trigrams(normalized):
+            self._postings.setdefault(gram, array("I")).append(row)
+
+    def remove(self, key: str) -> bool:
+        """
+        Retira um item. A linha fica marcada como removida nas listas de trigramas, que são
+        compactadas quando as linhas removidas passam a ser metade do índice.
+        """
+        row = self._rows.pop(key, None)
+        if row is None:
+            return False
+        rows = self._exact[self._normalized[row]]
+        rows.discard(row)
+        if not rows:
+            del self._exact[self._normalized[row]]
+        self._keys[row] = None
+        self._removed += 1
+        if self._removed * 2 > len(self._keys):
+            self._compact()
+        return True
+
+    def _compact(self):
+        entries = [(key, self._titles[row]) for key, row in self._rows.items()]
+        self.__init__(self.max_distance)
+        for key, title in entries:
+            self.add(key, title)
+
+    def lookup(self, title: str, max_distance: Optional[int] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Títulos a uma distância de edição (após normalização) até `max_distance` do título
+        dado, do mais próximo para o mais distante: [{"id", "title", "distance"}].
+        """
+        normalized = normalize_title(title)
+        if not normalized:
+            return []
+        k = allowed_distance(normalized, self.max_distance if max_distance is None else max_distance)
+        matches: List[Tuple[int, int]] = [(0, row) for row in self._exact.get(normalized, ())]
+        if k > 0:
+            query_grams = trigrams(normalized)
+            query_numbers = _NUMBER_RE.findall(normalized)
+            # Um título a distância <= k partilha todos os trigramas da pergunta menos 3k, no máximo.
+            min_common = len(query_grams) - 3 * k
+            rarest = sorted(query_grams, key=lambda gram: len(self._postings.get(gram, ())))[:3 * k + 1]
+            candidates: Set[int] = set()
+            for gram in rarest:
+                candidates.update(self._postings.get(gram, ()))
+            for row in candidates:
+                if self._keys[row] is None:
+                    continue
+                candidate = self._normalized[row]
+                if candidate == normalized or abs(len(candidate) - len(normalized)) > k:
+                    continue
+                if len(query_grams & trigrams(candidate)) < min_common:
+                    continue
+                if _NUMBER_RE.findall(candidate) != query_numbers:
+                    continue
+                distance = bounded_levenshtein(normalized, candidate, k)
+                if distance is not None:
+                    matches.append((distance, row))
+        matches.sort(key=lambda match: (match[0], self._titles[match[1]]))
+        return [{"id": self._keys[row], "title": self._titles[row], "distance": distance}
+                for distance, row in matches[:limit]]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"titles": len(self._rows), "trigrams": len(self._postings), "removed_rows": self._removed}
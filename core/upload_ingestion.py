@@ -0,0 +1,205 @@
+# memoria/core/upload_ingestion.py
+"""
+Receção de ficheiros carregados pela API.
+
+O conteúdo é lido aos bocados e escrito num ficheiro temporário na pasta de destino,
+fora do event loop, calculando o SHA-256 pelo caminho. O ficheiro só aparece com o nome
+final (substituição atómica) depois de recebido por inteiro e dentro do tamanho máximo.
+Os arquivos zip enviados em lote são descompactados da mesma forma, membro a membro, com
+limites ao número de membros e ao total descompactado (contra "zip bombs").
+
+Limites de tamanho: quando a rota recebe o UploadFile, o Starlette já leu o corpo
+multipart inteiro para o seu ficheiro temporário (SpooledTemporaryFile). A verificação de
+`file.size` e o limite por bloco em save_upload só evitam que um ficheiro grande fique
+gravado na pasta de destino; não evitam recebê-lo. A única recusa antecipada é a do
+middleware que compara o Content-Length com o limite da rota (reject_oversized_uploads em
+main.py), e essa não se aplica a pedidos sem Content-Length (transferência em blocos).
+"""
+import os
+import uuid
+import asyncio
+import hashlib
+import zipfile
+import tempfile
+from concurrent.futures import Executor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import UploadFile
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """O ficheiro carregado excede o tamanho máximo permitido para a rota."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        limit = f"{max_bytes / (1024 * 1024):.0f} MB" if max_bytes >= 1024 * 1024 else f"{max_bytes} bytes"
+        super().__init__(f"O ficheiro excede o tamanho máximo permitido ({limit}).")
+
+
+class ZipLimitError(ValueError):
+    """O arquivo zip tem membros a mais ou descompacta para mais do que o permitido; o lote é recusado."""
+
+
+def _write_chunk(buffer, digest, chunk: bytes):
+    digest.update(chunk)
+    buffer.write(chunk)
+
+
+def _discard(buffer, tmp_path: str):
+    buffer.close()
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+
+def _finalize(tmp_path: str, destination_path: str, keep_existing: bool) -> bool:
+    """
+    Move o ficheiro temporário para o nome final; com keep_existing, um ficheiro igual já guardado
+    é mantido. Devolve False nesse caso (nenhum ficheiro novo).
+    """
+    if keep_existing and os.path.exists(destination_path):
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, destination_path)
+    return True
+
+
+async def save_upload(file: UploadFile, destination_folder: str, max_bytes: int, content_addressed: bool = False,
+                      executor: Optional[Executor] = None, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Tuple[str, str]:
+    """
+    Guarda um ficheiro carregado e devolve (nome_guardado, sha256_do_conteudo).
+
+    Com content_addressed=True o ficheiro é guardado como '<sha256>.<extensão>', pelo que
+    o mesmo conteúdo carregado várias vezes ocupa um único ficheiro; caso contrário o nome
+    original é prefixado com um identificador aleatório.
+
+    Raises:
+        UploadTooLargeError: se o ficheiro exceder max_bytes (nada fica gravado).
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLargeError(max_bytes)
+
+    loop = asyncio.get_running_loop()
+    original_filename = os.path.basename(file.filename)
+    digest = hashlib.sha256()
+    fd, tmp_path = await loop.run_in_executor(
+        executor, lambda: tempfile.mkstemp(dir=destination_folder, suffix=".upload"))
+    buffer = os.fdopen(fd, "wb")
+    received = 0
+    try:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            received += len(chunk)
+            if received > max_bytes:
+                raise UploadTooLargeError(max_bytes)
+            await loop.run_in_executor(executor, _write_chunk, buffer, digest, chunk)
+        await loop.run_in_executor(executor, buffer.close)
+    except BaseException:
+        await loop.run_in_executor(executor, _discard, buffer, tmp_path)
+        raise
+    content_hash = digest.hexdigest()
+
+    if content_addressed:
+        extension = original_filename.rsplit('.', 1)[1].lower()
+        safe_filename = f"{content_hash}.{extension}"
+    else:
+        safe_filename = f"{uuid.uuid4().hex}_{original_filename}"
+    destination_path = os.path.join(destination_folder, safe_filename)
+    await loop.run_in_executor(executor, _finalize, tmp_path, destination_path, content_addressed)
+    return safe_filename, content_hash
+
+
+def extract_zip_documents(zip_path: str, destination_folder: str, allowed_extensions: Iterable[str],
+                          max_member_bytes: int, max_members: int, max_total_bytes: int, max_archive_members: int,
+                          chunk_size: int = UPLOAD_CHUNK_SIZE) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Descompacta os documentos de um arquivo zip, guardando cada um como '<sha256>.<extensão>'.
+
+    Função bloqueante: deve correr num executor. Os membros com extensão não permitida, acima
+    de max_member_bytes (descompactados) ou além de max_members documentos são recusados, sem
+    parar os restantes. Já um arquivo com mais de max_archive_members entradas, ou cujos
+    documentos descompactam para mais de max_total_bytes no total, é recusado por inteiro:
+    os ficheiros que já tinha descompactado são apagados.
+
+    Returns:
+        (documentos, recusados): documentos como {"filename", "file_id", "content_hash"};
+        recusados como {"filename", "error"}.
+
+    Raises:
+        ZipLimitError: se algum dos limites do arquivo for excedido.
+    """
+    allowed_extensions = {extension.lower() for extension in allowed_extensions}
+    documents, rejected = [], []
+    created: List[str] = []
+    with zipfile.ZipFile(zip_path) as archive:
+        members = archive.infolist()
+        if len(members) > max_archive_members:
+            raise ZipLimitError(f"O arquivo zip excede o máximo de {max_archive_members} membros.")
+        total_error = ZipLimitError(
+            f"O arquivo zip excede o tamanho máximo descompactado ({max_total_bytes / (1024 * 1024):.0f} MB).")
+        extracted = 0
+        try:
+            for member in members:
+                if member.is_dir():
+                    continue
+                member_name = os.path.basename(member.filename)
+                extension = member_name.rsplit('.', 1)[1].lower() if '.' in member_name else ""
+                if extension not in allowed_extensions:
+                    rejected.append({"filename": member.filename, "error": "Tipo de ficheiro não permitido."})
+                    continue
+                if len(documents) >= max_members:
+                    rejected.append({"filename": member.filename, "error": f"O lote excede o máximo de {max_members} documentos."})
+                    continue
+                if member.file_size > max_member_bytes:
+                    rejected.append({"filename": member.filename, "error": str(UploadTooLargeError(max_member_bytes))})
+                    continue
+                if extracted + member.file_size > max_total_bytes:
+                    raise total_error
+                try:
+                    file_id, content_hash, size, is_new = _extract_member(
+                        archive, member, destination_folder, extension, max_member_bytes,
+                        max_total_bytes - extracted, total_error, chunk_size)
+                except (UploadTooLargeError, zipfile.BadZipFile, OSError) as e:
+                    rejected.append({"filename": member.filename, "error": str(e)})
+                    continue
+                extracted += size
+                if is_new:
+                    created.append(os.path.join(destination_folder, file_id))
+                documents.append({"filename": member_name, "file_id": file_id, "content_hash": content_hash})
+        except ZipLimitError:
+            for path in created:
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+    return documents, rejected
+
+
+def _extract_member(archive: zipfile.ZipFile, member: zipfile.ZipInfo, destination_folder: str, extension: str,
+                    max_bytes: int, total_remaining: int, total_error: ZipLimitError,
+                    chunk_size: int) -> Tuple[str, str, int, bool]:
+    """Descompacta um membro; devolve (nome_guardado, sha256, bytes, ficheiro_novo)."""
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=destination_folder, suffix=".upload")
+    buffer = os.fdopen(fd, "wb")
+    received = 0
+    try:
+        with archive.open(member) as source:
+            for chunk in iter(lambda: source.read(chunk_size), b""):
+                # O tamanho declarado no zip pode ser falso: o limite é verificado ao descompactar.
+                received += len(chunk)
+                if received > max_bytes:
+                    raise UploadTooLargeError(max_bytes)
+                if received > total_remaining:
+                    raise total_error
+                _write_chunk(buffer, digest, chunk)
+        buffer.close()
+    except BaseException:
+        _discard(buffer, tmp_path)
+        raise
+    content_hash = digest.hexdigest()
+    safe_filename = f"{content_hash}.{extension}"
+    is_new = _finalize(tmp_path, os.path.join(destination_folder, safe_filename), keep_existing=True)
+    return safe_filename, content_hash, received, is_new
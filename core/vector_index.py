@@ -0,0 +1,354 @@
+# memoria/core/vector_index.py
+"""
+Índice vetorial local dos itens de cada repositório, para a recuperação do chatbot.
+
+Cada item é guardado como o embedding normalizado do seu título e resumo, numa linha de
+uma matriz float32 em disco, aberta com np.memmap (só as páginas usadas ficam em memória
+e o índice sobrevive a reinícios). A busca é um produto matriz-vetor (similaridade do
+cosseno) seguido de np.argpartition para os k melhores. Remover um item move a última
+linha para o lugar dele, mantendo a matriz contígua.
+
+Os ids e os itens ficam em meta.json (um instantâneo) mais meta.log.jsonl, onde cada
+adição ou remoção acrescenta uma linha; ao abrir, o registo é reaplicado sobre o
+instantâneo. Quando o registo cresce mais do que o índice, é compactado num instantâneo
+novo, pelo que cada alteração custa O(1) em disco (amortizado) e não O(N).
+
+O índice de um repositório só tem os itens persistidos por esta API até que um
+preenchimento (SemanticIndex.backfill) percorra os objetos já existentes na API Guará;
+no fim, fica marcado como completo (ficheiro "complete" no diretório do repositório).
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import tempfile
+import itertools
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Embedder = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+INITIAL_CAPACITY = 256
+# Linhas do registo a partir das quais (e acima do número de itens) é escrito um instantâneo novo.
+COMPACT_MIN_ENTRIES = 1000
+
+
+def item_text(item: Dict[str, Any]) -> str:
+    """Texto de um item (binding com "titulo" e "resumo") usado no embedding."""
+    title = item.get("titulo", {}).get("value", "")
+    summary = item.get("resumo", {}).get("value", "")
+    return f"{title}. {summary}" if summary else title
+
+
+class VectorIndex:
+    """Matriz de embeddings de um repositório, em disco (memmap), com os itens em meta.json e meta.log.jsonl."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._log_path = os.path.join(directory, "meta.log.jsonl")
+        self._log_entries = 0
+        self._lock = threading.Lock()
+        self.dimension: Optional[int] = None
+        self.capacity = 0
+        self.ids: List[str] = []
+        self.items: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+        self._matrix: Optional[np.memmap] = None
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _load(self):
+        if not os.path.exists(self._meta_path) and not os.path.exists(self._log_path):
+            return
+        try:
+            if os.path.exists(self._meta_path):
+                with open(self._meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                self.dimension, self.capacity = meta["dimension"], meta["capacity"]
+                self.ids, self.items = meta["ids"], meta["items"]
+                self._rows = {item_id: row for row, item_id in enumerate(self.ids)}
+            if not self._replay_log():
+                # Reescreve o instantâneo para que as próximas linhas não se colem à incompleta.
+                self._save_meta()
+            if self.capacity:
+                self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                         shape=(self.capacity, self.dimension))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Índice vetorial em '{self.directory}' ilegível; a recomeçar vazio: {e}")
+            self.dimension, self.capacity, self.ids, self.items, self._rows = None, 0, [], [], {}
+
+    def _replay_log(self) -> bool:
+        """Reaplica o registo sobre o instantâneo; devolve False se terminar numa linha incompleta."""
+        if not os.path.exists(self._log_path):
+            return True
+        with open(self._log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Última linha incompleta (interrupção a meio de uma escrita): as anteriores valem.
+                    return False
+                if "capacity" in entry:
+                    self.dimension, self.capacity = entry["dimension"], entry["capacity"]
+                elif "add" in entry:
+                    self._place(entry["add"], entry["item"])
+                else:
+                    self._unplace(entry["remove"])
+                self._log_entries += 1
+        return True
+
+    def _place(self, item_id: str, item: Dict[str, Any]) -> int:
+        """Atribui uma linha ao item (a sua, se já existir, ou uma nova no fim)."""
+        row = self._rows.get(item_id)
+        if row is None:
+            row = len(self.ids)
+            self._rows[item_id] = row
+            self.ids.append(item_id)
+            self.items.append(item)
+        else:
+            self.items[row] = item
+        return row
+
+    def _unplace(self, item_id: str) -> Optional[Tuple[int, int]]:
+        """Liberta a linha do item, movendo para lá o último; devolve (linha, última) ou None."""
+        row = self._rows.pop(item_id, None)
+        if row is None:
+            return None
+        last = len(self.ids) - 1
+        if row != last:
+            self.ids[row], self.items[row] = self.ids[last], self.items[last]
+            self._rows[self.ids[row]] = row
+        self.ids.pop()
+        self.items.pop()
+        return row, last
+
+    def _save_meta(self):
+        meta = {"dimension": self.dimension, "capacity": self.capacity, "ids": self.ids, "items": self.items}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, self._meta_path)
+        if os.path.exists(self._log_path):
+            os.remove(self._log_path)
+        self._log_entries = 0
+
+    def _append_log(self, entries: List[Dict[str, Any]]):
+        """Regista alterações no fim do registo, compactando-o quando fica maior do que o índice."""
+        if self._log_entries + len(entries) > max(COMPACT_MIN_ENTRIES, len(self.ids)):
+            self._save_meta()
+            return
+        with open(self._log_path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+        self._log_entries += len(entries)
+
+    def _ensure_capacity(self, rows: int):
+        if rows <= self.capacity:
+            return
+        new_capacity = max(INITIAL_CAPACITY, self.capacity)
+        while new_capacity < rows:
+            new_capacity *= 2
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        # Aumenta o ficheiro (zeros no fim) e volta a mapeá-lo; as linhas existentes ficam onde estão.
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dimension * np.dtype(np.float32).itemsize)
+        self.capacity = new_capacity
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                 shape=(self.capacity, self.dimension))
+
+    def add(self, entries: Sequence[Tuple[str, Dict[str, Any], Sequence[float]]]):
+        """
+        Acrescenta (ou substitui) itens: tuplos (id, item, embedding).
+
+        Raises:
+            ValueError: se a dimensão de um embedding não for a do índice.
+        """
+        if not entries:
+            return
+        vectors = np.asarray([vector for _id, _item, vector in entries], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                os.makedirs(self.directory, exist_ok=True)
+            if vectors.shape[1] != self.dimension:
+                raise ValueError(f"Embeddings com dimensão {vectors.shape[1]}; o índice usa {self.dimension}.")
+            capacity = self.capacity
+            self._ensure_capacity(len(self.ids) + len(entries))
+            log = [{"dimension": self.dimension, "capacity": self.capacity}] if self.capacity != capacity else []
+            for (item_id, item, _vector), vector in zip(entries, vectors):
+                self._matrix[self._place(item_id, item)] = vector
+                log.append({"add": item_id, "item": item})
+            # Os vetores chegam ao disco antes do registo que os refere.
+            self._matrix.flush()
+            self._append_log(log)
+
+    def remove(self, item_ids: Sequence[str]) -> int:
+        """Remove itens pelo id; devolve quantos existiam."""
+        removed = 0
+        with self._lock:
+            log = []
+            for item_id in item_ids:
+                moved = self._unplace(item_id)
+                if moved is None:
+                    continue
+                row, last = moved
+                if row != last:
+                    self._matrix[row] = self._matrix[last]
+                log.append({"remove": item_id})
+                removed += 1
+            if removed:
+                self._matrix.flush()
+                self._append_log(log)
+        return removed
+
+    def search(self, query_vector: Sequence[float], k: int, min_score: float = 0.0) -> List[Tuple[float, Dict[str, Any]]]:
+        """Os `k` itens mais semelhantes (cosseno) ao vetor, com semelhança >= `min_score`."""
+        query = np.asarray(query_vector, dtype=np.float32)
+        with self._lock:
+            count = len(self.ids)
+            if not count or query.shape != (self.dimension,):
+                return []
+            norm = np.linalg.norm(query)
+            if norm == 0:
+                return []
+            scores = self._matrix[:count] @ (query / norm)
+            k = min(k, count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(float(scores[row]), self.items[row]) for row in top if scores[row] >= min_score]
+
+
+class SemanticIndex:
+    """
+    Índices vetoriais de todos os repositórios (um subdiretório de `root_dir` por repositório),
+    com os embeddings calculados por `embedder` (p. ex. AsyncOllamaClient.embed).
+
+    Abrir um índice (ler meta.json e o registo, mapear a matriz) e a busca (o produto
+    matriz-vetor) correm no executor por omissão, fora do event loop.
+    """
+
+    def __init__(self, root_dir: str, embedder: Embedder, min_score: float = 0.0):
+        self.root_dir = root_dir
+        self.embedder = embedder
+        self.min_score = min_score
+        self._indexes: Dict[str, VectorIndex] = {}
+        self._complete: set = set()
+        self._backfills: Dict[str, asyncio.Task] = {}
+        self.searches = 0
+        self.search_seconds = 0.0
+
+    def _directory(self, repository: str) -> str:
+        return os.path.join(self.root_dir, re.sub(r"[^\w.-]", "_", repository))
+
+    async def index_for(self, repository: str) -> VectorIndex:
+        """Índice do repositório, aberto (num executor) na primeira utilização."""
+        index = self._indexes.get(repository)
+        if index is None:
+            loaded = await asyncio.get_running_loop().run_in_executor(None, VectorIndex, self._directory(repository))
+            # Outro pedido pode ter aberto o mesmo índice entretanto: fica o primeiro.
+            index = self._indexes.setdefault(repository, loaded)
+        return index
+
+    async def add_items(self, repository: str, items: List[Tuple[str, Dict[str, Any]]]):
+        """Calcula os embeddings de itens (id, binding) e acrescenta-os ao índice do repositório."""
+        if not items:
+            return
+        vectors = await self.embedder([item_text(item) for _id, item in items])
+        entries = [(item_id, item, vector) for (item_id, item), vector in zip(items, vectors)]
+        index = await self.index_for(repository)
+        await asyncio.get_running_loop().run_in_executor(None, index.add, entries)
+
+    async def remove_items(self, repository: str, item_ids: List[str]) -> int:
+        index = await self.index_for(repository)
+        return await asyncio.get_running_loop().run_in_executor(None, index.remove, item_ids)
+
+    def is_complete(self, repository: str) -> bool:
+        """Se o índice do repositório já foi preenchido com todos os objetos da API Guará."""
+        if repository not in self._complete:
+            if not os.path.exists(os.path.join(self._directory(repository), "complete")):
+                return False
+            self._complete.add(repository)
+        return True
+
+    async def backfill(self, repository: str, objects: Iterable[Dict[str, Any]], batch_size: int = 100) -> int:
+        """
+        Indexa os bindings de `objects` (p. ex. SPARQLAPIClient.iter_objects, que é síncrono e
+        por isso é lido fora do event loop) em lotes de `batch_size` e marca o repositório como
+        completo. Devolve quantos itens foram indexados.
+
+        Um erro ao ler `objects` (a API Guará falhou a meio) é propagado e o repositório não
+        fica marcado: os itens já indexados ficam, mas o chatbot continua a consultar a API.
+        """
+        loop = asyncio.get_running_loop()
+        objects = iter(objects)
+        indexed = 0
+        while True:
+            batch = await loop.run_in_executor(None, lambda: list(itertools.islice(objects, batch_size)))
+            items = [(binding["obj"]["value"], binding) for binding in batch if binding.get("obj", {}).get("value")]
+            await self.add_items(repository, items)
+            indexed += len(items)
+            if len(batch) < batch_size:
+                break
+        directory = self._directory(repository)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "complete"), "w", encoding="utf-8") as f:
+            f.write(f"{indexed}\n")
+        self._complete.add(repository)
+        logger.info(f"Índice vetorial de '{repository}' preenchido com {indexed} itens.")
+        return indexed
+
+    def start_backfill(self, repository: str, objects: Callable[[], Iterable[Dict[str, Any]]]) -> bool:
+        """
+        Lança backfill(repository, objects()) em segundo plano, se não houver já um em curso
+        para o repositório. Devolve False se já estiver em curso.
+        """
+        running = self._backfills.get(repository)
+        if running is not None and not running.done():
+            return False
+
+        async def run():
+            try:
+                await self.backfill(repository, objects())
+            except Exception as e:
+                logger.error(f"Falha no preenchimento do índice vetorial de '{repository}': {e}")
+
+        self._backfills[repository] = asyncio.get_running_loop().create_task(run())
+        return True
+
+    async def search(self, repository: str, query: str, k: int) -> List[Dict[str, Any]]:
+        """
+        Os `k` itens do repositório mais próximos da pergunta, como bindings (com a
+        semelhança em "score"). Devolve [] se o índice do repositório estiver vazio.
+        """
+        index = await self.index_for(repository)
+        if not len(index):
+            return []
+        query_vector = (await self.embedder([query]))[0]
+        started = time.perf_counter()
+        results = await asyncio.get_running_loop().run_in_executor(None, index.search, query_vector, k, self.min_score)
+        self.searches += 1
+        self.search_seconds += time.perf_counter() - started
+        return [{**item, "score": {"value": round(score, 4)}} for score, item in results]
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de utilização, expostos em /api/v1/metrics."""
+        return {
+            "repositories": {name: len(index) for name, index in self._indexes.items()},
+            "complete": sorted(self._complete),
+            "backfilling": sorted(name for name, task in self._backfills.items() if not task.done()),
+            "searches": self.searches,
+            "avg_search_ms": round(self.search_seconds / self.searches * 1000, 3) if self.searches else None,
+        }
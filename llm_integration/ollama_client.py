@@ -3,11 +3,45 @@ Cliente para integração com Ollama local.
 
 Este módulo fornece uma interface para interagir com modelos de linguagem
 através do Ollama executando localmente.
+
+- OllamaClient: cliente síncrono (sessão HTTP reutilizada), para scripts e utilitários.
+- AsyncOllamaClient: cliente assíncrono com pool de ligações, respostas em fluxo e
+  embeddings em lote, para uso dentro da API.
+
+Ambos pedem ao Ollama que mantenha o modelo carregado entre chamadas (`keep_alive`),
+para que o modelo local não seja recarregado a cada pedido.
 """
 import os
 import json
+import asyncio
 import requests
-from typing import Dict, Any, Optional, List, Union
+import httpx
+from typing import Dict, Any, Optional, List, Union, AsyncIterator
+
+from config import settings
+
+
+def _load_config(config_path: Optional[str]) -> Dict[str, Any]:
+    """Lê o ficheiro de configuração JSON do Ollama, se existir."""
+    if not config_path or not os.path.exists(config_path):
+        return {}
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        print(f"Configuração do Ollama carregada de: {config_path}")
+        return config
+    except Exception as e:
+        print(f"Erro ao carregar configuração do Ollama: {e}")
+        return {}
+
+
+def _generation_options(temperature: float, max_tokens: int, top_p: Optional[float] = None) -> Dict[str, Any]:
+    """Parâmetros de geração no formato da API do Ollama (dentro de "options")."""
+    options = {"temperature": temperature, "num_predict": max_tokens}
+    if top_p is not None:
+        options["top_p"] = top_p
+    return options
+
 
 class OllamaClient:
     """
@@ -17,9 +51,11 @@ class OllamaClient:
     funcionalidades usando modelos de linguagem através do Ollama.
     """
     
-    def __init__(self, base_url: str = "http://localhost:11434", 
-                 model: str = "llama2", 
-                 config_path: Optional[str] = None):
+    def __init__(self, base_url: str = settings.OLLAMA_BASE_URL,
+                 model: str = settings.OLLAMA_MODEL,
+                 config_path: Optional[str] = None,
+                 timeout: float = settings.OLLAMA_TIMEOUT,
+                 keep_alive: Union[str, int] = settings.OLLAMA_KEEP_ALIVE):
         """
         Inicializa o cliente Ollama.
         
@@ -27,28 +63,24 @@ class OllamaClient:
             base_url: URL base da API Ollama (padrão: http://localhost:11434)
             model: Nome do modelo a ser usado (padrão: llama2)
             config_path: Caminho para arquivo de configuração JSON (opcional)
+            timeout: Tempo máximo (segundos) de cada pedido
+            keep_alive: Tempo que o Ollama mantém o modelo em memória após cada pedido (ex: "30m")
         """
-        self.base_url = base_url
-        self.model = model
-        self.config = {}
-        
-        # Carregar configuração do arquivo se fornecido
-        if config_path and os.path.exists(config_path):
-            try:
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    self.config = json.load(f)
-                    
-                # Atualizar configurações a partir do arquivo
-                if 'base_url' in self.config:
-                    self.base_url = self.config['base_url']
-                if 'model' in self.config:
-                    self.model = self.config['model']
-                    
-                print(f"Configuração do Ollama carregada de: {config_path}")
-            except Exception as e:
-                print(f"Erro ao carregar configuração do Ollama: {e}")
+        self.config = _load_config(config_path)
+        self.base_url = self.config.get('base_url', base_url).rstrip('/')
+        self.model = self.config.get('model', model)
+        self.embedding_model = self.config.get('embedding_model', settings.OLLAMA_EMBEDDING_MODEL or self.model)
+        self.timeout = self.config.get('timeout', timeout)
+        self.keep_alive = self.config.get('keep_alive', keep_alive)
+        # Sessão reutilizada: as ligações ao servidor ficam abertas entre pedidos.
+        self.session = requests.Session()
         
         print(f"OllamaClient inicializado. URL: {self.base_url}, Modelo: {self.model}")
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        response = self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
     
     def generate_text(self, prompt: str, 
                       system_prompt: Optional[str] = None,
@@ -66,22 +98,19 @@ class OllamaClient:
         Returns:
             Dicionário com a resposta do modelo
         """
-        url = f"{self.base_url}/api/generate"
-        
         payload = {
             "model": self.model,
             "prompt": prompt,
-            "temperature": temperature,
-            "max_tokens": max_tokens
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": _generation_options(temperature, max_tokens)
         }
         
         if system_prompt:
             payload["system"] = system_prompt
             
         try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            return response.json()
+            return self._post("/api/generate", payload)
         except requests.exceptions.RequestException as e:
             print(f"Erro na comunicação com Ollama: {e}")
             return {"error": str(e)}
@@ -94,19 +123,31 @@ class OllamaClient:
             text: Texto para gerar embeddings
             
         Returns:
-            Dicionário com os embeddings
+            Dicionário com os embeddings ({"embedding": [...]})
         """
-        url = f"{self.base_url}/api/embeddings"
+        result = self.get_embeddings_batch([text])
+        if "error" in result:
+            return result
+        return {"embedding": result["embeddings"][0]}
         
+    def get_embeddings_batch(self, texts: List[str]) -> Dict[str, Any]:
+        """
+        Obtém os embeddings de vários textos num único pedido (/api/embed).
+
+        Args:
+            texts: Textos para gerar embeddings
+
+        Returns:
+            Dicionário com os embeddings, pela ordem dos textos ({"embeddings": [[...], ...]})
+        """
         payload = {
-            "model": self.model,
-            "prompt": text
+            "model": self.embedding_model,
+            "input": texts,
+            "keep_alive": self.keep_alive
         }
         
         try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            return response.json()
+            return self._post("/api/embed", payload)
         except requests.exceptions.RequestException as e:
             print(f"Erro ao obter embeddings: {e}")
             return {"error": str(e)}
@@ -121,7 +162,7 @@ class OllamaClient:
         url = f"{self.base_url}/api/tags"
         
         try:
-            response = requests.get(url)
+            response = self.session.get(url, timeout=self.timeout)
             response.raise_for_status()
             data = response.json()
             return [model["name"] for model in data.get("models", [])]
@@ -144,23 +185,196 @@ class OllamaClient:
         Returns:
             Dicionário com a resposta do modelo
         """
-        url = f"{self.base_url}/api/chat"
-        
         payload = {
             "model": self.model,
             "messages": messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": _generation_options(temperature, max_tokens)
         }
         
         try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            return response.json()
+            return self._post("/api/chat", payload)
         except requests.exceptions.RequestException as e:
             print(f"Erro na comunicação com Ollama: {e}")
             return {"error": str(e)}
 
+    def close(self):
+        """Fecha a sessão HTTP."""
+        self.session.close()
+
+
+class AsyncOllamaClient:
+    """
+    Cliente assíncrono para a API do Ollama.
+
+    Usa um único httpx.AsyncClient (pool de ligações com keep-alive), criado na primeira
+    utilização dentro do event loop. As gerações podem ser consumidas em fluxo (uma linha
+    JSON por fragmento) e os embeddings são pedidos em lotes de `embed_batch_size` textos.
+    """
+
+    def __init__(self, base_url: str = settings.OLLAMA_BASE_URL,
+                 model: str = settings.OLLAMA_MODEL,
+                 config_path: Optional[str] = None,
+                 timeout: float = settings.OLLAMA_TIMEOUT,
+                 keep_alive: Union[str, int] = settings.OLLAMA_KEEP_ALIVE,
+                 embed_batch_size: int = settings.OLLAMA_EMBED_BATCH_SIZE,
+                 max_connections: int = settings.OLLAMA_MAX_CONNECTIONS,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        Args:
+            base_url: URL base da API Ollama
+            model: Modelo de geração
+            config_path: Caminho para arquivo de configuração JSON (opcional)
+            timeout: Tempo máximo (segundos) de leitura de cada pedido ou fragmento
+            keep_alive: Tempo que o Ollama mantém o modelo em memória após cada pedido
+            embed_batch_size: Número máximo de textos por pedido de embeddings
+            max_connections: Ligações simultâneas ao servidor Ollama
+            transport: Transporte httpx alternativo (testes)
+        """
+        config = _load_config(config_path)
+        self.base_url = config.get('base_url', base_url).rstrip('/')
+        self.model = config.get('model', model)
+        self.embedding_model = config.get('embedding_model', settings.OLLAMA_EMBEDDING_MODEL or self.model)
+        self.keep_alive = config.get('keep_alive', keep_alive)
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.timeout = httpx.Timeout(config.get('timeout', timeout), connect=10.0)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Devolve o cliente HTTP do event loop atual, criando-o na primeira utilização."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(base_url=self.base_url, limits=self.limits, timeout=self.timeout,
+                                             transport=self.transport)
+            self._client_loop = loop
+        return self._client
+
+    @staticmethod
+    def _request_timeout(timeout: Optional[float]):
+        return httpx.Timeout(timeout, connect=10.0) if timeout is not None else httpx.USE_CLIENT_DEFAULT
+
+    async def _post(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        response = await self._get_client().post(path, json=payload, timeout=self._request_timeout(timeout))
+        response.raise_for_status()
+        return response.json()
+
+    async def _stream(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Entrega cada objeto JSON de uma resposta em fluxo (NDJSON) à medida que chega."""
+        async with self._get_client().stream("POST", path, json={**payload, "stream": True},
+                                             timeout=self._request_timeout(timeout)) as response:
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise RuntimeError(f"Erro do Ollama: {chunk['error']}")
+                yield chunk
+
+    def _generate_payload(self, prompt: str, system_prompt: Optional[str], temperature: float,
+                          max_tokens: int, top_p: Optional[float] = None) -> Dict[str, Any]:
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "keep_alive": self.keep_alive,
+            "options": _generation_options(temperature, max_tokens, top_p),
+        }
+        if system_prompt:
+            payload["system"] = system_prompt
+        return payload
+
+    async def generate_text(self, prompt: str, system_prompt: Optional[str] = None,
+                            temperature: float = 0.7, max_tokens: int = 500, top_p: Optional[float] = None,
+                            timeout: Optional[float] = None) -> str:
+        """
+        Gera texto a partir de um prompt e devolve a resposta completa.
+
+        Args:
+            timeout: Tempo máximo (segundos) de leitura deste pedido, em vez do do cliente.
+
+        Raises:
+            httpx.HTTPError: em erros de ligação, timeout ou resposta HTTP de erro.
+        """
+        payload = self._generate_payload(prompt, system_prompt, temperature, max_tokens, top_p)
+        result = await self._post("/api/generate", {**payload, "stream": False}, timeout)
+        return result.get("response", "")
+
+    async def stream_text(self, prompt: str, system_prompt: Optional[str] = None,
+                          temperature: float = 0.7, max_tokens: int = 500, top_p: Optional[float] = None,
+                          timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Gera texto a partir de um prompt, entregando cada fragmento assim que é produzido."""
+        payload = self._generate_payload(prompt, system_prompt, temperature, max_tokens, top_p)
+        async for chunk in self._stream("/api/generate", payload, timeout):
+            if chunk.get("response"):
+                yield chunk["response"]
+
+    async def chat_completion(self, messages: List[Dict[str, str]], temperature: float = 0.7,
+                              max_tokens: int = 500) -> str:
+        """Realiza uma conversa no formato de chat e devolve o conteúdo da resposta."""
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": _generation_options(temperature, max_tokens),
+        }
+        result = await self._post("/api/chat", payload)
+        return result.get("message", {}).get("content", "")
+
+    async def stream_chat(self, messages: List[Dict[str, str]], temperature: float = 0.7,
+                          max_tokens: int = 500) -> AsyncIterator[str]:
+        """Variante em fluxo de chat_completion."""
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "keep_alive": self.keep_alive,
+            "options": _generation_options(temperature, max_tokens),
+        }
+        async for chunk in self._stream("/api/chat", payload):
+            content = chunk.get("message", {}).get("content")
+            if content:
+                yield content
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Obtém os embeddings de vários textos, pela mesma ordem, com um pedido por cada
+        `embed_batch_size` textos.
+        """
+        embeddings: List[List[float]] = []
+        for start in range(0, len(texts), self.embed_batch_size):
+            batch = texts[start:start + self.embed_batch_size]
+            result = await self._post("/api/embed", {"model": self.embedding_model, "input": batch,
+                                                     "keep_alive": self.keep_alive})
+            embeddings.extend(result["embeddings"])
+        return embeddings
+
+    async def list_models(self) -> List[str]:
+        """Lista os modelos disponíveis localmente no Ollama."""
+        response = await self._get_client().get("/api/tags")
+        response.raise_for_status()
+        return [model["name"] for model in response.json().get("models", [])]
+
+    async def load_model(self, model: Optional[str] = None):
+        """Carrega o modelo em memória (pedido sem prompt), p. ex. no arranque da API."""
+        await self._post("/api/generate", {"model": model or self.model, "keep_alive": self.keep_alive,
+                                           "stream": False})
+
+    async def unload_model(self, model: Optional[str] = None):
+        """Pede ao Ollama que liberte já a memória do modelo."""
+        await self._post("/api/generate", {"model": model or self.model, "keep_alive": 0, "stream": False})
+
+    async def aclose(self):
+        """Fecha as ligações do pool."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
 # Exemplo de uso
 if __name__ == "__main__":
     # Criar cliente com configurações padrão
@@ -5,6 +5,8 @@ from agente_catalogador_ia.apis.external_ia_clients import BaseIAClient
 
 class LocalIAInterface(BaseIAClient):
     """Interface para carregar e utilizar os modelos de IA locais."""
+    requires_api_key = False
+
     def __init__(self, model_path=None, model_name="local_default_model"):
         """
         Inicializa a interface de IA Local.
@@ -3,30 +3,42 @@
 # Ponto de entrada principal da aplicação/API do agente com FastAPI.
 import os
 import sys
-import shutil
+import json
 import uuid
+import zipfile
 import uvicorn
 import asyncio
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Body, Path, status
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Body, Path, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
 # Adicionar o diretório do projeto ao path para importações corretas
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
 # Importações de componentes
-from config import ontology_config, sparql_api_config
+from config import ontology_config, sparql_api_config, settings
 from core.cataloger import Cataloger
 from core.reference_linker import ReferenceLinker
 from core.data_acquirer import DataAcquirer
 from core.search_engine import SearchEngine
 from core.chatbot_service import ChatbotService
-from core.document_processor_service import DocumentProcessorService, OCRService, NLPService
+from core.document_processor_service import NLP_MODEL_NAME, DocumentProcessorService, OCRService, NLPService
+from core.extraction_cache import ExtractionCache
+from core.document_job_service import DocumentJobService
+from core.upload_ingestion import UploadTooLargeError, ZipLimitError, extract_zip_documents, save_upload
 from core.persistence_service import PersistenceService
 from storage.sparql_api_client import SPARQLAPIClient
+from apis.gemini_client import GeminiClient
+from apis.wikidata_client import WikidataClient
+from apis.llm_router import GeminiProvider, LLMProviderRouter, OllamaProvider
+from llm_integration.ollama_client import AsyncOllamaClient
+from apis.provider_guard import ProviderGuard
+from core.llm_response_cache import LLMResponseCache, LLMResponseDiskCache
+from core.vector_index import SemanticIndex, VectorIndex
 
 # --- Configuração FastAPI e CORS ---
 app = FastAPI(
@@ -43,6 +55,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Limites de Upload ---
+# Tamanho máximo do corpo do pedido em cada rota de upload. Pedidos com Content-Length
+# acima do limite são recusados antes de o corpo ser lido; os restantes são verificados
+# enquanto o ficheiro é gravado.
+UPLOAD_SIZE_LIMITS = {
+    "/api/v1/documents/process": settings.UPLOAD_MAX_DOCUMENT_BYTES,
+    "/api/v1/documents/jobs": settings.UPLOAD_MAX_DOCUMENT_BYTES,
+    "/api/v1/documents/batches": settings.UPLOAD_MAX_BATCH_BYTES,
+    "/api/v1/config/ontologies/upload": settings.UPLOAD_MAX_ONTOLOGY_BYTES,
+}
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    max_bytes = UPLOAD_SIZE_LIMITS.get(request.url.path) if request.method == "POST" else None
+    content_length = request.headers.get("content-length")
+    if max_bytes is not None and content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        return JSONResponse(status_code=413, content={"detail": str(UploadTooLargeError(max_bytes))})
+    return await call_next(request)
+
 # --- Configuração de Pastas ---
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), "uploads")
 ONTOLOGY_FOLDER = ontology_config.ONTOLOGIES_DIR
@@ -57,52 +88,146 @@ guara_api_client = SPARQLAPIClient(
     email=sparql_api_config.API_EMAIL,
     password=sparql_api_config.API_PASSWORD
 )
-persistence_service_instance = PersistenceService(guara_api_client)
+ollama_client_instance = AsyncOllamaClient() if settings.OLLAMA_ENABLED or settings.VECTOR_INDEX_ENABLED else None
+# Índice vetorial local por repositório: alimentado pela persistência, usado pelo chatbot.
+semantic_index_instance = SemanticIndex(
+    settings.VECTOR_INDEX_DIR, ollama_client_instance.embed, min_score=settings.VECTOR_INDEX_MIN_SCORE
+) if settings.VECTOR_INDEX_ENABLED else None
+# Busca federada: índice local (BM25 e, com o índice vetorial ativo, também semântica) sobre os
+# itens catalogados, repositórios da API Guará e, opcionalmente, o Wikidata.
+wikidata_client_instance = WikidataClient() if settings.WIKIDATA_SEARCH_ENABLED else None
+search_engine_instance = SearchEngine(
+    vector_index=VectorIndex(os.path.join(settings.VECTOR_INDEX_DIR, "_busca")) if settings.VECTOR_INDEX_ENABLED else None,
+    embedder=ollama_client_instance.embed if settings.VECTOR_INDEX_ENABLED else None,
+    title_max_distance=settings.TITLE_MATCH_MAX_DISTANCE,
+    sparql_client=guara_api_client,
+    external_sources={"wikidata": wikidata_client_instance.search} if wikidata_client_instance else None,
+    source_timeout=settings.SEARCH_SOURCE_TIMEOUT,
+    deadline=settings.SEARCH_DEADLINE,
+    repository_cache_seconds=settings.SEARCH_REPOSITORY_CACHE_SECONDS,
+    pagination_depth=settings.SEARCH_PAGINATION_DEPTH,
+    snapshot_seconds=settings.SEARCH_CURSOR_TTL_SECONDS,
+    documents_path=settings.SEARCH_INDEX_PATH or None
+)
+persistence_service_instance = PersistenceService(guara_api_client, semantic_index=semantic_index_instance,
+                                                  search_engine=search_engine_instance)
 reference_linker_instance = ReferenceLinker()
 data_acquirer_instance = DataAcquirer()
-search_engine_instance = SearchEngine()
 cataloger_instance = Cataloger(
     ontology_config=ontology_config.ACTIVE_CONFIG,
     data_acquirer=data_acquirer_instance,
-    reference_linker=reference_linker_instance
+    reference_linker=reference_linker_instance,
+    search_engine=search_engine_instance
 )
 # CORREÇÃO: O ChatbotService precisa do cliente da API Guará para fazer buscas
-chatbot_service_instance = ChatbotService(sparql_client=guara_api_client)
+# Um único cliente do Gemini (pool de ligações) para a extração de itens e o chatbot.
+llm_response_cache_instance = LLMResponseCache(
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+    disk_cache=LLMResponseDiskCache(settings.LLM_CACHE_DIR, settings.LLM_CACHE_MAX_BYTES) if settings.LLM_CACHE_DIR else None
+) if settings.LLM_CACHE_ENABLED else None
+gemini_guard_instance = ProviderGuard(
+    "gemini",
+    requests_per_minute=settings.GEMINI_REQUESTS_PER_MINUTE,
+    burst=settings.GEMINI_BURST,
+    max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+    max_retries=settings.GEMINI_MAX_RETRIES,
+    backoff_base=settings.GEMINI_BACKOFF_BASE,
+    backoff_max=settings.GEMINI_BACKOFF_MAX,
+    failure_threshold=settings.GEMINI_CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=settings.GEMINI_CIRCUIT_RESET_SECONDS
+)
+gemini_client_instance = GeminiClient(cache=llm_response_cache_instance, guard=gemini_guard_instance)
+llm_providers = {"gemini": GeminiProvider(gemini_client_instance)}
+if settings.OLLAMA_ENABLED:
+    llm_providers["ollama"] = OllamaProvider(ollama_client_instance)
+llm_router_instance = LLMProviderRouter(
+    llm_providers,
+    window=settings.LLM_ROUTER_WINDOW,
+    max_error_rate=settings.LLM_ROUTER_MAX_ERROR_RATE,
+    probe_interval=settings.LLM_ROUTER_PROBE_SECONDS,
+    hedge_percentile=settings.LLM_HEDGE_PERCENTILE or None,
+    hedge_min_samples=settings.LLM_HEDGE_MIN_SAMPLES
+)
+chatbot_service_instance = ChatbotService(sparql_client=guara_api_client, gemini_client=gemini_client_instance, llm=llm_router_instance,
+                                          semantic_index=semantic_index_instance)
+document_executor = ThreadPoolExecutor(max_workers=settings.DOCUMENT_PROCESSING_THREADS, thread_name_prefix="documentos")
 ocr_service_instance = OCRService()
-nlp_service_instance = NLPService()
-document_processor_instance = DocumentProcessorService(ocr_service_instance, nlp_service_instance)
+nlp_service_instance = NLPService(executor=document_executor, gemini_client=gemini_client_instance, llm=llm_router_instance)
+extraction_cache_instance = ExtractionCache(settings.EXTRACTION_CACHE_DIR, settings.EXTRACTION_CACHE_MAX_BYTES)
+document_processor_instance = DocumentProcessorService(ocr_service_instance, nlp_service_instance, cache=extraction_cache_instance, executor=document_executor)
+document_job_service_instance = DocumentJobService(document_processor_instance, max_concurrent_jobs=settings.DOCUMENT_JOB_MAX_CONCURRENCY)
+document_warmup_future: Optional[asyncio.Future] = None
 
-# --- Evento de Startup ---
+# --- Eventos de Startup/Shutdown ---
 @app.on_event("startup")
 async def startup_event():
+    global document_warmup_future
     persistence_service_instance.start_worker()
+    if semantic_index_instance is not None:
+        for repository_name in settings.VECTOR_INDEX_BACKFILL_REPOSITORIES:
+            if not semantic_index_instance.is_complete(repository_name):
+                _start_vector_backfill(repository_name)
+    if settings.DOCUMENT_WARMUP_ON_STARTUP:
+        # O spaCy, o PyMuPDF e o motor de OCR carregam em segundo plano; a API responde já.
+        document_warmup_future = asyncio.get_running_loop().run_in_executor(document_executor, document_processor_instance.warm_up)
+        document_warmup_future.add_done_callback(_log_warmup_result)
+
+def _start_vector_backfill(repository_name: str) -> bool:
+    """Preenche, em segundo plano, o índice vetorial do repositório com todos os objetos da API Guará."""
+    repo_config = {"repository_query_url": f"http://localhost:3030/{repository_name}/query"}
+    return semantic_index_instance.start_backfill(repository_name, lambda: guara_api_client.iter_objects("", repo_config))
+
+def _log_warmup_result(future: asyncio.Future):
+    if future.cancelled():
+        return
+    if future.exception():
+        print(f"ERRO: Falha no aquecimento do processamento de documentos: {future.exception()}")
+    else:
+        print(f"Aquecimento do processamento de documentos concluído: {document_processor_instance.component_status()}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    ocr_service_instance.shutdown()
+    document_executor.shutdown(wait=False, cancel_futures=True)
+    await gemini_client_instance.aclose()
+    if ollama_client_instance is not None:
+        await ollama_client_instance.aclose()
+    if wikidata_client_instance is not None:
+        await wikidata_client_instance.aclose()
 
 # --- Modelos Pydantic ---
 class CatalogItemRequest(BaseModel): item_data: Dict[str, Any]; source_info: Optional[Dict[str, Any]] = None
 class CatalogItemResponse(BaseModel): status: str; message: str; item_uri_rdf: Optional[str] = None; linked_uris: List[str] = []
-class SearchResponse(BaseModel): query: str; results: List[Dict[str, Any]]
+class SearchResponse(BaseModel): query: str; results: List[Dict[str, Any]]; sources: Dict[str, Dict[str, Any]] = {}; next_cursor: Optional[str] = None; facets: Dict[str, List[Dict[str, Any]]] = {}
 class UpdateOntologyRequest(BaseModel): ontology_identifier: str
 class UpdateOntologyResponse(BaseModel): status: str; message: str; active_ontology_file: Optional[str] = None; new_config_summary: Optional[Dict[str, Any]] = None
 class AvailableOntologiesResponse(BaseModel): available_ontology_files: List[str]
 class ChatbotRequest(BaseModel): message: str; repository_name: str; session_id: Optional[str] = None
-class ChatbotResponse(BaseModel): reply: str; sources: Optional[List[Dict[str, Any]]] = None
+class ChatbotResponse(BaseModel): reply: str; sources: Optional[List[Dict[str, Any]]] = None; context: Optional[Dict[str, Any]] = None
 class UploadResponse(BaseModel): filename: str; message: str
 class CatalogedItem(BaseModel): entry_type: str; properties: Dict[str, Any]
-class ProcessResultData(BaseModel): texto_extraido_amostra: str; itens_catalogados: List[CatalogedItem]
+class PageExtractionInfo(BaseModel): pagina: int; metodo: str; caracteres: int; dpi: Optional[int] = None; confianca: Optional[float] = None; tempo_ms: Optional[int] = None
+class ProcessResultData(BaseModel): texto_extraido_amostra: str; itens_catalogados: List[CatalogedItem]; paginas: List[PageExtractionInfo] = []
 class DocumentProcessResponse(BaseModel): file_id: str; filename: str; status: str; data: Optional[ProcessResultData] = None; error: Optional[str] = None
+class DocumentJobSubmitResponse(BaseModel): job_id: str; file_id: str; filename: str; status: str; message: str
+class DocumentJobStatusResponse(BaseModel): job_id: str; batch_id: Optional[str] = None; file_id: str; filename: str; status: str; submitted_at: str; started_at: Optional[str] = None; finished_at: Optional[str] = None; error: Optional[str] = None
+class RejectedDocument(BaseModel): filename: str; error: str
+class DocumentBatchSubmitResponse(BaseModel): batch_id: str; total: int; rejected: List[RejectedDocument] = []; message: str
+class BatchDocumentStatus(BaseModel): job_id: str; file_id: str; filename: str; status: str; started_at: Optional[str] = None; finished_at: Optional[str] = None; error: Optional[str] = None; data: Optional[ProcessResultData] = None
+class DocumentBatchStatusResponse(BaseModel): batch_id: str; status: str; submitted_at: str; total: int; finished: int; counts: Dict[str, int]; documents: List[BatchDocumentStatus]; rejected: List[RejectedDocument] = []
 class SaveRequest(BaseModel): items: List[CatalogedItem]; repository_name: str
 class SaveResponse(BaseModel): task_id: str; message: str
 class StatusResultItem(BaseModel): item_title: Optional[str] = None; status: str; message: str; uri: Optional[str] = None
 class PersistenceStatusResponse(BaseModel): status: str; total_items: int; processed_items: int; results: List[StatusResultItem]; error: Optional[str] = None
 
 # --- Funções Helper ---
-async def save_uploaded_file_async(file: UploadFile, destination_folder: str) -> str:
-    original_filename = os.path.basename(file.filename)
-    safe_filename = f"{uuid.uuid4().hex}_{original_filename}"
-    destination_path = os.path.join(destination_folder, safe_filename)
-    with open(destination_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    return safe_filename
+async def save_uploaded_file_async(file: UploadFile, destination_folder: str, max_bytes: int, content_addressed: bool = False) -> Tuple[str, str]:
+    """Guarda um ficheiro carregado (ver core/upload_ingestion.py); responde 413 se exceder max_bytes."""
+    try:
+        return await save_upload(file, destination_folder, max_bytes, content_addressed=content_addressed)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
 # --- Rotas da API ---
 
@@ -110,6 +235,34 @@ async def save_uploaded_file_async(file: UploadFile, destination_folder: str) ->
 async def health_check_endpoint():
     return {"status": "ok", "message": "MemoriA API está operacional"}
 
+@app.get("/api/v1/ready", tags=["Status"], summary="Verifica se o processamento de documentos está pronto")
+async def readiness_check_endpoint():
+    # Com o aquecimento desligado, os modelos carregam no primeiro pedido: "por_carregar" não impede a prontidão.
+    components = document_processor_instance.component_status()
+    if document_warmup_future is not None and not document_warmup_future.done():
+        return JSONResponse(status_code=503, content={"status": "warming_up", "components": components})
+    error = None
+    if document_warmup_future is not None and document_warmup_future.cancelled():
+        error = "O aquecimento do processamento de documentos foi cancelado."
+    elif document_warmup_future is not None and document_warmup_future.exception() is not None:
+        error = f"Falha no aquecimento do processamento de documentos: {document_warmup_future.exception()}"
+    elif components["modelo_nlp"] == "indisponivel":
+        error = f"Modelo spaCy '{NLP_MODEL_NAME}' não encontrado."
+    if error:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "components": components, "error": error})
+    return {"status": "ready", "components": components}
+
+@app.get("/api/v1/metrics", tags=["Status"], summary="Contadores de desempenho da API")
+async def metrics_endpoint():
+    return {
+        "llm_cache": llm_response_cache_instance.stats() if llm_response_cache_instance else {"enabled": False},
+        "gemini": gemini_guard_instance.stats(),
+        "llm_router": llm_router_instance.stats(),
+        "chatbot": chatbot_service_instance.stats(),
+        "search": search_engine_instance.stats(),
+        "vector_index": semantic_index_instance.stats() if semantic_index_instance else {"enabled": False},
+    }
+
 @app.get("/api/v1/config/ontology", tags=["Ontologia"], summary="Obtém a configuração da ontologia ativa")
 async def get_ontology_config_endpoint():
     return ontology_config.ACTIVE_CONFIG.copy()
@@ -126,7 +279,7 @@ async def list_available_ontologies():
 async def upload_ontology_file(ontology_file: UploadFile = File(...)):
     if not ontology_file.filename or ontology_file.filename.rsplit('.', 1)[1].lower() not in ALLOWED_ONTOLOGY_EXTENSIONS:
         raise HTTPException(status_code=400, detail="Tipo de ficheiro não permitido.")
-    safe_filename = await save_uploaded_file_async(ontology_file, ONTOLOGY_FOLDER)
+    safe_filename, _ = await save_uploaded_file_async(ontology_file, ONTOLOGY_FOLDER, settings.UPLOAD_MAX_ONTOLOGY_BYTES)
     return UploadResponse(filename=os.path.basename(ontology_file.filename), message=f"Ficheiro '{os.path.basename(ontology_file.filename)}' carregado.")
 
 @app.put("/api/v1/config/ontology", response_model=UpdateOntologyResponse, tags=["Ontologia"], summary="Atualiza a ontologia ativa")
@@ -136,7 +289,7 @@ async def update_ontology_config_endpoint(request_data: UpdateOntologyRequest):
         new_config = ontology_config.load_ontology_config(request_data.ontology_identifier)
         ontology_config.ACTIVE_CONFIG = new_config
         ontology_config.update_global_config_vars()
-        cataloger_instance = Cataloger(ontology_config=new_config, data_acquirer=data_acquirer_instance, reference_linker=reference_linker_instance)
+        cataloger_instance = Cataloger(ontology_config=new_config, data_acquirer=data_acquirer_instance, reference_linker=reference_linker_instance, search_engine=search_engine_instance)
         return UpdateOntologyResponse(status="sucesso", message=f"Ontologia ativa definida para '{request_data.ontology_identifier}'.", new_config_summary=new_config)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -147,31 +300,165 @@ async def catalog_item_endpoint(request_data: CatalogItemRequest):
     return CatalogItemResponse(status="sucesso", message="Item processado.", **result)
 
 @app.get("/api/v1/search", response_model=SearchResponse, tags=["Busca"], summary="Realiza uma busca no acervo")
-async def search_items_endpoint(query: str = Query(...)):
-    results = search_engine_instance.search(query, ["local"])
-    return SearchResponse(query=query, results=results or [])
+async def search_items_endpoint(request: Request, query: str = Query(...), limit: int = Query(20, ge=1, le=100),
+                                sources: Optional[List[str]] = Query(None, description="Fontes: local, repositories, guara:<repositório>, wikidata"),
+                                validate_reliability: bool = Query(True),
+                                cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+                                stream: bool = Query(False, description="Emite os resultados em NDJSON à medida que cada fonte responde"),
+                                author: Optional[List[str]] = Query(None), place: Optional[List[str]] = Query(None),
+                                date: Optional[List[str]] = Query(None, description="Ano, p. ex. 1906")):
+    """
+    Busca federada. Com `stream`, os resultados saem em NDJSON à medida que cada fonte
+    responde; com `validate_reliability`, os das fontes externas saem depois dos fiáveis.
+    O fluxo não é paginado: `cursor` só se aplica às respostas normais (400 com `stream`).
+    """
+    sources = sources or settings.SEARCH_DEFAULT_SOURCES
+    filters = {field: values for field, values in (("author", author), ("place", place), ("date", date)) if values}
+    if stream:
+        if cursor:
+            raise HTTPException(status_code=400, detail="O parâmetro cursor não se aplica a buscas em fluxo (stream).")
+
+        async def ndjson_stream():
+            events = search_engine_instance.search_stream(query, sources, limit=limit, filters=filters,
+                                                          validate_reliability=validate_reliability)
+            try:
+                async for event in events:
+                    if await request.is_disconnected():
+                        break
+                    yield json.dumps(event, ensure_ascii=False) + "\n"
+            finally:
+                await events.aclose()
+
+        return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    try:
+        found = await search_engine_instance.search(query, sources, validate_reliability=validate_reliability,
+                                                    limit=limit, cursor=cursor, filters=filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return SearchResponse(query=query, results=found["results"], sources=found["sources"],
+                          next_cursor=found["next_cursor"], facets=found["facets"])
 
 @app.post("/api/v1/chatbot", response_model=ChatbotResponse, tags=["Chatbot"], summary="Interage com o chatbot RAG")
 async def chatbot_endpoint(request_data: ChatbotRequest):
     if not request_data.repository_name:
         raise HTTPException(status_code=400, detail="O nome do repositório é obrigatório.")
     try:
-        reply, sources = await chatbot_service_instance.process_message(user_message=request_data.message, repository_name=request_data.repository_name)
-        return ChatbotResponse(reply=reply, sources=sources)
+        reply, sources, context = await chatbot_service_instance.process_message(user_message=request_data.message, repository_name=request_data.repository_name)
+        return ChatbotResponse(reply=reply, sources=sources, context=context)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro interno no chatbot: {e}")
 
+@app.post("/api/v1/chatbot/stream", tags=["Chatbot"], summary="Interage com o chatbot RAG, com a resposta em fluxo (server-sent events)")
+async def chatbot_stream_endpoint(request_data: ChatbotRequest, request: Request):
+    if not request_data.repository_name:
+        raise HTTPException(status_code=400, detail="O nome do repositório é obrigatório.")
+
+    async def event_stream():
+        events = chatbot_service_instance.stream_message(user_message=request_data.message, repository_name=request_data.repository_name)
+        try:
+            async for event, data in events:
+                if await request.is_disconnected():
+                    break
+                yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        finally:
+            # Fecha o pedido ao modelo se o cliente desligou a meio da resposta.
+            await events.aclose()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.post("/api/v1/documents/process", response_model=DocumentProcessResponse, tags=["Documentos"], summary="Processa um documento para extração")
 async def upload_and_process_document(document: UploadFile = File(...)):
     if not document.filename or document.filename.rsplit('.', 1)[1].lower() not in ALLOWED_DOC_EXTENSIONS:
         raise HTTPException(status_code=400, detail="Tipo de ficheiro não permitido.")
-    file_id = await save_uploaded_file_async(document, UPLOAD_FOLDER)
+    file_id, content_hash = await save_uploaded_file_async(document, UPLOAD_FOLDER, settings.UPLOAD_MAX_DOCUMENT_BYTES, content_addressed=True)
     filepath = os.path.join(UPLOAD_FOLDER, file_id)
-    processed_data = await document_processor_instance.process_document_for_multiple_items(filepath, ontology_config.ACTIVE_CONFIG)
+    processed_data = await document_job_service_instance.process_now(filepath, ontology_config.ACTIVE_CONFIG, content_hash=content_hash)
     if "error" in processed_data:
         return JSONResponse(status_code=500, content={"file_id": file_id, "filename": document.filename, "status": "error", "error": processed_data["error"]})
     return DocumentProcessResponse(file_id=file_id, filename=document.filename, status="completed", data=processed_data)
 
+@app.post("/api/v1/documents/jobs", response_model=DocumentJobSubmitResponse, status_code=202, tags=["Documentos"], summary="Submete um documento para processamento em segundo plano")
+async def submit_document_job(document: UploadFile = File(...)):
+    if not document.filename or document.filename.rsplit('.', 1)[1].lower() not in ALLOWED_DOC_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Tipo de ficheiro não permitido.")
+    file_id, content_hash = await save_uploaded_file_async(document, UPLOAD_FOLDER, settings.UPLOAD_MAX_DOCUMENT_BYTES, content_addressed=True)
+    filepath = os.path.join(UPLOAD_FOLDER, file_id)
+    job_id = document_job_service_instance.submit(filepath, document.filename, file_id, ontology_config.ACTIVE_CONFIG, content_hash=content_hash)
+    return DocumentJobSubmitResponse(job_id=job_id, file_id=file_id, filename=document.filename, status="pending", message="Documento adicionado à fila de processamento.")
+
+@app.get("/api/v1/documents/jobs/{job_id}", response_model=DocumentJobStatusResponse, tags=["Documentos"], summary="Verifica o estado de uma tarefa de processamento")
+async def get_document_job_status(job_id: str):
+    job = document_job_service_instance.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada.")
+    return job
+
+@app.get("/api/v1/documents/jobs/{job_id}/result", response_model=DocumentProcessResponse, tags=["Documentos"], summary="Obtém o resultado de uma tarefa de processamento")
+async def get_document_job_result(job_id: str):
+    job = document_job_service_instance.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada.")
+    if job["status"] == "failed":
+        return JSONResponse(status_code=500, content={"file_id": job["file_id"], "filename": job["filename"], "status": "error", "error": job["error"]})
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"A tarefa ainda não terminou (estado: {job['status']}).")
+    return DocumentProcessResponse(file_id=job["file_id"], filename=job["filename"], status="completed", data=job["result"])
+
+@app.post("/api/v1/documents/batches", response_model=DocumentBatchSubmitResponse, status_code=202, tags=["Documentos"], summary="Submete vários documentos (ou arquivos zip) para processamento em lote")
+async def submit_document_batch(documents: List[UploadFile] = File(...)):
+    # Um ficheiro demasiado grande é recusado sozinho (como os membros de um zip), sem
+    # abandonar os já guardados do mesmo lote.
+    accepted, rejected = [], []
+    for document in documents:
+        extension = document.filename.rsplit('.', 1)[1].lower() if document.filename and '.' in document.filename else ""
+        if extension == "zip":
+            try:
+                zip_filename, _ = await save_upload(document, UPLOAD_FOLDER, settings.UPLOAD_MAX_BATCH_BYTES)
+            except UploadTooLargeError as e:
+                rejected.append({"filename": document.filename, "error": str(e)})
+                continue
+            zip_path = os.path.join(UPLOAD_FOLDER, zip_filename)
+            try:
+                members, members_rejected = await asyncio.get_running_loop().run_in_executor(
+                    None, extract_zip_documents, zip_path, UPLOAD_FOLDER, ALLOWED_DOC_EXTENSIONS,
+                    settings.UPLOAD_MAX_DOCUMENT_BYTES, settings.DOCUMENT_BATCH_MAX_DOCUMENTS - len(accepted),
+                    settings.UPLOAD_MAX_ZIP_EXTRACTED_BYTES, settings.UPLOAD_MAX_ZIP_MEMBERS)
+            except zipfile.BadZipFile:
+                rejected.append({"filename": document.filename, "error": "Arquivo zip inválido."})
+                continue
+            except ZipLimitError as e:
+                rejected.append({"filename": document.filename, "error": str(e)})
+                continue
+            finally:
+                os.remove(zip_path)
+            accepted.extend(members)
+            rejected.extend(members_rejected)
+        elif extension not in ALLOWED_DOC_EXTENSIONS:
+            rejected.append({"filename": document.filename or "", "error": "Tipo de ficheiro não permitido."})
+        elif len(accepted) >= settings.DOCUMENT_BATCH_MAX_DOCUMENTS:
+            rejected.append({"filename": document.filename, "error": f"O lote excede o máximo de {settings.DOCUMENT_BATCH_MAX_DOCUMENTS} documentos."})
+        else:
+            try:
+                file_id, content_hash = await save_upload(document, UPLOAD_FOLDER, settings.UPLOAD_MAX_DOCUMENT_BYTES, content_addressed=True)
+            except UploadTooLargeError as e:
+                rejected.append({"filename": document.filename, "error": str(e)})
+                continue
+            accepted.append({"filename": document.filename, "file_id": file_id, "content_hash": content_hash})
+    if not accepted:
+        return JSONResponse(status_code=400, content={"detail": "Nenhum documento válido no lote.", "rejected": rejected})
+    for document in accepted:
+        document["filepath"] = os.path.join(UPLOAD_FOLDER, document["file_id"])
+    batch_id = document_job_service_instance.submit_batch(accepted, ontology_config.ACTIVE_CONFIG, rejected=rejected)
+    return DocumentBatchSubmitResponse(batch_id=batch_id, total=len(accepted), rejected=rejected, message=f"{len(accepted)} documentos adicionados à fila de processamento.")
+
+@app.get("/api/v1/documents/batches/{batch_id}", response_model=DocumentBatchStatusResponse, tags=["Documentos"], summary="Verifica o progresso de um lote e obtém os resultados já disponíveis")
+async def get_document_batch_status(batch_id: str):
+    batch = document_job_service_instance.get_batch(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Lote não encontrado.")
+    batch["documents"] = [{**job, "data": job["result"]} for job in batch["documents"]]
+    return batch
+
 @app.get("/api/v1/repositories", response_model=List[Dict[str, Any]], tags=["Repositórios"], summary="Lista os repositórios disponíveis")
 async def list_repositories_endpoint():
     repos = guara_api_client.list_repositories()
@@ -192,12 +479,21 @@ async def save_items_to_repository(request: SaveRequest):
     repo_config = {
         "repository_update_url": f"http://localhost:3030/{repo_dataset_id}/update",
         "repository_query_url": f"http://localhost:3030/{repo_dataset_id}/query",
-        "repository_base_uri": f"http://localhost:3030/{repo_dataset_id}#"
+        "repository_base_uri": f"http://localhost:3030/{repo_dataset_id}#",
+        "repository_name": repo_dataset_id
     }
     task_id = str(uuid.uuid4())
     await persistence_service_instance.add_to_queue(items=[item.dict() for item in request.items], repo_config=repo_config, task_id=task_id)
     return SaveResponse(task_id=task_id, message=f"{len(request.items)} itens adicionados à fila de processamento.")
 
+@app.post("/api/v1/vector-index/{repository_name}/backfill", status_code=202, tags=["Chatbot"], summary="Preenche o índice vetorial do chatbot com os objetos já existentes no repositório")
+async def backfill_vector_index(repository_name: str = Path(..., description="Nome do dataset do repositório")):
+    if semantic_index_instance is None:
+        raise HTTPException(status_code=409, detail="O índice vetorial está desativado (VECTOR_INDEX_ENABLED).")
+    started = _start_vector_backfill(repository_name)
+    return {"repository": repository_name, "started": started,
+            "complete": semantic_index_instance.is_complete(repository_name)}
+
 @app.get("/api/v1/persistence/status/{task_id}", response_model=PersistenceStatusResponse, tags=["Persistência"], summary="Verifica o estado de uma tarefa")
 async def get_persistence_status(task_id: str):
     status = persistence_service_instance.processing_status.get(task_id)
@@ -4,7 +4,7 @@ Cliente para interagir com a API REST do backend SPARQL (Guará API).
 """
 import requests
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, List, Any, Optional
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,6 +24,8 @@ class SPARQLAPIClient:
         self.email = email
         self.password = password
         self.token = None
+        # Se a API aplica LIMIT/OFFSET em /dim/list (None enquanto não se souber).
+        self.server_paginates: Optional[bool] = None
 
         if email and password:
             self.authenticate()
@@ -79,19 +81,41 @@ class SPARQLAPIClient:
                 logger.error(f"Detalhes do erro da API Guará: {e.response.text}")
             raise
 
-    def list_objects(self, keyword: str, repo_config: Dict[str, str]) -> List[Dict[str, Any]]:
-        """Busca por objetos existentes usando uma palavra-chave."""
+    def _request_objects(self, keyword: str, repo_config: Dict[str, str],
+                         limit: Optional[int], offset: int) -> List[Dict[str, Any]]:
+        endpoint = f"{self.api_base_url}/dim/list"
+        payload = {
+            "keyword": keyword,
+            "repository": repo_config.get("repository_query_url")  # Usa o endpoint de consulta
+        }
+        if limit is not None:
+            payload.update({"limit": limit, "offset": offset})
+        response = requests.post(endpoint, json=payload, headers=self._get_headers(), timeout=30)
+        response.raise_for_status()
+        return response.json().get("results", {}).get("bindings", [])
+
+    def list_objects(self, keyword: str, repo_config: Dict[str, str],
+                     limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Busca por objetos existentes usando uma palavra-chave.
+
+        Com `limit`, pede só uma página (LIMIT/OFFSET na consulta SPARQL da API Guará). Se a
+        API ignorar a paginação e devolver tudo, a página é recortada aqui. Uma resposta com
+        mais do que `limit` itens mostra que a API a ignorou; uma resposta curta com
+        `offset` > 0 é ambígua, e a primeira vez compara-se com a página inicial: se
+        começarem pelo mesmo item, a API devolveu o resultado completo. A conclusão fica em
+        `server_paginates`.
+        """
         try:
-            endpoint = f"{self.api_base_url}/dim/list"
-            payload = {
-                "keyword": keyword,
-                "repository": repo_config.get("repository_query_url")  # Usa o endpoint de consulta
-            }
-            response = requests.post(endpoint, json=payload, headers=self._get_headers(), timeout=30)
-            response.raise_for_status()
-
-            result = response.json()
-            bindings = result.get("results", {}).get("bindings", [])
+            bindings = self._request_objects(keyword, repo_config, limit, offset)
+            if limit is not None:
+                if len(bindings) > limit:
+                    self.server_paginates = False
+                elif offset and bindings and self.server_paginates is None:
+                    first_page = self._request_objects(keyword, repo_config, limit, 0)
+                    self.server_paginates = not first_page or first_page[0] != bindings[0]
+                if self.server_paginates is False:
+                    bindings = bindings[offset:offset + limit]
             logger.info(f"Busca por '{keyword}' na API Guará encontrou {len(bindings)} resultados.")
             return bindings
 
@@ -99,6 +123,35 @@ class SPARQLAPIClient:
             logger.error(f"Erro ao listar objetos na API Guará: {e}")
             return []
 
+    def iter_objects(self, keyword: str, repo_config: Dict[str, str], page_size: int = 100) -> Iterator[Dict[str, Any]]:
+        """
+        Percorre todos os objetos encontrados, uma página de `page_size` de cada vez.
+
+        Ao contrário de list_objects, os erros da API são propagados (requests.RequestException):
+        uma falha a meio não pode parecer o fim do resultado. Se a API ignorar LIMIT/OFFSET, o
+        resultado completo é pedido uma só vez e percorrido aqui.
+        """
+        if self.server_paginates is False:
+            yield from self._request_objects(keyword, repo_config, None, 0)
+            return
+        offset = 0
+        first = None
+        while True:
+            page = self._request_objects(keyword, repo_config, page_size, offset)
+            if len(page) > page_size or (offset and page and page[0] == first):
+                # A API ignorou a paginação: a resposta já é o resultado completo.
+                self.server_paginates = False
+                yield from page[offset:]
+                return
+            if offset and page:
+                self.server_paginates = True
+            elif page:
+                first = page[0]
+            yield from page
+            if len(page) < page_size:
+                return
+            offset += page_size
+
     def list_repositories(self) -> List[Dict[str, Any]]:
         """Busca a lista de repositórios disponíveis na API Guará."""
         try:
@@ -0,0 +1,94 @@
+# Testes para o ChatbotService.
+import os
+import sys
+import time
+import asyncio
+import unittest
+
+import httpx
+
+# Adicionar o diretório pai ao sys.path para importar os módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apis.gemini_client import GeminiClient
+from core.chatbot_service import ChatbotService
+from core.rag_context import ContextBuilder, NO_CONTEXT, estimate_tokens
+
+
+def binding(title, summary):
+    return {"titulo": {"value": title}, "resumo": {"value": summary}}
+
+
+class SlowSPARQLClient:
+    """Substitui o cliente SPARQL: conta as buscas e demora um pouco a responder."""
+
+    def __init__(self):
+        self.queries = []
+
+    def list_objects(self, query, repo_config):
+        self.queries.append((query, repo_config["repository_query_url"]))
+        time.sleep(0.05)
+        return [{"titulo": {"value": "14-bis"}, "resumo": {"value": "Avião de Santos-Dumont."}}]
+
+
+class TestRequestCoalescing(unittest.TestCase):
+    """Perguntas iguais em simultâneo partilham a busca e a geração."""
+
+    def test_identical_concurrent_questions_share_one_call(self):
+        generations = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            generations.append(request)
+            return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": "Resposta"}]}}]})
+
+        sparql = SlowSPARQLClient()
+        chatbot = ChatbotService(sparql_client=sparql,
+                                 gemini_client=GeminiClient(api_key="chave", transport=httpx.MockTransport(handler)))
+
+        async def kiosks():
+            questions = ["Quem voou no 14-bis?", "quem voou no  14-bis?", " Quem voou no 14-bis? "]
+            calls = [chatbot.process_message(question, "acervo") for question in questions]
+            calls.append(chatbot.process_message("Quem voou no 14-bis?", "outro-acervo"))
+            return await asyncio.gather(*calls)
+
+        results = asyncio.run(kiosks())
+
+        self.assertTrue(all(reply == "Resposta" and sources for reply, sources, _context in results))
+        self.assertEqual(len(sparql.queries), 2)
+        self.assertEqual(len(generations), 2)
+        self.assertEqual(chatbot.stats(), {"requests": 4, "coalesced": 2, "in_flight": 0})
+
+
+class TestContextBuilder(unittest.TestCase):
+    """Testes para a montagem do contexto dos prompts dentro do orçamento de tokens."""
+
+    def test_most_relevant_items_come_first_and_duplicates_are_dropped(self):
+        results = [
+            binding("Retrato de família", "Fotografia de estúdio em Lisboa."),
+            binding("Demoiselle", "Avião de Santos-Dumont, sucessor do 14-bis."),
+            binding("14-bis", "Avião de Santos-Dumont que voou em Paris em 1906."),
+            binding("14-Bis", "Avião de Santos Dumont que voou em Paris em 1906."),
+        ]
+        context, kept, selection = ContextBuilder(2000, 200).build("Quem voou no 14-bis em Paris?", results)
+
+        self.assertEqual([item["titulo"]["value"] for item in kept], ["14-bis", "Demoiselle", "Retrato de família"])
+        self.assertTrue(context.startswith("Item: 14-bis."))
+        self.assertEqual((selection["kept"], selection["dropped"], selection["duplicates"]), (3, 1, 1))
+
+    def test_context_respects_token_budget(self):
+        results = [binding(f"Obra {i}", "palavra " * 500) for i in range(50)]
+        context, kept, selection = ContextBuilder(300, 100).build("obra", results)
+
+        self.assertLessEqual(estimate_tokens(context), 300)
+        self.assertEqual(selection["kept"], len(kept))
+        self.assertEqual(selection["truncated"], len(kept))
+        self.assertEqual(selection["kept"] + selection["dropped"], 50)
+        self.assertTrue(all(part.endswith("…") for part in context.split(" Item: ")))
+
+    def test_no_results(self):
+        context, kept, selection = ContextBuilder(2000, 200).build("14-bis", [])
+        self.assertEqual((context, kept, selection["kept"]), (NO_CONTEXT, [], 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
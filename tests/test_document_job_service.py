@@ -0,0 +1,171 @@
+# Testes para as tarefas de processamento de documentos em segundo plano.
+import os
+import sys
+import asyncio
+import unittest
+
+# Adicionar o diretório pai ao sys.path para importar os módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.document_job_service import DocumentJobService
+
+
+class FakeDocumentProcessor:
+    """Substitui o DocumentProcessorService: cada documento espera pela sua libertação no teste."""
+
+    def __init__(self):
+        self.release: dict = {}
+        self.running = 0
+        self.max_running = 0
+
+    async def process_document_for_multiple_items(self, filepath, ontology_config, content_hash=None):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await self.release.setdefault(filepath, asyncio.Event()).wait()
+        finally:
+            self.running -= 1
+        if filepath.startswith("erro"):
+            return {"error": f"Não foi possível ler {filepath}."}
+        if filepath.startswith("excecao"):
+            raise RuntimeError("OCR indisponível")
+        return {"file_id": filepath, "data": {"itens_catalogados": []}}
+
+    def finish(self, filepath):
+        self.release.setdefault(filepath, asyncio.Event()).set()
+
+
+async def settle():
+    """Deixa correr as tarefas agendadas até ficarem à espera."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestDocumentJobService(unittest.TestCase):
+    """Testes para o DocumentJobService."""
+
+    def test_job_goes_from_pending_to_processing_to_completed(self):
+        async def run():
+            processor = FakeDocumentProcessor()
+            service = DocumentJobService(processor, max_concurrent_jobs=1)
+            job_id = service.submit("doc.pdf", "doc.pdf", "f1", {})
+            states = [service.get_job(job_id)["status"]]
+            await settle()
+            states.append(service.get_job(job_id)["status"])
+            processor.finish("doc.pdf")
+            await settle()
+            states.append(service.get_job(job_id)["status"])
+            return states, service.get_job(job_id)
+
+        states, job = asyncio.run(run())
+        self.assertEqual(states, ["pending", "processing", "completed"])
+        self.assertEqual(job["result"]["file_id"], "doc.pdf")
+        self.assertIsNotNone(job["started_at"])
+        self.assertIsNotNone(job["finished_at"])
+        self.assertIsNone(job["error"])
+
+    def test_errors_and_exceptions_mark_the_job_failed(self):
+        async def run():
+            processor = FakeDocumentProcessor()
+            service = DocumentJobService(processor, max_concurrent_jobs=2)
+            error_id = service.submit("erro.pdf", "erro.pdf", "f1", {})
+            exception_id = service.submit("excecao.pdf", "excecao.pdf", "f2", {})
+            await settle()
+            processor.finish("erro.pdf")
+            processor.finish("excecao.pdf")
+            await settle()
+            return service.get_job(error_id), service.get_job(exception_id)
+
+        error_job, exception_job = asyncio.run(run())
+        self.assertEqual(error_job["status"], "failed")
+        self.assertEqual(error_job["error"], "Não foi possível ler erro.pdf.")
+        self.assertEqual(exception_job["status"], "failed")
+        self.assertEqual(exception_job["error"], "OCR indisponível")
+
+    def test_concurrency_is_limited(self):
+        async def run():
+            processor = FakeDocumentProcessor()
+            service = DocumentJobService(processor, max_concurrent_jobs=2)
+            job_ids = [service.submit(f"doc{i}.pdf", f"doc{i}.pdf", f"f{i}", {}) for i in range(5)]
+            await settle()
+            waiting = [service.get_job(job_id)["status"] for job_id in job_ids]
+            for i in range(5):
+                processor.finish(f"doc{i}.pdf")
+            await settle()
+            return waiting, [service.get_job(job_id)["status"] for job_id in job_ids], processor.max_running
+
+        waiting, finished, max_running = asyncio.run(run())
+        self.assertEqual(waiting, ["processing", "processing", "pending", "pending", "pending"])
+        self.assertEqual(finished, ["completed"] * 5)
+        self.assertEqual(max_running, 2)
+
+    def test_synchronous_processing_shares_the_limit(self):
+        async def run():
+            processor = FakeDocumentProcessor()
+            service = DocumentJobService(processor, max_concurrent_jobs=1)
+            job_id = service.submit("tarefa.pdf", "tarefa.pdf", "f1", {})
+            direct = asyncio.create_task(service.process_now("direto.pdf", {}))
+            await settle()
+            waiting = processor.running
+            processor.finish("tarefa.pdf")
+            processor.finish("direto.pdf")
+            result = await direct
+            return waiting, result, service.get_job(job_id)["status"], processor.max_running
+
+        waiting, result, status, max_running = asyncio.run(run())
+        self.assertEqual(waiting, 1)
+        self.assertEqual(result["file_id"], "direto.pdf")
+        self.assertEqual(status, "completed")
+        self.assertEqual(max_running, 1)
+
+    def test_oldest_finished_jobs_are_pruned(self):
+        async def run():
+            processor = FakeDocumentProcessor()
+            service = DocumentJobService(processor, max_concurrent_jobs=4, max_finished_jobs=2)
+            old_ids = [service.submit(f"doc{i}.pdf", f"doc{i}.pdf", f"f{i}", {}) for i in range(3)]
+            for i in range(3):
+                processor.finish(f"doc{i}.pdf")
+            await settle()
+            running_id = service.submit("novo.pdf", "novo.pdf", "f9", {})
+            await settle()
+            return service, old_ids, running_id
+
+        service, old_ids, running_id = asyncio.run(run())
+        self.assertIsNone(service.get_job(old_ids[0]))
+        self.assertEqual(service.get_job(old_ids[1])["status"], "completed")
+        self.assertEqual(service.get_job(old_ids[2])["status"], "completed")
+        # As tarefas por terminar nunca são esquecidas.
+        self.assertEqual(service.get_job(running_id)["status"], "processing")
+
+    def test_batch_progress_and_pruning(self):
+        async def run():
+            processor = FakeDocumentProcessor()
+            service = DocumentJobService(processor, max_concurrent_jobs=4, max_finished_batches=1)
+            documents = [{"filepath": f"doc{i}.pdf", "filename": f"doc{i}.pdf", "file_id": f"f{i}"} for i in range(2)]
+            first = service.submit_batch(documents, {}, rejected=[{"filename": "x.exe", "error": "Tipo de ficheiro não permitido."}])
+            await settle()
+            processor.finish("doc0.pdf")
+            await settle()
+            partial = service.get_batch(first)
+            processor.finish("doc1.pdf")
+            await settle()
+            done = service.get_batch(first)
+            second = service.submit_batch([{"filepath": "erro.pdf", "filename": "erro.pdf", "file_id": "f9"}], {})
+            processor.finish("erro.pdf")
+            await settle()
+            third = service.submit_batch([], {})
+            return service, first, partial, done, second, third
+
+        service, first, partial, done, second, third = asyncio.run(run())
+        self.assertEqual((partial["status"], partial["finished"], partial["total"]), ("processing", 1, 2))
+        self.assertEqual(done["status"], "completed")
+        self.assertEqual(done["rejected"][0]["filename"], "x.exe")
+        # Só fica o lote terminado mais recente, e as tarefas dos esquecidos vão com eles.
+        self.assertIsNone(service.get_batch(first))
+        self.assertIsNone(service.get_batch(second))
+        self.assertEqual(service.get_batch(third)["total"], 0)
+        self.assertEqual(service.jobs, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
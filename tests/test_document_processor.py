@@ -0,0 +1,391 @@
+# Testes para o módulo DocumentProcessorService (OCR e extração de texto).
+import os
+import sys
+import asyncio
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import fitz
+import httpx
+from PIL import Image, ImageDraw
+
+# Adicionar o diretório pai ao sys.path para importar os módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apis.gemini_client import GeminiClient
+from core import ocr_backends
+from core.document_processor_service import DocumentProcessorService, NLPService, OCRService, TextChunker
+from core.extraction_cache import ExtractionCache
+from core.ocr_backends import OCRBackend, PytesseractBackend, TesserocrBackend
+from core.ocr_preprocessing import choose_dpi, estimate_line_height
+
+
+def fake_image_to_string(img, lang):
+    """Substitui o Tesseract: devolve um texto que identifica a página pela largura."""
+    return f"pagina-{img.width}"
+
+
+class TestOCRService(unittest.TestCase):
+    """Testes para o OCRService."""
+
+    def setUp(self):
+        """Cria um PDF só com imagens (sem camada de texto) com páginas de larguras diferentes."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pdf_path = os.path.join(self.tmp_dir.name, "digitalizado.pdf")
+        doc = fitz.open()
+        for i in range(4):
+            page = doc.new_page(width=200 + i * 10, height=300)
+            page.draw_rect(fitz.Rect(10, 10, 50, 50))
+        doc.save(self.pdf_path)
+        doc.close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @patch.object(ocr_backends.pytesseract, "image_to_string", side_effect=fake_image_to_string)
+    def test_parallel_ocr_matches_serial_ocr(self, _mock_ocr):
+        """O OCR paralelo preserva a ordem das páginas e produz o mesmo texto que o OCR em série."""
+        serial_text = OCRService(max_workers=1, backend="pytesseract", adaptive=False, preprocess="rgb").extract_text(self.pdf_path)
+
+        parallel_service = OCRService(max_workers=2, backend="pytesseract", adaptive=False, preprocess="rgb")
+        try:
+            parallel_text = parallel_service.extract_text(self.pdf_path)
+        finally:
+            parallel_service.shutdown()
+
+        self.assertEqual(serial_text.count("\n"), 4)
+        self.assertEqual(parallel_text, serial_text)
+
+    @patch.object(ocr_backends.pytesseract, "image_to_string", side_effect=fake_image_to_string)
+    def test_serial_ocr_from_several_threads(self, _mock_ocr):
+        """Vários threads a ler PDFs ao mesmo tempo (o PyMuPDF é usado com um lock) dão o mesmo texto."""
+        service = OCRService(max_workers=1, backend="pytesseract", adaptive=False, preprocess="rgb")
+        expected = service.extract_text(self.pdf_path)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            texts = list(executor.map(lambda _: service.extract_text(self.pdf_path), range(8)))
+        self.assertEqual(texts, [expected] * 8)
+
+    @patch.object(ocr_backends.pytesseract, "image_to_string", side_effect=fake_image_to_string)
+    def test_mixed_pdf_routes_each_page(self, mock_ocr):
+        """Páginas com camada de texto não passam pelo OCR; as digitalizadas passam."""
+        mixed_path = os.path.join(self.tmp_dir.name, "misto.pdf")
+        doc = fitz.open()
+        doc.new_page(width=200, height=300).insert_text((20, 50), "Dirigível Nº 6 sobrevoa Paris em 1901")
+        doc.new_page(width=230, height=300).draw_rect(fitz.Rect(10, 10, 50, 50))
+        doc.save(mixed_path)
+        doc.close()
+
+        pages = OCRService(max_workers=1, backend="pytesseract", adaptive=False, preprocess="rgb").extract_pages(mixed_path)
+
+        self.assertEqual([p["metodo"] for p in pages], ["texto", "ocr"])
+        self.assertIn("Paris", pages[0]["texto"])
+        self.assertRegex(pages[1]["texto"], r"^pagina-\d+\n$")
+        self.assertEqual(mock_ocr.call_count, 1)
+
+
+class FakeTessAPI:
+    """Substitui o PyTessBaseAPI do tesserocr."""
+
+    def __init__(self, lang):
+        self.lang = lang
+        self.image = None
+
+    def SetImage(self, image):
+        self.image = image
+
+    def GetUTF8Text(self):
+        return f"{self.lang}:{self.image}"
+
+    def MeanTextConf(self):
+        return 90
+
+    def End(self):
+        pass
+
+
+class WidthConfidenceBackend(OCRBackend):
+    """Motor falso: a confiança só é alta para imagens com pelo menos `min_width` píxeis."""
+
+    name = "falso"
+
+    def __init__(self, min_width):
+        super().__init__("por")
+        self.min_width = min_width
+        self.widths = []
+
+    def recognize(self, image):
+        self.widths.append(image.width)
+        return f"largura-{image.width}", 95.0 if image.width >= self.min_width else 40.0
+
+
+class TestAdaptiveOCR(unittest.TestCase):
+    """Testes para a escolha adaptativa da resolução de OCR."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pdf_path = os.path.join(self.tmp_dir.name, "linhas.pdf")
+        doc = fitz.open()
+        page = doc.new_page(width=595, height=842)
+        # "Linhas de texto" com 16 pt de altura, como um texto dactilografado grande.
+        for y in range(60, 780, 28):
+            page.draw_rect(fitz.Rect(60, y, 520, y + 16), color=(0, 0, 0), fill=(0.3, 0.3, 0.3))
+        doc.save(self.pdf_path)
+        doc.close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_estimate_line_height_and_choose_dpi(self):
+        image = Image.new("L", (600, 800), 255)
+        draw = ImageDraw.Draw(image)
+        for y in range(40, 760, 20):
+            draw.rectangle([50, y, 500, y + 9], fill=60)
+
+        line_height = estimate_line_height(image)
+
+        self.assertEqual(line_height, 10)
+        self.assertEqual(choose_dpi(line_height, 72, 32, 150, 300), 230)
+        self.assertEqual(choose_dpi(None, 72, 32, 150, 300), 300)
+        self.assertEqual(choose_dpi(40, 72, 32, 150, 300), 150)
+
+    def test_large_text_is_rendered_below_max_dpi(self):
+        backend = WidthConfidenceBackend(min_width=0)
+        service = OCRService(max_workers=1, adaptive=True, dpi=300, min_dpi=100, target_line_px=32)
+        with patch.object(OCRService, "_backend", return_value=backend):
+            page = service.extract_pages(self.pdf_path)[0]
+
+        self.assertEqual(page["metodo"], "ocr")
+        self.assertLess(page["dpi"], 300)
+        self.assertEqual(page["confianca"], 95.0)
+        self.assertIn("tempo_ms", page)
+        self.assertEqual(len(backend.widths), 1)
+
+    def test_low_confidence_page_is_retried_at_max_dpi(self):
+        backend = WidthConfidenceBackend(min_width=int(595 * 300 / 72))
+        service = OCRService(max_workers=1, adaptive=True, dpi=300, min_dpi=100, target_line_px=32)
+        with patch.object(OCRService, "_backend", return_value=backend):
+            page = service.extract_pages(self.pdf_path)[0]
+
+        self.assertEqual(page["dpi"], 300)
+        self.assertEqual(page["confianca"], 95.0)
+        self.assertEqual(len(backend.widths), 2)
+
+
+class TestPytesseractBackend(unittest.TestCase):
+    """Testes para o motor pytesseract."""
+
+    def test_recognize_keeps_tesseract_layout(self):
+        tsv = ("level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext\n"
+               "1\t1\t0\t0\t0\t0\t0\t0\t100\t50\t-1\t\n"
+               "5\t1\t1\t1\t1\t1\t0\t0\t20\t10\t90\tNome:\n"
+               "5\t1\t1\t1\t1\t2\t30\t0\t20\t10\t70\t14-bis\n")
+        text = "Nome:      14-bis\n\f"
+        with patch.object(ocr_backends.pytesseract, "run_and_get_multiple_output", return_value=[text, tsv]) as mock_run:
+            result = PytesseractBackend("por").recognize(Image.new("RGB", (100, 50)))
+
+        # O texto é o de image_to_string, não reconstruído a partir das palavras.
+        self.assertEqual(result, (text, 80.0))
+        mock_run.assert_called_once()
+        self.assertEqual(mock_run.call_args.kwargs["extensions"], ["txt", "tsv"])
+
+    def test_defaults_keep_fixed_rgb_rendering(self):
+        service = OCRService(max_workers=1)
+        self.assertFalse(service.page_options["adaptive"])
+        self.assertEqual(service.page_options["preprocess"], "rgb")
+
+
+class TestTesserocrBackend(unittest.TestCase):
+    """Testes para o pool de reconhecedores persistentes."""
+
+    def test_recognisers_are_reused_across_pages(self):
+        created = []
+        backend = TesserocrBackend("por", pool_size=2, api_factory=lambda lang: created.append(lang) or FakeTessAPI(lang))
+
+        results = [backend.image_to_string(f"pagina{i}") for i in range(10)]
+
+        self.assertEqual(results[3], "por:pagina3")
+        self.assertEqual(len(created), 1)
+
+    def test_pool_never_exceeds_its_size(self):
+        created = []
+        backend = TesserocrBackend("por", pool_size=2, api_factory=lambda lang: created.append(lang) or FakeTessAPI(lang))
+        first, second = backend._acquire(), backend._acquire()
+        backend._available.put(first)
+        backend._available.put(second)
+        backend._acquire()
+        self.assertEqual(len(created), 2)
+
+
+class TestTextChunker(unittest.TestCase):
+    """Testes para o TextChunker usado na extração em fluxo."""
+
+    def test_chunks_are_bounded_and_cover_all_text(self):
+        """Nenhum bloco excede o limite e todas as frases aparecem em algum bloco."""
+        pages = [" ".join(f"Frase {p}-{i} sobre o Dirigível." for i in range(40)) + "\n" for p in range(5)]
+        chunker = TextChunker(chunk_chars=500, overlap_chars=80)
+
+        chunks = []
+        for page in pages:
+            chunks.extend(chunker.feed(page))
+        chunks.extend(chunker.flush())
+
+        self.assertGreater(len(chunks), 5)
+        self.assertTrue(all(len(chunk) <= 500 for chunk in chunks))
+        joined = "".join(chunks)
+        for p in range(5):
+            for i in range(40):
+                self.assertIn(f"Frase {p}-{i} ", joined)
+
+    def test_consecutive_chunks_overlap(self):
+        chunker = TextChunker(chunk_chars=200, overlap_chars=40)
+        chunks = chunker.feed("palavra " * 100) + chunker.flush()
+        for previous, current in zip(chunks, chunks[1:]):
+            self.assertTrue(previous.endswith(current[:20]) or current[:20] in previous)
+
+    def test_short_text_is_a_single_chunk(self):
+        chunker = TextChunker(chunk_chars=8000, overlap_chars=400)
+        self.assertEqual(chunker.feed("Dirigível Nº 6\n"), [])
+        self.assertEqual(chunker.flush(), ["Dirigível Nº 6\n"])
+
+
+class TestChunkedLLMExtraction(unittest.TestCase):
+    """Testes para a extração com IA distribuída por blocos de texto."""
+
+    ONTOLOGY = {"TITLE_PROPERTY": "pc:temTitulo", "AUTHOR_PROPERTY": "pc:temAutor",
+                "DESCRIPTION_PROPERTY": "dcterms:description", "ITEM_CLASS": "pc:ObraCultural"}
+
+    def test_every_chunk_is_sent_and_titles_are_merged(self):
+        service = NLPService(llm_max_concurrency=2, gemini_client=GeminiClient(api_key="chave-de-teste"))
+        calls = []
+        in_flight = 0
+        max_in_flight = 0
+
+        async def fake_llm(text, ontology_config):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            calls.append(text)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            page = text.split("Página ")[1].split(".")[0]
+            return [
+                {"entry_type": "pc:ObraCultural", "properties": {"pc:temTitulo": "14-bis", "pc:temLocal": "Paris"}},
+                {"entry_type": "pc:ObraCultural", "properties": {"pc:temTitulo": f"Obra {page}"}},
+            ]
+
+        service._request_llm_items = fake_llm
+        pages = [f"Página {p}. " + "Texto do documento digitalizado. " * 40 + "\n" for p in range(10)]
+
+        async def page_stream():
+            for page in pages:
+                yield page
+
+        with patch("core.document_processor_service.settings.NLP_CHUNK_CHARS", 1500), \
+                patch("core.document_processor_service.settings.NLP_CHUNK_OVERLAP_CHARS", 100):
+            items = asyncio.run(service.extract_items_from_text_stream(page_stream(), self.ONTOLOGY))
+
+        self.assertGreaterEqual(len(calls), 5)
+        self.assertLessEqual(max_in_flight, 2)
+        titles = [item["properties"]["pc:temTitulo"] for item in items]
+        self.assertEqual(titles.count("14-bis"), 1)
+        self.assertEqual(titles[0], "14-bis")
+        self.assertEqual(len(titles), len(set(titles)))
+
+    def test_repeated_titles_are_completed_from_later_chunks(self):
+        service = NLPService(gemini_client=GeminiClient(api_key="chave-de-teste"))
+        items = service._merge_chunk_items([
+            [{"entry_type": "pc:ObraCultural", "properties": {"pc:temTitulo": "14-bis"}},
+             {"entry_type": "pc:ObraCultural", "properties": {"pc:temLocal": "Paris"}}],
+            [{"entry_type": "pc:ObraCultural", "properties": {"pc:temTitulo": " 14-BIS ", "pc:temLocal": "Paris",
+                                                              "pc:temAutor": "Santos-Dumont"}}],
+        ], self.ONTOLOGY)
+
+        self.assertEqual([item["properties"] for item in items], [
+            {"pc:temTitulo": "14-bis", "pc:temLocal": "Paris", "pc:temAutor": "Santos-Dumont"},
+            {"pc:temLocal": "Paris"},
+        ])
+
+    def test_outcome_reports_incomplete_llm_extraction(self):
+        service = NLPService(gemini_client=GeminiClient(api_key="chave-de-teste"))
+
+        async def flaky_llm(text, ontology_config):
+            if "Página 1." in text:
+                raise httpx.HTTPError("503")
+            return [{"entry_type": "pc:ObraCultural", "properties": {"pc:temTitulo": "14-bis"}}]
+
+        service._request_llm_items = flaky_llm
+
+        async def page_stream():
+            for p in range(3):
+                yield f"Página {p}. " + "Texto do documento digitalizado. " * 40 + "\n"
+
+        with patch("core.document_processor_service.settings.NLP_CHUNK_CHARS", 1500), \
+                patch("core.document_processor_service.settings.NLP_CHUNK_OVERLAP_CHARS", 100):
+            outcome = {}
+            items = asyncio.run(service.extract_items_from_text_stream(page_stream(), self.ONTOLOGY, outcome))
+            self.assertEqual(len(items), 1)
+            self.assertEqual(outcome, {"source": "llm", "complete": False})
+
+            service._request_llm_items = lambda text, ontology_config: flaky_llm("", ontology_config)
+            outcome = {}
+            asyncio.run(service.extract_items_from_text_stream(page_stream(), self.ONTOLOGY, outcome))
+            self.assertEqual(outcome, {"source": "llm", "complete": True})
+
+
+class FakeNLPService:
+    """Substitui o NLPService: lê o texto todo e devolve um item por documento."""
+
+    def __init__(self):
+        self.calls = 0
+        self.source = "llm"
+
+    async def extract_items_from_text_stream(self, texts, ontology_config, outcome=None):
+        self.calls += 1
+        async for _ in texts:
+            pass
+        outcome.update(source=self.source, complete=self.source == "llm")
+        return [{"entry_type": "pc:ObraCultural", "properties": {"pc:temTitulo": "Dirigível Nº 6"}}]
+
+
+class TestDocumentProcessorCache(unittest.TestCase):
+    """Testes para o uso do cache de extração pelo DocumentProcessorService."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pdf_path = os.path.join(self.tmp_dir.name, "documento.pdf")
+        doc = fitz.open()
+        doc.new_page(width=300, height=300).insert_text((20, 50), "Dirigível Nº 6 sobrevoa Paris em 1901")
+        doc.save(self.pdf_path)
+        doc.close()
+        self.cache = ExtractionCache(os.path.join(self.tmp_dir.name, "cache"), max_bytes=10 * 1024 * 1024)
+        self.nlp = FakeNLPService()
+        self.service = DocumentProcessorService(OCRService(max_workers=1, backend="pytesseract", adaptive=False, preprocess="rgb"),
+                                                self.nlp, cache=self.cache)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_cached_items_skip_reading_the_document(self):
+        first = asyncio.run(self.service.process_document_for_multiple_items(self.pdf_path, {}))
+        self.assertIn("Paris", first["texto_extraido_amostra"])
+
+        # Mesmo sem o texto das páginas no cache, um documento com itens em cache não volta a ser lido.
+        for entry in os.scandir(self.cache.cache_dir):
+            if entry.name.endswith(ExtractionCache.PAGES_SUFFIX):
+                os.remove(entry.path)
+        with patch.object(self.service.ocr_service, "iter_pages", side_effect=AssertionError("documento lido")):
+            second = asyncio.run(self.service.process_document_for_multiple_items(self.pdf_path, {}))
+        self.assertEqual(second, first)
+        self.assertEqual(self.nlp.calls, 1)
+
+    def test_heuristic_fallback_items_are_not_cached(self):
+        self.nlp.source = "heuristics"
+        asyncio.run(self.service.process_document_for_multiple_items(self.pdf_path, {}))
+        asyncio.run(self.service.process_document_for_multiple_items(self.pdf_path, {}))
+        self.assertEqual(self.nlp.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
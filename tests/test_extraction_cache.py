@@ -0,0 +1,70 @@
+# Testes para o cache de extração de documentos.
+import os
+import sys
+import time
+import tempfile
+import unittest
+
+# Adicionar o diretório pai ao sys.path para importar os módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.extraction_cache import ExtractionCache, hash_file, ontology_fingerprint
+
+
+class TestExtractionCache(unittest.TestCase):
+    """Testes para o ExtractionCache."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = ExtractionCache(self.tmp_dir.name, max_bytes=10 * 1024 * 1024)
+        self.pages = [
+            {"pagina": 1, "metodo": "texto", "texto": "Dirigível Nº 6\n"},
+            {"pagina": 2, "metodo": "ocr", "texto": "14-bis\n"},
+        ]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_pages_round_trip(self):
+        """As páginas guardadas são devolvidas pela mesma chave e não por outra versão do pipeline."""
+        self.cache.put_pages("abc", "v1", self.pages)
+        self.assertEqual(self.cache.get_pages("abc", "v1"), self.pages)
+        self.assertIsNone(self.cache.get_pages("abc", "v2"))
+
+    def test_items_are_keyed_by_ontology(self):
+        """Os itens dependem da ontologia ativa."""
+        items = [{"entry_type": "pc:ObraCultural", "properties": {"rdfs:label": "14-bis"}}]
+        key_a = ontology_fingerprint({"TITLE_PROPERTY": "rdfs:label"})
+        key_b = ontology_fingerprint({"TITLE_PROPERTY": "pc:temTitulo"})
+        self.cache.put_items("abc", "v1", key_a, items)
+        self.assertEqual(self.cache.get_items("abc", "v1", key_a), items)
+        self.assertIsNone(self.cache.get_items("abc", "v1", key_b))
+
+    def test_evicts_least_recently_used_entries(self):
+        """Acima do limite de tamanho, a entrada usada há mais tempo é removida primeiro."""
+        big_page = [{"pagina": 1, "metodo": "ocr", "texto": "x" * 400}]
+        cache = ExtractionCache(os.path.join(self.tmp_dir.name, "lru"), max_bytes=1000)
+        cache.put_pages("antigo", "v1", big_page)
+        cache.put_pages("recente", "v1", big_page)
+        # Tornar 'recente' mais antigo no disco e depois lê-lo: a leitura renova a recência.
+        for entry in os.scandir(cache.cache_dir):
+            os.utime(entry.path, (time.time() - 100, time.time() - 100))
+        cache.get_pages("recente", "v1")
+
+        cache.put_pages("novo", "v1", big_page)
+
+        self.assertIsNone(cache.get_pages("antigo", "v1"))
+        self.assertIsNotNone(cache.get_pages("recente", "v1"))
+        self.assertIsNotNone(cache.get_pages("novo", "v1"))
+
+    def test_hash_file_depends_only_on_content(self):
+        path_a = os.path.join(self.tmp_dir.name, "a.pdf")
+        path_b = os.path.join(self.tmp_dir.name, "b.pdf")
+        for path in (path_a, path_b):
+            with open(path, "wb") as f:
+                f.write(b"%PDF-1.4 mesmo conteudo")
+        self.assertEqual(hash_file(path_a), hash_file(path_b))
+
+
+if __name__ == '__main__':
+    unittest.main()
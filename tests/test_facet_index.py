@@ -0,0 +1,108 @@
+# Testes para as facetas (FacetIndex) e para a busca filtrada por facetas.
+import os
+import sys
+import random
+import asyncio
+import unittest
+
+# Adicionar o diretório pai ao sys.path para importar os módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.facet_index import FacetIndex
+from core.search_engine import SearchEngine
+
+
+class TestFacetIndex(unittest.TestCase):
+    """Testes para o FacetIndex."""
+
+    def setUp(self):
+        self.index = FacetIndex()
+        self.index.add("uri:14bis", {"author": "Alberto Santos-Dumont", "place": "Paris", "date": "23 de outubro de 1906"})
+        self.index.add("uri:demoiselle", {"author": "Alberto Santos-Dumont", "place": "paris", "date": "1907"})
+        self.index.add("uri:retrato", {"author": "Fotógrafo desconhecido", "place": ["Petrópolis", "Paris"], "date": None})
+
+    def test_counts_and_normalization(self):
+        counts = self.index.counts()
+        self.assertEqual(counts["author"], [{"value": "Alberto Santos-Dumont", "count": 2},
+                                            {"value": "Fotógrafo desconhecido", "count": 1}])
+        self.assertEqual(counts["place"][0], {"value": "Paris", "count": 3})
+        self.assertEqual(counts["date"], [{"value": "1906", "count": 1}, {"value": "1907", "count": 1}])
+
+    def test_filters_and_counts_of_a_result_set(self):
+        # OR entre valores da mesma faceta, AND entre facetas.
+        mask = self.index.filter_mask({"date": ["1906", "1907"], "place": ["PARIS"]})
+        self.assertEqual(sorted(self.index.ids(mask)), ["uri:14bis", "uri:demoiselle"])
+        self.assertEqual(self.index.ids(self.index.filter_mask({"place": ["Lisboa"]})), [])
+        self.assertIsNone(self.index.filter_mask({}))
+        with self.assertRaises(ValueError):
+            self.index.filter_mask({"cor": ["azul"]})
+
+        counts = self.index.counts(self.index.mask_for(["uri:14bis", "uri:retrato", "uri:desconhecido"]))
+        self.assertEqual(counts["place"], [{"value": "Paris", "count": 2}, {"value": "Petrópolis", "count": 1}])
+
+    def test_remove_and_row_reuse(self):
+        self.assertTrue(self.index.remove("uri:retrato"))
+        self.assertFalse(self.index.remove("uri:retrato"))
+        self.assertNotIn("Petrópolis", [entry["value"] for entry in self.index.counts()["place"]])
+        self.index.add("uri:carta", {"author": "Santos-Dumont", "place": "Lisboa"})
+        self.assertEqual(self.index.ids(self.index.filter_mask({"place": ["lisboa"]})), ["uri:carta"])
+        self.assertEqual(len(self.index), 3)
+
+    def test_counts_over_many_items(self):
+        rng = random.Random(5)
+        index = FacetIndex()
+        places = ["Paris", "Petrópolis", "Lisboa", "Londres"]
+        for i in range(50000):
+            index.add(f"uri:{i}", {"author": f"Autor {i % 100}", "place": rng.choice(places), "date": str(1890 + i % 40)})
+        mask = index.filter_mask({"place": ["Paris"]})
+        counts = index.counts(mask, limit=5)
+        self.assertEqual(sum(entry["count"] for entry in index.counts(mask, limit=100)["author"]), len(index.ids(mask)))
+        self.assertEqual(len(counts["date"]), 5)
+
+    def test_batched_updates_with_reused_rows(self):
+        # Retirar e voltar a ocupar linhas entre leituras: as alterações pendentes aplicam-se pela ordem certa.
+        rng = random.Random(7)
+        index, expected = FacetIndex(), {}
+        for step in range(2000):
+            item_id = f"uri:{rng.randrange(300)}"
+            if rng.random() < 0.3:
+                index.remove(item_id)
+                expected.pop(item_id, None)
+            else:
+                place = rng.choice(["Paris", "Lisboa", "Londres"])
+                index.add(item_id, {"place": place})
+                expected[item_id] = place
+            if step % 500 == 499:
+                for place in ("Paris", "Lisboa", "Londres"):
+                    wanted = sorted(i for i, p in expected.items() if p == place)
+                    self.assertEqual(sorted(index.ids(index.filter_mask({"place": [place]}))), wanted)
+        counts = {entry["value"]: entry["count"] for entry in index.counts()["place"]}
+        self.assertEqual(counts, {place: list(expected.values()).count(place) for place in set(expected.values())})
+
+
+class TestFacetedSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.search_engine = SearchEngine()
+        self.search_engine.add_item("uri:14bis", "14-bis", "Alberto Santos-Dumont", "Avião pioneiro.", "Paris", "1906")
+        self.search_engine.add_item("uri:demoiselle", "Demoiselle", "Alberto Santos-Dumont", "Pequeno avião.", "Paris", "1907")
+        self.search_engine.add_item("uri:encantado", "Casa Encantada", "Alberto Santos-Dumont", "Casa do aviador.", "Petrópolis", "1918")
+
+    def test_search_accepts_facet_filters_and_returns_counts(self):
+        found = asyncio.run(self.search_engine.search("avião santos dumont", ["local"], filters={"date": ["1907"]}))
+        self.assertEqual([item["id"] for item in found["results"]], ["uri:demoiselle"])
+        self.assertEqual(found["facets"]["date"], [{"value": "1907", "count": 1}])
+
+        found = asyncio.run(self.search_engine.search("santos dumont", ["local"]))
+        self.assertEqual(found["facets"]["place"], [{"value": "Paris", "count": 2}, {"value": "Petrópolis", "count": 1}])
+
+        self.search_engine.remove_item("uri:14bis")
+        found = asyncio.run(self.search_engine.search("santos dumont", ["local"], filters={"place": ["paris"]}))
+        self.assertEqual([item["id"] for item in found["results"]], ["uri:demoiselle"])
+
+        with self.assertRaises(ValueError):
+            asyncio.run(self.search_engine.search("santos", ["local"], filters={"cor": ["azul"]}))
+
+
+if __name__ == '__main__':
+    unittest.main()
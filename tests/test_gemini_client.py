@@ -0,0 +1,174 @@
+# Testes para o cliente partilhado da API do Gemini.
+import os
+import sys
+import json
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import httpx
+import spacy
+
+# Adicionar o diretório pai ao sys.path para importar os módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apis.gemini_client import GeminiClient
+from apis.provider_guard import ProviderGuard
+from core.chatbot_service import ChatbotService
+from core.document_processor_service import NLPService
+from core.llm_response_cache import CachedText, LLMResponseCache, LLMResponseDiskCache
+
+
+class TestGeminiClient(unittest.TestCase):
+    """Testes para o GeminiClient."""
+
+    def setUp(self):
+        self.requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            prompt = json.loads(request.content)["contents"][0]["parts"][0]["text"]
+            reply = '[{"pc:temTitulo": "14-bis"}]' if "catalogação" in prompt else "Olá!"
+            return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": reply}]}}]})
+
+        self.client = GeminiClient(api_key="chave-de-teste", model="modelo-teste",
+                                   transport=httpx.MockTransport(handler))
+
+    def test_services_share_one_pooled_client(self):
+        nlp = NLPService(gemini_client=self.client)
+        chatbot = ChatbotService(sparql_client=None, gemini_client=self.client)
+        config = {"TITLE_PROPERTY": "pc:temTitulo", "AUTHOR_PROPERTY": "pc:temAutor",
+                  "DESCRIPTION_PROPERTY": "dcterms:description"}
+
+        async def text():
+            yield "O 14-bis voou em Paris."
+
+        async def run():
+            items = await nlp.extract_items_from_text_stream(text(), config)
+            http_client = self.client._client
+            reply = await chatbot._call_gemini("Olá")
+            self.assertIs(self.client._client, http_client)
+            await self.client.aclose()
+            return items, reply
+
+        items, reply = asyncio.run(run())
+
+        self.assertEqual(items[0]["properties"]["pc:temTitulo"], "14-bis")
+        self.assertEqual(reply, "Olá!")
+        self.assertEqual(len(self.requests), 2)
+        self.assertTrue(self.requests[0].url.path.endswith("/models/modelo-teste:generateContent"))
+        self.assertEqual(self.requests[0].headers["x-goog-api-key"], "chave-de-teste")
+        self.assertNotIn("key=", str(self.requests[0].url))
+
+    def test_http_errors_fall_back_to_empty_extraction(self):
+        failing = GeminiClient(api_key="chave", transport=httpx.MockTransport(lambda request: httpx.Response(503)))
+        nlp = NLPService(gemini_client=failing)
+        # Sem itens da IA, a extração passa às heurísticas, que precisam de um modelo spaCy.
+        nlp.nlp_model = spacy.blank("pt")
+
+        async def text():
+            yield "texto"
+
+        outcome = {}
+        self.assertEqual(asyncio.run(nlp.extract_items_from_text_stream(text(), {}, outcome)), [])
+        self.assertEqual(outcome, {"source": "heuristics", "complete": False})
+
+
+class TestLLMResponseCache(unittest.TestCase):
+    """Testes para o cache de respostas do modelo."""
+
+    def setUp(self):
+        self.calls = 0
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.calls += 1
+            return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": f"r{self.calls}"}]}}]})
+
+        self.transport = httpx.MockTransport(handler)
+
+    def test_repeated_prompts_are_served_from_memory(self):
+        cache = LLMResponseCache(max_entries=10, ttl_seconds=60)
+        client = GeminiClient(api_key="chave", transport=self.transport, cache=cache)
+
+        async def run():
+            first = await client.generate_text("Quem construiu o 14-bis?")
+            second = await client.generate_text("Quem construiu o 14-bis?")
+            other_config = await client.generate_text("Quem construiu o 14-bis?", {"temperature": 0.2})
+            uncached = await client.generate_text("Quem construiu o 14-bis?", use_cache=False)
+            return first, second, other_config, uncached
+
+        responses = asyncio.run(run())
+        self.assertEqual(responses, ("r1", "r1", "r2", "r3"))
+        # Só a resposta servida do cache vem marcada como tal.
+        self.assertEqual([isinstance(response, CachedText) for response in responses], [False, True, False, False])
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    def test_disk_tier_survives_restart_and_entries_expire(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            first_cache = LLMResponseCache(10, 60, LLMResponseDiskCache(tmp_dir, 1024 * 1024))
+            asyncio.run(GeminiClient(api_key="chave", transport=self.transport, cache=first_cache).generate_text("Paris"))
+
+            restarted = LLMResponseCache(10, 60, LLMResponseDiskCache(tmp_dir, 1024 * 1024))
+            client = GeminiClient(api_key="chave", transport=self.transport, cache=restarted)
+            self.assertEqual(asyncio.run(client.generate_text("Paris")), "r1")
+            self.assertEqual(restarted.stats()["disk_hits"], 1)
+
+            with patch("core.llm_response_cache.time.time", return_value=10 ** 12):
+                self.assertEqual(asyncio.run(client.generate_text("Paris")), "r2")
+
+
+class FakeSPARQLClient:
+    def list_objects(self, query, repo_config):
+        return [{"titulo": {"value": "14-bis"}, "resumo": {"value": "Avião de Santos-Dumont."}}]
+
+
+class TestChatbotStreaming(unittest.TestCase):
+    """Testes para as respostas do chatbot em fluxo."""
+
+    def setUp(self):
+        self.requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request)
+            events = "".join(
+                f'data: {json.dumps({"candidates": [{"content": {"parts": [{"text": text}]}}]})}\r\n\r\n'
+                for text in ["Era ", "uma ", "vez..."])
+            return httpx.Response(200, content=events.encode("utf-8"), headers={"content-type": "text/event-stream"})
+
+        self.guard = ProviderGuard("teste", requests_per_minute=6000, burst=10, max_concurrency=2, max_retries=0,
+                                   backoff_base=0.01, backoff_max=0.01, failure_threshold=2, reset_timeout=60)
+        self.client = GeminiClient(api_key="chave", transport=httpx.MockTransport(handler), guard=self.guard)
+        self.chatbot = ChatbotService(sparql_client=FakeSPARQLClient(), gemini_client=self.client)
+
+    def test_sources_come_first_then_tokens(self):
+        async def collect():
+            return [event async for event in self.chatbot.stream_message("Conta-me uma história", "acervo")]
+
+        events = asyncio.run(collect())
+
+        self.assertEqual(events[0][0], "sources")
+        self.assertEqual(events[0][1][0]["titulo"]["value"], "14-bis")
+        self.assertEqual([data for kind, data in events if kind == "token"], ["Era ", "uma ", "vez..."])
+        self.assertEqual(events[-1][0], "done")
+        self.assertEqual(self.requests[0].url.params["alt"], "sse")
+        self.assertTrue(self.requests[0].url.path.endswith(":streamGenerateContent"))
+
+    def test_abandoned_stream_releases_the_provider_slot(self):
+        async def first_token_then_leave():
+            events = self.chatbot.stream_message("Conta-me uma história", "acervo")
+            await events.__anext__()  # fontes
+            token = await events.__anext__()
+            self.assertEqual(self.guard.in_flight, 1)
+            await events.aclose()
+            return token
+
+        self.assertEqual(asyncio.run(first_token_then_leave()), ("token", "Era "))
+        self.assertEqual(self.guard.in_flight, 0)
+        self.assertEqual(self.guard.stats()["circuit_state"], "closed")
+
+
+if __name__ == '__main__':
+    unittest.main()
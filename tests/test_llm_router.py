@@ -0,0 +1,134 @@
+# Testes para o encaminhamento das chamadas entre fornecedores de IA.
+import os
+import sys
+import asyncio
+import unittest
+
+# Adicionar o diretório pai ao sys.path para importar os módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apis.external_ia_clients import BaseIAClient
+from apis.llm_router import LLMProviderRouter
+from apis.provider_guard import ProviderUnavailableError
+from core.llm_response_cache import CachedText
+
+
+class FakeProvider(BaseIAClient):
+    """Fornecedor de teste: responde com o seu nome após `delay` segundos, ou falha."""
+
+    requires_api_key = False
+
+    def __init__(self, name, delay=0.0, fail=False, cached=False):
+        super().__init__(model_name=name)
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.cached = cached
+        self.calls = 0
+        self.cancelled = 0
+
+    def generate_text(self, prompt, max_tokens=150):
+        raise NotImplementedError
+
+    async def generate_text_async(self, prompt, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise RuntimeError(f"{self.name} falhou")
+        return CachedText(self.name) if self.cached else self.name
+
+    async def stream_text_async(self, prompt, **kwargs):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError(f"{self.name} falhou")
+        if self.cached:
+            yield CachedText(f"{self.name}!")
+            return
+        for fragment in (self.name, "!"):
+            yield fragment
+
+
+class TestLLMProviderRouter(unittest.TestCase):
+    """Testes para o LLMProviderRouter."""
+
+    def test_fastest_provider_is_preferred(self):
+        slow, fast = FakeProvider("lento", delay=0.02), FakeProvider("rapido", delay=0.0)
+        router = LLMProviderRouter({"lento": slow, "rapido": fast})
+
+        async def run():
+            # Um fornecedor sem histórico é experimentado primeiro; depois prevalece o mais rápido.
+            router.stats_by_provider["lento"].record(0.02, True)
+            return [await router.generate_text_async("olá") for _ in range(3)]
+
+        self.assertEqual(asyncio.run(run()), ["rapido"] * 3)
+        self.assertEqual(router.ranked_providers(), ["rapido", "lento"])
+        self.assertEqual(slow.calls, 0)
+
+    def test_failed_call_falls_back_and_demotes_provider(self):
+        broken, backup = FakeProvider("avariado", fail=True), FakeProvider("reserva", delay=0.001)
+        router = LLMProviderRouter({"avariado": broken, "reserva": backup}, max_error_rate=0.5)
+
+        self.assertEqual(asyncio.run(router.generate_text_async("olá")), "reserva")
+        self.assertEqual(router.stats()["providers"]["avariado"]["error_rate"], 1.0)
+        self.assertEqual(router.ranked_providers(), ["reserva", "avariado"])
+
+        fragments = asyncio.run(self._collect(router.stream_text_async("olá")))
+        self.assertEqual(fragments, ["reserva", "!"])
+
+    def test_demoted_provider_is_probed_again(self):
+        flaky, backup = FakeProvider("instavel", fail=True), FakeProvider("reserva", delay=0.001)
+        router = LLMProviderRouter({"instavel": flaky, "reserva": backup}, probe_interval=60)
+        asyncio.run(router.generate_text_async("olá"))
+        self.assertEqual(router.ranked_providers(), ["reserva", "instavel"])
+
+        # Passado o intervalo sem chamadas, o fornecedor despromovido volta a ser experimentado.
+        flaky.fail = False
+        router.stats_by_provider["instavel"].last_call -= 61
+        self.assertEqual(asyncio.run(router.generate_text_async("olá")), "instavel")
+        self.assertEqual(router.stats()["providers"]["instavel"]["error_rate"], 0.0)
+        self.assertTrue(router.stats()["providers"]["instavel"]["healthy"])
+
+    def test_slow_primary_is_hedged_and_loser_cancelled(self):
+        primary, secondary = FakeProvider("primario", delay=0.001), FakeProvider("secundario", delay=0.001)
+        router = LLMProviderRouter({"primario": primary, "secundario": secondary},
+                                   hedge_percentile=0.9, hedge_min_samples=3)
+        for _ in range(3):
+            router.stats_by_provider["primario"].record(0.001, True)
+        router.stats_by_provider["secundario"].record(0.005, True)
+        primary.delay = 1.0
+
+        self.assertEqual(asyncio.run(router.generate_text_async("olá")), "secundario")
+        self.assertEqual((router.hedges, router.hedges_won), (1, 1))
+        self.assertEqual(primary.cancelled, 1)
+        # O pedido cancelado não conta como erro do fornecedor.
+        self.assertEqual(router.stats()["providers"]["primario"]["error_rate"], 0.0)
+
+    def test_cache_hits_do_not_count_as_latency(self):
+        provider = FakeProvider("gemini", cached=True)
+        router = LLMProviderRouter({"gemini": provider})
+
+        self.assertEqual(asyncio.run(router.generate_text_async("olá")), "gemini")
+        self.assertEqual(asyncio.run(self._collect(router.stream_text_async("olá"))), ["gemini!"])
+        self.assertEqual(router.stats()["providers"]["gemini"]["samples"], 0)
+
+        provider.cached = False
+        asyncio.run(router.generate_text_async("olá"))
+        self.assertEqual(router.stats()["providers"]["gemini"]["samples"], 1)
+
+    def test_no_provider_available(self):
+        router = LLMProviderRouter({})
+        self.assertFalse(router.configured)
+        with self.assertRaises(ProviderUnavailableError):
+            asyncio.run(router.generate_text_async("olá"))
+
+    @staticmethod
+    async def _collect(fragments):
+        return [fragment async for fragment in fragments]
+
+
+if __name__ == '__main__':
+    unittest.main()
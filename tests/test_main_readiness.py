@@ -0,0 +1,103 @@
+# Testes para a prontidão da API e o carregamento preguiçoso dos modelos.
+import os
+import sys
+import time
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import spacy
+from fastapi.testclient import TestClient
+
+# Adicionar o diretório pai ao sys.path para importar os módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import main
+from core import document_processor_service
+
+
+class TestReadiness(unittest.TestCase):
+    """Testes para /api/v1/ready e para o primeiro carregamento do modelo spaCy."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        # Cada teste começa com o modelo spaCy por carregar e sem aquecimento anterior.
+        for patcher in (patch.multiple(document_processor_service, _nlp_model=None, _nlp_model_loaded=False),
+                        patch.object(main.nlp_service_instance, "_nlp_model", None),
+                        patch.object(main, "document_warmup_future", None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_ready_only_after_warm_up(self):
+        release = threading.Event()
+
+        def warm_up():
+            release.wait(5)
+
+        # O shutdown da aplicação termina o executor: usa-se um próprio deste teste.
+        with patch.object(main, "document_executor", ThreadPoolExecutor(max_workers=1)), \
+                patch.object(main.settings, "DOCUMENT_WARMUP_ON_STARTUP", True), \
+                patch.object(main.document_processor_instance, "warm_up", side_effect=warm_up) as mock_warm_up:
+            with TestClient(main.app) as client:
+                before = client.get("/api/v1/ready")
+                release.set()
+                deadline = time.monotonic() + 5
+                after = client.get("/api/v1/ready")
+                while after.status_code != 200 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                    after = client.get("/api/v1/ready")
+
+        self.assertEqual(before.status_code, 503)
+        self.assertEqual(before.json()["status"], "warming_up")
+        self.assertEqual(after.status_code, 200)
+        self.assertEqual(after.json()["status"], "ready")
+        mock_warm_up.assert_called_once()
+
+    def test_failed_warm_up_is_not_ready(self):
+        with patch.object(main, "document_executor", ThreadPoolExecutor(max_workers=1)), \
+                patch.object(main.settings, "DOCUMENT_WARMUP_ON_STARTUP", True), \
+                patch.object(main.document_processor_instance, "warm_up", side_effect=RuntimeError("tesseract em falta")):
+            with TestClient(main.app) as client:
+                deadline = time.monotonic() + 5
+                response = client.get("/api/v1/ready")
+                while response.json()["status"] == "warming_up" and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                    response = client.get("/api/v1/ready")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["status"], "unavailable")
+        self.assertIn("tesseract em falta", response.json()["error"])
+
+    def test_missing_nlp_model_is_not_ready(self):
+        with patch.multiple(document_processor_service, _nlp_model=None, _nlp_model_loaded=True):
+            response = TestClient(main.app).get("/api/v1/ready")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["components"]["modelo_nlp"], "indisponivel")
+        self.assertIn(document_processor_service.NLP_MODEL_NAME, response.json()["error"])
+
+    def test_first_request_loads_the_model_once(self):
+        pages = lambda filepath: iter([{"pagina": 1, "metodo": "texto", "texto": "O 14-bis voou em Paris em 1906."}])
+        blank_model = spacy.blank("pt")
+        # Sem o contexto "with", o TestClient não corre o startup: não há aquecimento.
+        client = TestClient(main.app)
+
+        with patch.object(main, "UPLOAD_FOLDER", self.tmp.name), \
+                patch.object(main.document_processor_instance, "cache", None), \
+                patch.object(main.ocr_service_instance, "iter_pages", side_effect=pages), \
+                patch("spacy.load", return_value=blank_model) as mock_load:
+            before = client.get("/api/v1/ready").json()["components"]["modelo_nlp"]
+            responses = [client.post("/api/v1/documents/process", files={"document": (f"doc{i}.pdf", f"%PDF-{i}".encode(), "application/pdf")})
+                         for i in range(2)]
+            after = client.get("/api/v1/ready").json()["components"]["modelo_nlp"]
+
+        self.assertEqual([response.status_code for response in responses], [200, 200])
+        self.assertEqual((before, after), ("por_carregar", "carregado"))
+        mock_load.assert_called_once_with(document_processor_service.NLP_MODEL_NAME)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+# Testes para os clientes do Ollama.
+import os
+import sys
+import json
+import asyncio
+import unittest
+from unittest.mock import MagicMock
+
+import httpx
+
+# Adicionar o diretório pai ao sys.path para importar os módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apis.llm_router import OllamaProvider
+from llm_integration.ollama_client import AsyncOllamaClient, OllamaClient
+
+
+class TestAsyncOllamaClient(unittest.TestCase):
+    """Testes para o AsyncOllamaClient."""
+
+    def setUp(self):
+        self.payloads = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            payload = json.loads(request.content)
+            self.payloads.append((request.url.path, payload))
+            if request.url.path == "/api/embed":
+                return httpx.Response(200, json={"embeddings": [[float(len(text))] for text in payload["input"]]})
+            if payload.get("stream"):
+                lines = [{"response": "Era ", "done": False}, {"response": "uma vez", "done": False}, {"done": True}]
+                return httpx.Response(200, content="\n".join(json.dumps(line) for line in lines).encode())
+            return httpx.Response(200, json={"response": "Era uma vez", "done": True})
+
+        self.client = AsyncOllamaClient(model="modelo", keep_alive="10m", embed_batch_size=2,
+                                        transport=httpx.MockTransport(handler))
+
+    def test_generate_and_stream(self):
+        async def run():
+            text = await self.client.generate_text("Conta uma história", temperature=0.2, max_tokens=50)
+            fragments = [fragment async for fragment in self.client.stream_text("Conta uma história")]
+            await self.client.aclose()
+            return text, fragments
+
+        text, fragments = asyncio.run(run())
+
+        self.assertEqual(text, "Era uma vez")
+        self.assertEqual(fragments, ["Era ", "uma vez"])
+        path, payload = self.payloads[0]
+        self.assertEqual(path, "/api/generate")
+        self.assertFalse(payload["stream"])
+        self.assertEqual(payload["keep_alive"], "10m")
+        self.assertEqual(payload["options"], {"temperature": 0.2, "num_predict": 50})
+
+    def test_provider_forwards_top_p_and_timeout(self):
+        timeouts = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            timeouts.append(request.extensions["timeout"]["read"])
+            self.payloads.append(json.loads(request.content))
+            return httpx.Response(200, json={"response": "ok", "done": True})
+
+        client = AsyncOllamaClient(model="modelo", timeout=120, transport=httpx.MockTransport(handler))
+        provider = OllamaProvider(client)
+
+        async def run():
+            await provider.generate_text_async("olá", max_tokens=10, top_p=0.9, timeout=5)
+            await provider.generate_text_async("olá")
+            await client.aclose()
+
+        asyncio.run(run())
+        self.assertEqual(self.payloads[0]["options"], {"temperature": 0.7, "num_predict": 10, "top_p": 0.9})
+        self.assertEqual(timeouts, [5, 120])
+
+    def test_embeddings_are_sent_in_batches(self):
+        vectors = asyncio.run(self.client.embed(["a", "bb", "ccc", "dddd", "eeeee"]))
+
+        self.assertEqual(vectors, [[1.0], [2.0], [3.0], [4.0], [5.0]])
+        self.assertEqual([len(payload["input"]) for _path, payload in self.payloads], [2, 2, 1])
+
+
+class TestOllamaClient(unittest.TestCase):
+    """Testes para o cliente síncrono."""
+
+    def test_requests_disable_streaming_and_reuse_the_session(self):
+        client = OllamaClient(model="modelo", timeout=5)
+        client.session = MagicMock()
+        client.session.post.return_value.json.return_value = {"response": "ok"}
+
+        self.assertEqual(client.generate_text("olá"), {"response": "ok"})
+        client.chat_completion([{"role": "user", "content": "olá"}])
+
+        for call in client.session.post.call_args_list:
+            self.assertFalse(call.kwargs["json"]["stream"])
+            self.assertEqual(call.kwargs["timeout"], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# Testes para a proteção das chamadas aos fornecedores de IA.
+import os
+import sys
+import asyncio
+import unittest
+
+import httpx
+
+# Adicionar o diretório pai ao sys.path para importar os módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apis.gemini_client import GeminiClient
+from apis.provider_guard import ProviderGuard, ProviderUnavailableError
+from core.chatbot_service import ChatbotService
+
+
+def make_guard(**overrides):
+    options = dict(requests_per_minute=60000, burst=100, max_concurrency=4, max_retries=2,
+                   backoff_base=0.001, backoff_max=0.01, failure_threshold=3, reset_timeout=60)
+    options.update(overrides)
+    return ProviderGuard("teste", **options)
+
+
+class TestProviderGuard(unittest.TestCase):
+    """Testes para o ProviderGuard."""
+
+    def setUp(self):
+        self.statuses = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            status = self.statuses.pop(0) if self.statuses else 200
+            return httpx.Response(status, json={"candidates": [{"content": {"parts": [{"text": "ok"}]}}]})
+
+        self.transport = httpx.MockTransport(handler)
+
+    def test_transient_errors_are_retried(self):
+        self.statuses = [429, 503]
+        guard = make_guard()
+        client = GeminiClient(api_key="chave", transport=self.transport, guard=guard)
+
+        self.assertEqual(asyncio.run(client.generate_text("olá")), "ok")
+        self.assertEqual(guard.stats()["retries"], 2)
+        self.assertEqual(guard.stats()["circuit_state"], "closed")
+
+    def test_client_errors_are_not_retried(self):
+        self.statuses = [400]
+        guard = make_guard()
+        client = GeminiClient(api_key="chave", transport=self.transport, guard=guard)
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            asyncio.run(client.generate_text("olá"))
+        self.assertEqual(guard.stats()["calls"], 1)
+
+    def test_open_circuit_fails_fast_and_chatbot_falls_back(self):
+        self.statuses = [503] * 10
+        guard = make_guard(max_retries=5)
+        client = GeminiClient(api_key="chave", transport=self.transport, guard=guard)
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            asyncio.run(client.generate_text("olá"))
+        self.assertEqual(guard.stats()["calls"], 3)
+        self.assertFalse(client.healthy)
+
+        with self.assertRaises(ProviderUnavailableError):
+            asyncio.run(client.generate_text("olá"))
+        self.assertEqual(guard.stats()["calls"], 3)
+
+        chatbot = ChatbotService(sparql_client=None, gemini_client=client)
+        reply = asyncio.run(chatbot._call_gemini("olá", fallback_reply="Item: 14-bis."))
+        self.assertEqual(reply, "Item: 14-bis.")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,26 +1,273 @@
 # Testes para o módulo SearchEngine.
+import os
+import sys
+import json
+import time
+import base64
+import asyncio
+import tempfile
 import unittest
-# from agente_catalogador_ia.core.search_engine import SearchEngine # Exemplo de importação
+
+import httpx
+
+# Adicionar o diretório pai ao sys.path para importar os módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apis.wikidata_client import WikidataClient
+from core.cataloger import Cataloger
+from core.search_engine import SearchEngine
+from core.vector_index import VectorIndex
+
+
+async def synonym_embedder(texts):
+    """Substitui o modelo de embeddings: "avião", "aeronave" e "voo" ficam na mesma dimensão."""
+    vectors = []
+    for text in texts:
+        text = text.lower()
+        flight = sum(text.count(word) for word in ("avião", "aeronave", "voo"))
+        photo = sum(text.count(word) for word in ("retrato", "fotografia"))
+        vectors.append([flight, photo, 0.01])
+    return vectors
+
 
 class TestSearchEngine(unittest.TestCase):
 
     def setUp(self):
-        # Configurar o ambiente de teste, instanciar o SearchEngine, mocks, etc.
-        # self.search_engine = SearchEngine()
-        pass
-
-    def test_search_success_local_and_web(self):
-        # Testar uma busca bem-sucedida em fontes locais e na web.
-        # query = "História da Artefacto X"
-        # results = self.search_engine.search(query, sources=["local", "web"], validate_reliability=True)
-        # self.assertIsNotNone(results)
-        # self.assertGreater(len(results), 0)
-        pass
-
-    def test_search_reliability_validation(self):
-        # Testar a funcionalidade de validação de confiabilidade.
-        pass
+        self.search_engine = SearchEngine()
+        self.search_engine.add_item("uri:14bis", "14-bis", "Alberto Santos-Dumont", "Avião pioneiro que voou em Paris.")
+        self.search_engine.add_item("uri:demoiselle", "Demoiselle", "Alberto Santos-Dumont", "Pequeno avião monoplano.")
+        self.search_engine.add_item("uri:retrato", "Retrato de Santos-Dumont", "Fotógrafo desconhecido", "Fotografia de estúdio.")
+
+    def test_best_matches_rank_first_and_accents_are_ignored(self):
+        results = asyncio.run(self.search_engine.search_local("aviao santos dumont"))
+        self.assertEqual({item["id"] for item in results[:2]}, {"uri:14bis", "uri:demoiselle"})
+        self.assertEqual(results[2]["id"], "uri:retrato")
+
+        results = asyncio.run(self.search_engine.search_local("retrato"))
+        self.assertEqual(results[0]["id"], "uri:retrato")
+        self.assertEqual(results[0]["source"], "local")
+
+    def test_incremental_update_and_removal(self):
+        self.search_engine.add_item("uri:14bis", "14-bis", "Alberto Santos-Dumont", "Biplano de 1906.")
+        self.assertEqual(asyncio.run(self.search_engine.search_local("pioneiro")), [])
+        self.assertTrue(self.search_engine.remove_item("uri:demoiselle"))
+        self.assertFalse(self.search_engine.remove_item("uri:demoiselle"))
+        results = asyncio.run(self.search_engine.search_local("monoplano"))
+        self.assertEqual(results, [])
+        self.assertEqual(len(self.search_engine), 2)
+
+    def test_hybrid_search_finds_synonyms_and_survives_restart(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = SearchEngine(vector_index=VectorIndex(tmp), embedder=synonym_embedder)
+
+            async def index_and_search():
+                await engine.add_item_async("uri:14bis", "14-bis", "Santos-Dumont", "Avião pioneiro.")
+                await engine.add_item_async("uri:retrato", "Retrato", "Desconhecido", "Fotografia de estúdio.")
+                return await engine.search_local("aeronave")
+
+            results = asyncio.run(index_and_search())
+            self.assertEqual(results[0]["id"], "uri:14bis")
+
+            # O índice BM25 é reconstruído a partir dos itens guardados com os embeddings.
+            reopened = SearchEngine(vector_index=VectorIndex(tmp), embedder=synonym_embedder)
+            self.assertEqual(len(reopened), 2)
+            self.assertEqual(asyncio.run(reopened.search_local("retrato"))[0]["id"], "uri:retrato")
+
+    def test_local_index_survives_restart_without_vector_index(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "search", "documents.jsonl")
+            engine = SearchEngine(documents_path=path)
+            engine.add_item("uri:14bis", "14-bis", "Santos-Dumont", "Avião pioneiro.")
+            engine.add_item("uri:retrato", "Retrato", "Desconhecido", "Fotografia de estúdio.")
+            engine.add_item("uri:mapa", "Mapa de Paris")
+            engine.remove_item("uri:mapa")
+            # Uma escrita interrompida deixa uma última linha incompleta, que é ignorada.
+            with open(path, "a", encoding="utf-8") as f:
+                f.write('{"add": {"id": "uri:cor')
+
+            reopened = SearchEngine(documents_path=path)
+            self.assertEqual(len(reopened), 2)
+            self.assertEqual(asyncio.run(reopened.search_local("santos dumont"))[0]["id"], "uri:14bis")
+            self.assertEqual(asyncio.run(reopened.search_local("mapa")), [])
+            reopened.add_item("uri:carta", "Carta de Paris")
+            self.assertEqual(len(SearchEngine(documents_path=path)), 3)
+
+    def test_cataloger_indexes_items(self):
+        cataloger = Cataloger(ontology_config={"RDF_BASE_URI": "http://exemplo.org/item/"},
+                              search_engine=self.search_engine)
+        cataloger.catalog_item({"id": "vaso", "title": "Vaso Grego", "description": "Cerâmica antiga."})
+        results = asyncio.run(self.search_engine.search_local("ceramica"))
+        self.assertEqual(results[0]["id"], "http://exemplo.org/item/vaso")
+
+
+class FakeSPARQLClient:
+    """Substitui a API Guará: o repositório "lento" demora mais do que o timeout da fonte."""
+
+    def list_repositories(self):
+        return [{"uri": {"value": "http://exemplo.org/repo#acervo"}},
+                {"uri": {"value": "http://exemplo.org/repo#lento"}}]
+
+    def list_objects(self, keyword, repo_config, limit=None, offset=0):
+        if "/lento/" in repo_config["repository_query_url"]:
+            time.sleep(0.5)
+        return [{"obj": {"value": "uri:14bis"}, "titulo": {"value": "14-bis"}},
+                {"obj": {"value": "uri:acervo:demoiselle"}, "titulo": {"value": "Demoiselle"}}]
+
+
+class TestFederatedSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.search_engine = SearchEngine(sparql_client=FakeSPARQLClient(), source_timeout=0.2, deadline=0.3)
+        self.search_engine.add_item("uri:14bis", "14-bis", "Alberto Santos-Dumont", "Avião pioneiro.")
+
+        async def web(query, limit):
+            return [{"id": "https://web/14bis", "title": "14 bis (avião)", "description": "Artigo na web."}]
+        self.search_engine.external_sources["web"] = web
+
+    def test_slow_source_is_left_out(self):
+        async def timed_search():
+            started = time.perf_counter()
+            found = await self.search_engine.search("14-bis", ["local", "repositories"])
+            return found, time.perf_counter() - started
+
+        found, elapsed = asyncio.run(timed_search())
+        self.assertLess(elapsed, 0.45)
+        self.assertEqual(found["sources"]["guara:lento"]["status"], "timeout")
+        self.assertEqual(found["sources"]["guara:acervo"]["status"], "ok")
+        # O mesmo item (por URI ou por título) de várias fontes aparece uma só vez.
+        self.assertEqual(found["results"][0]["id"], "uri:14bis")
+        self.assertEqual(found["results"][0]["sources"], ["local", "guara:acervo"])
+        self.assertEqual(len(found["results"]), 2)
+
+    def test_external_results_rank_after_the_collection(self):
+        found = asyncio.run(self.search_engine.search("demoiselle", ["web", "local", "guara:acervo"]))
+        self.assertEqual([item["reliable"] for item in found["results"]], [True, True, False])
+        self.assertEqual(found["results"][-1]["source"], "web")
+
+        found = asyncio.run(self.search_engine.search("14-bis", ["web", "nenhuma"], validate_reliability=False))
+        self.assertEqual(found["sources"]["nenhuma"]["status"], "error")
+        self.assertEqual(found["results"][0]["id"], "https://web/14bis")
+
+    def test_cursor_pagination_walks_every_result_once(self):
+        for i in range(25):
+            self.search_engine.add_item(f"uri:carta:{i:02d}", f"Carta {i}", "Santos-Dumont", "Carta manuscrita.")
+        seen, cursor = [], None
+        while True:
+            page = asyncio.run(self.search_engine.search("carta", ["local"], limit=10, cursor=cursor))
+            seen.extend(item["id"] for item in page["results"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+        first = asyncio.run(self.search_engine.search("carta", ["local"], limit=10))
+        self.assertEqual([item["id"] for item in first["results"]], seen[:10])
+
+        with self.assertRaises(ValueError):
+            asyncio.run(self.search_engine.search("avião", ["local"], cursor=first["next_cursor"]))
+        with self.assertRaises(ValueError):
+            asyncio.run(self.search_engine.search("carta", ["local"], cursor="lixo"))
+
+    def test_pages_stay_consistent_when_a_source_slows_down(self):
+        calls = []
+
+        async def flaky(query, limit):
+            # A primeira consulta responde logo; as seguintes já não chegam a tempo.
+            calls.append(limit)
+            if len(calls) > 1:
+                await asyncio.sleep(1)
+            return [{"id": f"https://web/carta/{i}", "title": f"Carta web {i}"} for i in range(limit)]
+
+        self.search_engine.external_sources["flaky"] = flaky
+        for i in range(15):
+            self.search_engine.add_item(f"uri:carta:{i:02d}", f"Carta {i}", "Santos-Dumont", "Carta manuscrita.")
+        self.search_engine.pagination_depth = 20
+
+        first = asyncio.run(self.search_engine.search("carta", ["local", "flaky"], limit=10))
+        seen, cursor = [item["id"] for item in first["results"]], first["next_cursor"]
+        while cursor:
+            page = asyncio.run(self.search_engine.search("carta", ["local", "flaky"], limit=10, cursor=cursor))
+            self.assertEqual(page["sources"]["flaky"]["status"], "ok")
+            seen.extend(item["id"] for item in page["results"])
+            cursor = page["next_cursor"]
+
+        self.assertEqual(len(seen), 35)
+        self.assertEqual(len(set(seen)), 35)
+        self.assertEqual(calls, [20])
+
+        # Sem a fotografia (expirada), a página seguinte volta às fontes e continua pela ordem total.
+        self.search_engine._snapshots.clear()
+        page = asyncio.run(self.search_engine.search("carta", ["local", "flaky"], limit=10, cursor=first["next_cursor"]))
+        self.assertEqual(page["sources"]["flaky"]["status"], "timeout")
+        self.assertFalse(set(item["id"] for item in page["results"]) & set(seen[:10]))
+
+    def test_tampered_cursor_is_rejected(self):
+        cursor = base64.urlsafe_b64encode(json.dumps({"q": "carta", "s": ["local"], "v": True, "f": {},
+                                                      "after": [True], "returned": 1}).encode()).decode()
+        with self.assertRaises(ValueError):
+            asyncio.run(self.search_engine.search("carta", ["local"], cursor=cursor))
+
+    def test_stream_emits_at_most_limit_results(self):
+        for i in range(15):
+            self.search_engine.add_item(f"uri:carta:{i:02d}", f"Carta {i}", "Santos-Dumont", "Carta manuscrita.")
+
+        async def collect():
+            return [event async for event in self.search_engine.search_stream("carta", ["local", "guara:lento"], limit=5)]
+
+        events = asyncio.run(collect())
+        self.assertEqual(len([event for event in events if event["type"] == "result"]), 5)
+        self.assertEqual(events[-1]["sources"]["guara:lento"]["status"], "skipped")
+
+    def test_stream_emits_each_source_as_it_answers(self):
+        self.search_engine.deadline = 1.0
+        self.search_engine.source_timeout = 1.0
+
+        async def collect():
+            started = time.perf_counter()
+            events = []
+            async for event in self.search_engine.search_stream("14-bis", ["guara:lento", "local"]):
+                events.append((time.perf_counter() - started, event))
+            return events
+
+        events = asyncio.run(collect())
+        first_at, first = events[0]
+        self.assertLess(first_at, 0.3)
+        self.assertEqual(first["result"]["source"], "local")
+        results = [event["result"]["id"] for _, event in events if event["type"] == "result"]
+        # O 14-bis do repositório lento já tinha saído pelo índice local.
+        self.assertEqual(results, ["uri:14bis", "uri:acervo:demoiselle"])
+        self.assertEqual(events[-1][1]["type"], "done")
+        self.assertEqual(events[-1][1]["sources"]["guara:lento"]["status"], "ok")
+
+    def test_stream_holds_external_results_until_the_collection_answers(self):
+        self.search_engine.deadline = 1.0
+        self.search_engine.source_timeout = 1.0
+
+        async def collect(validate_reliability):
+            events = self.search_engine.search_stream("demoiselle", ["web", "guara:lento"],
+                                                      validate_reliability=validate_reliability)
+            return [event["result"]["source"] async for event in events if event["type"] == "result"]
+
+        self.assertEqual(asyncio.run(collect(True)), ["guara:lento", "guara:lento", "web"])
+        self.assertEqual(asyncio.run(collect(False)), ["web", "guara:lento", "guara:lento"])
+
+    def test_wikidata_client(self):
+        def handler(request):
+            self.assertEqual(request.url.params["action"], "wbsearchentities")
+            return httpx.Response(200, json={"search": [{"id": "Q193286", "label": "14-bis",
+                                                         "concepturi": "http://www.wikidata.org/entity/Q193286",
+                                                         "description": "avião de Santos-Dumont"}]})
+
+        async def run():
+            client = WikidataClient(transport=httpx.MockTransport(handler))
+            try:
+                return await client.search("14-bis", 5)
+            finally:
+                await client.aclose()
+
+        self.assertEqual(asyncio.run(run()), [{"id": "http://www.wikidata.org/entity/Q193286", "title": "14-bis",
+                                               "author": "", "description": "avião de Santos-Dumont"}])
+
 
 if __name__ == '__main__':
     unittest.main()
-
@@ -5,6 +5,8 @@ import json
 import unittest
 from unittest.mock import patch, MagicMock
 
+import requests
+
 # Adicionar o diretório pai ao sys.path para importar os módulos do projeto
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -130,5 +132,103 @@ class TestSPARQLIntegration(unittest.TestCase):
         self.assertEqual(kwargs["resumo"], "Um manuscrito raro do século XVIII")
         self.assertEqual(kwargs["tipo_uri"], "http://guara.ueg.br/ontologias/v1/objetos#Documento")
 
+class TestListObjectsPagination(unittest.TestCase):
+    """Testes para a paginação de list_objects."""
+
+    @patch('storage.sparql_api_client.requests.post')
+    def test_pages_are_requested_and_trimmed(self, mock_post):
+        bindings = [{"obj": {"value": f"uri:{i}"}} for i in range(5)]
+        payloads = []
+
+        def post(url, json, headers, timeout):
+            payloads.append(json)
+            response = MagicMock()
+            # A API pode ignorar LIMIT/OFFSET e devolver tudo: a página é recortada no cliente.
+            response.json.return_value = {"results": {"bindings": bindings}}
+            return response
+
+        mock_post.side_effect = post
+        client = SPARQLAPIClient(api_base_url="http://localhost:8000")
+        repo_config = {"repository_query_url": "http://localhost:3030/acervo/query"}
+
+        page = client.list_objects("carta", repo_config, limit=2, offset=2)
+        self.assertEqual([b["obj"]["value"] for b in page], ["uri:2", "uri:3"])
+        self.assertEqual((payloads[0]["limit"], payloads[0]["offset"]), (2, 2))
+        self.assertEqual(len(client.list_objects("carta", repo_config)), 5)
+        self.assertNotIn("limit", payloads[-1])
+
+        # Sabendo que a API ignora a paginação, o resultado completo é pedido uma só vez.
+        payloads.clear()
+        everything = list(client.iter_objects("carta", repo_config, page_size=2))
+        self.assertEqual([b["obj"]["value"] for b in everything], [f"uri:{i}" for i in range(5)])
+        self.assertEqual(len(payloads), 1)
+        self.assertNotIn("limit", payloads[0])
+
+        payloads.clear()
+        everything = list(SPARQLAPIClient(api_base_url="http://localhost:8000").iter_objects("carta", repo_config, page_size=2))
+        self.assertEqual([b["obj"]["value"] for b in everything], [f"uri:{i}" for i in range(5)])
+        self.assertEqual([payload["offset"] for payload in payloads], [0])
+
+    @patch('storage.sparql_api_client.requests.post')
+    def test_iter_objects_raises_on_api_errors(self, mock_post):
+        bindings = [{"obj": {"value": f"uri:{i}"}} for i in range(5)]
+
+        def post(url, json, headers, timeout):
+            if json["offset"] > 0:
+                raise requests.exceptions.ConnectionError("Guará indisponível")
+            response = MagicMock()
+            response.json.return_value = {"results": {"bindings": bindings[:json["limit"]]}}
+            return response
+
+        mock_post.side_effect = post
+        client = SPARQLAPIClient(api_base_url="http://localhost:8000")
+        repo_config = {"repository_query_url": "http://localhost:3030/acervo/query"}
+        objects = client.iter_objects("carta", repo_config, page_size=2)
+        self.assertEqual([b["obj"]["value"] for b in (next(objects), next(objects))], ["uri:0", "uri:1"])
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            next(objects)
+        # list_objects continua a devolver [] em caso de erro.
+        self.assertEqual(client.list_objects("carta", repo_config, limit=2, offset=2), [])
+
+    @patch('storage.sparql_api_client.requests.post')
+    def test_short_unpaginated_result_is_not_repeated_at_later_offsets(self, mock_post):
+        bindings = [{"obj": {"value": f"uri:{i}"}} for i in range(3)]
+
+        def post(url, json, headers, timeout):
+            response = MagicMock()
+            # Resultado completo (3 itens), sem LIMIT/OFFSET, em todas as páginas.
+            response.json.return_value = {"results": {"bindings": bindings}}
+            return response
+
+        mock_post.side_effect = post
+        client = SPARQLAPIClient(api_base_url="http://localhost:8000")
+        repo_config = {"repository_query_url": "http://localhost:3030/acervo/query"}
+
+        self.assertEqual(client.list_objects("carta", repo_config, limit=3, offset=3), [])
+        self.assertIs(client.server_paginates, False)
+
+        everything = list(SPARQLAPIClient(api_base_url="http://localhost:8000").iter_objects("carta", repo_config, page_size=3))
+        self.assertEqual([b["obj"]["value"] for b in everything], ["uri:0", "uri:1", "uri:2"])
+
+    @patch('storage.sparql_api_client.requests.post')
+    def test_paginating_server_is_detected(self, mock_post):
+        bindings = [{"obj": {"value": f"uri:{i}"}} for i in range(5)]
+
+        def post(url, json, headers, timeout):
+            response = MagicMock()
+            response.json.return_value = {"results": {"bindings": bindings[json["offset"]:json["offset"] + json["limit"]]}}
+            return response
+
+        mock_post.side_effect = post
+        client = SPARQLAPIClient(api_base_url="http://localhost:8000")
+        repo_config = {"repository_query_url": "http://localhost:3030/acervo/query"}
+
+        everything = list(client.iter_objects("carta", repo_config, page_size=2))
+        self.assertEqual([b["obj"]["value"] for b in everything], [f"uri:{i}" for i in range(5)])
+        self.assertIs(client.server_paginates, True)
+        # iter_objects compara cada página com a primeira, que já tem: um pedido por página.
+        self.assertEqual(mock_post.call_count, 3)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,115 @@
+# Testes para a procura aproximada de títulos (TitleIndex).
+import os
+import sys
+import random
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+# Adicionar o diretório pai ao sys.path para importar os módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.persistence_service import PersistenceService
+from core.search_engine import SearchEngine
+from core.title_index import TitleIndex, bounded_levenshtein, normalize_title
+
+
+class RecordingSPARQLClient:
+    """Substitui a API Guará: nenhum item existe e cada criação devolve um URI novo."""
+
+    def __init__(self):
+        self.lookups = []
+        self.created = []
+
+    def list_objects(self, keyword, repo_config, limit=None, offset=0):
+        self.lookups.append(keyword)
+        return []
+
+    def create_dimensional_object(self, payload, repo_config):
+        self.created.append(payload["titulo"])
+        return {"object_uri": f"uri:{len(self.created)}"}
+
+
+class TestTitleIndex(unittest.TestCase):
+    """Testes para o TitleIndex."""
+
+    def test_noisy_titles_match(self):
+        index = TitleIndex(max_distance=2)
+        index.add("uri:6", "Dirigível Nº 6")
+        index.add("uri:14bis", "14-bis")
+        index.add("uri:demoiselle", "Demoiselle")
+
+        self.assertEqual(normalize_title("Dirigível Nº 6"), "dirigivel no 6")
+        self.assertEqual(index.lookup("Dirigivel N 6")[0], {"id": "uri:6", "title": "Dirigível Nº 6", "distance": 1})
+        self.assertEqual(index.lookup("dirijivel n. 6")[0]["id"], "uri:6")
+        self.assertEqual(index.lookup("14 bis")[0]["distance"], 0)
+        self.assertEqual(index.lookup("Demoisele")[0]["id"], "uri:demoiselle")
+        # Os números têm de coincidir: "15-bis" e "Dirigível Nº 7" seriam outros itens.
+        self.assertEqual(index.lookup("15-bis"), [])
+        self.assertEqual(index.lookup("Dirigivel N 7"), [])
+
+    def test_remove_and_compaction(self):
+        index = TitleIndex()
+        for i in range(10):
+            index.add(f"uri:{i}", f"Fotografia do hangar número {i}")
+        for i in range(8):
+            self.assertTrue(index.remove(f"uri:{i}"))
+        self.assertEqual(len(index), 2)
+        self.assertEqual([match["id"] for match in index.lookup("Fotografia do hangar numero 9")], ["uri:9"])
+        self.assertEqual(index.lookup("Fotografia do hangar numero 3"), [])
+
+    def test_bounded_levenshtein(self):
+        self.assertEqual(bounded_levenshtein("dirigivel", "dirijivel", 2), 1)
+        self.assertEqual(bounded_levenshtein("kitten", "sitting", 3), 3)
+        self.assertIsNone(bounded_levenshtein("kitten", "sitting", 2))
+
+    def test_lookup_among_many_titles(self):
+        rng = random.Random(3)
+        words = ["retrato", "carta", "mapa", "fotografia", "lisboa", "paris", "hangar", "motor", "avião", "diário"]
+        index = TitleIndex()
+        for i in range(50000):
+            index.add(f"uri:{i}", f"{' '.join(rng.sample(words, 3))} {i}")
+        index.add("uri:alvo", "Caderno de voo de Santos-Dumont")
+        self.assertEqual(index.lookup("Caderno de vôo de Santos Dumon")[0]["id"], "uri:alvo")
+
+    def test_search_engine_finds_misspelled_titles(self):
+        engine = SearchEngine()
+        engine.add_item("uri:6", "Dirigível Nº 6", "Alberto Santos-Dumont")
+        engine.add_item("uri:14bis", "14-bis", "Alberto Santos-Dumont")
+        results = asyncio.run(engine.search_local("Dirijivel N 6"))
+        self.assertEqual(results[0]["id"], "uri:6")
+
+    def _persist(self, sparql, titles):
+        service = PersistenceService(sparql)
+        items = [{"properties": {"rdfs:label": title}} for title in titles]
+
+        async def run():
+            service.start_worker()
+            await service.add_to_queue(items, {"repository_name": "acervo"}, "tarefa")
+            await service.queue.join()
+            service.worker_task.cancel()
+
+        with patch("core.persistence_service.ontology_config.TITLE_PROPERTY", "rdfs:label"), \
+                patch("core.persistence_service.asyncio.sleep", new=AsyncMock()):
+            asyncio.run(run())
+        return service.processing_status["tarefa"]["results"]
+
+    def test_persistence_detects_accent_and_case_duplicates_locally(self):
+        sparql = RecordingSPARQLClient()
+        results = self._persist(sparql, ["Dirigível Nº 6", "DIRIGIVEL Nº 6"])
+        self.assertEqual([result["status"] for result in results], ["created", "duplicate"])
+        self.assertEqual(results[1]["uri"], "uri:1")
+        self.assertEqual(sparql.lookups, ["Dirigível Nº 6"])
+
+    def test_persistence_creates_near_miss_titles(self):
+        sparql = RecordingSPARQLClient()
+        titles = ["Retrato de Ana", "Retrato de Eva", "Carta de Maria", "Carta de Mario",
+                  "Igreja de São Bento", "Igreja de São Beato"]
+        results = self._persist(sparql, titles)
+        self.assertEqual([result["status"] for result in results], ["created"] * 6)
+        self.assertEqual(sparql.created, titles)
+        # Os quase iguais são verificados na API Guará em vez de descartados.
+        self.assertEqual(sparql.lookups, titles)
+
+if __name__ == '__main__':
+    unittest.main()
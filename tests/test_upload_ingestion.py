@@ -0,0 +1,132 @@
+# Testes para a receção de ficheiros carregados (core/upload_ingestion.py).
+import io
+import os
+import sys
+import asyncio
+import hashlib
+import tempfile
+import zipfile
+import unittest
+from unittest.mock import patch
+
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+
+# Adicionar o diretório pai ao sys.path para importar os módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.upload_ingestion import UploadTooLargeError, ZipLimitError, extract_zip_documents, save_upload
+import main
+
+
+class TestSaveUpload(unittest.TestCase):
+    """Testes para o save_upload."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_content_addressed_upload_is_hashed_and_deduplicated(self):
+        content = b"%PDF-1.4 Dirigivel N. 6" * 1000
+        expected_hash = hashlib.sha256(content).hexdigest()
+
+        for _ in range(2):
+            upload = UploadFile(io.BytesIO(content), filename="scan.PDF")
+            filename, content_hash = asyncio.run(
+                save_upload(upload, self.tmp_dir.name, max_bytes=len(content), content_addressed=True, chunk_size=4096))
+
+        self.assertEqual(content_hash, expected_hash)
+        self.assertEqual(filename, f"{expected_hash}.pdf")
+        self.assertEqual(os.listdir(self.tmp_dir.name), [filename])
+        with open(os.path.join(self.tmp_dir.name, filename), "rb") as f:
+            self.assertEqual(f.read(), content)
+
+    def test_oversized_upload_is_rejected_without_leftovers(self):
+        # Sem tamanho declarado, o limite é verificado durante a escrita.
+        upload = UploadFile(io.BytesIO(b"x" * 10000), filename="grande.pdf")
+        with self.assertRaises(UploadTooLargeError):
+            asyncio.run(save_upload(upload, self.tmp_dir.name, max_bytes=5000, chunk_size=1024))
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+        declared = UploadFile(io.BytesIO(b"x" * 10000), filename="grande.pdf", size=10000)
+        with self.assertRaises(UploadTooLargeError):
+            asyncio.run(save_upload(declared, self.tmp_dir.name, max_bytes=5000))
+
+
+class TestExtractZipDocuments(unittest.TestCase):
+    """Testes para a descompactação de lotes em arquivo zip."""
+
+    def test_members_are_filtered_and_content_addressed(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            zip_path = os.path.join(tmp_dir, "caixa.zip")
+            with zipfile.ZipFile(zip_path, "w") as archive:
+                archive.writestr("caixa/carta.pdf", b"%PDF carta")
+                archive.writestr("caixa/copia.pdf", b"%PDF carta")
+                archive.writestr("caixa/grande.png", b"x" * 2000)
+                archive.writestr("notas.txt", b"notas")
+            destination = os.path.join(tmp_dir, "uploads")
+            os.makedirs(destination)
+
+            documents, rejected = extract_zip_documents(zip_path, destination, {"pdf", "png"},
+                                                        max_member_bytes=1000, max_members=10,
+                                                        max_total_bytes=10000, max_archive_members=10)
+
+            expected_id = hashlib.sha256(b"%PDF carta").hexdigest() + ".pdf"
+            self.assertEqual([d["file_id"] for d in documents], [expected_id, expected_id])
+            self.assertEqual(documents[0]["filename"], "carta.pdf")
+            self.assertEqual(sorted(r["filename"] for r in rejected), ["caixa/grande.png", "notas.txt"])
+            self.assertEqual(os.listdir(destination), [expected_id])
+
+    def test_archive_over_the_total_or_member_limits_is_rejected_whole(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            zip_path = os.path.join(tmp_dir, "bomba.zip")
+            with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr("antigo.pdf", b"%PDF antigo")
+                for i in range(3):
+                    archive.writestr(f"parte{i}.pdf", b"%PDF" + bytes([i]) * 400)
+            destination = os.path.join(tmp_dir, "uploads")
+            os.makedirs(destination)
+            # Um documento igual, já guardado por outro pedido, não é apagado com o lote recusado.
+            existing_id = hashlib.sha256(b"%PDF antigo").hexdigest() + ".pdf"
+            with open(os.path.join(destination, existing_id), "wb") as f:
+                f.write(b"%PDF antigo")
+
+            with self.assertRaisesRegex(ZipLimitError, "tamanho máximo descompactado"):
+                extract_zip_documents(zip_path, destination, {"pdf"}, max_member_bytes=1000, max_members=10,
+                                      max_total_bytes=1000, max_archive_members=10)
+            self.assertEqual(os.listdir(destination), [existing_id])
+
+            with self.assertRaisesRegex(ZipLimitError, "máximo de 3 membros"):
+                extract_zip_documents(zip_path, destination, {"pdf"}, max_member_bytes=1000, max_members=10,
+                                      max_total_bytes=10000, max_archive_members=3)
+
+
+
+class TestDocumentBatchUpload(unittest.TestCase):
+    """Testes para a rota de lotes de documentos."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_oversized_file_is_rejected_and_the_rest_of_the_batch_kept(self):
+        files = [("documents", ("pequeno.pdf", b"%PDF-1.4 curto", "application/pdf")),
+                 ("documents", ("grande.pdf", b"%PDF-1.4 " + b"x" * 100, "application/pdf"))]
+        with patch.object(main, "UPLOAD_FOLDER", self.tmp_dir.name), \
+                patch.object(main.settings, "UPLOAD_MAX_DOCUMENT_BYTES", 50), \
+                patch.object(main.document_job_service_instance, "submit_batch", return_value="lote") as mock_submit:
+            response = TestClient(main.app).post("/api/v1/documents/batches", files=files)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["total"], 1)
+        self.assertEqual([item["filename"] for item in response.json()["rejected"]], ["grande.pdf"])
+        accepted = mock_submit.call_args[0][0]
+        self.assertEqual([document["filename"] for document in accepted], ["pequeno.pdf"])
+        # Só o ficheiro aceite fica gravado, e é o que foi submetido.
+        self.assertEqual(os.listdir(self.tmp_dir.name), [accepted[0]["file_id"]])
+
+
+if __name__ == '__main__':
+    unittest.main()
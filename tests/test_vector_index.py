@@ -0,0 +1,163 @@
+# Testes para o índice vetorial local usado na recuperação do chatbot.
+import os
+import sys
+import asyncio
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+# Adicionar o diretório pai ao sys.path para importar os módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.chatbot_service import ChatbotService
+from core.vector_index import SemanticIndex, VectorIndex
+
+VOCABULARY = ["avião", "voou", "paris", "fotografia", "lisboa", "dirigível"]
+
+
+async def bag_of_words_embedder(texts):
+    """Substitui o modelo de embeddings: conta as palavras do vocabulário em cada texto."""
+    return [[text.lower().count(word) for word in VOCABULARY] for text in texts]
+
+
+def binding(uri, title, summary):
+    return {"obj": {"value": uri}, "titulo": {"value": title}, "resumo": {"value": summary}}
+
+
+class NoSPARQLClient:
+    def list_objects(self, query, repo_config):
+        raise AssertionError("A busca devia ter sido resolvida pelo índice local.")
+
+
+class TestVectorIndex(unittest.TestCase):
+    """Testes para o VectorIndex e o SemanticIndex."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_top_k_add_remove_and_reload(self):
+        index = VectorIndex(os.path.join(self.tmp.name, "acervo"))
+        rng = np.random.default_rng(7)
+        vectors = rng.normal(size=(600, 8))
+        index.add([(f"item-{i}", {"n": i}, vectors[i]) for i in range(600)])
+
+        results = index.search(vectors[42], k=3)
+        self.assertEqual(results[0][1], {"n": 42})
+        self.assertAlmostEqual(results[0][0], 1.0, places=5)
+        self.assertEqual(len(results), 3)
+
+        self.assertEqual(index.remove(["item-42", "inexistente"]), 1)
+        self.assertNotEqual(index.search(vectors[42], k=1)[0][1], {"n": 42})
+
+        reloaded = VectorIndex(os.path.join(self.tmp.name, "acervo"))
+        self.assertEqual(len(reloaded), 599)
+        self.assertEqual(reloaded.search(vectors[599], k=1)[0][1], {"n": 599})
+
+    def test_changes_are_appended_to_a_log_and_compacted(self):
+        directory = os.path.join(self.tmp.name, "acervo")
+        index = VectorIndex(directory)
+        index.add([("a", {"n": 1}, [1.0, 0.0]), ("b", {"n": 2}, [0.0, 1.0])])
+        index.add([("c", {"n": 3}, [1.0, 1.0])])
+        index.remove(["a"])
+        self.assertFalse(os.path.exists(os.path.join(directory, "meta.json")))
+        with open(os.path.join(directory, "meta.log.jsonl"), "a", encoding="utf-8") as f:
+            f.write('{"add": "d", "it')  # escrita interrompida
+
+        reloaded = VectorIndex(directory)
+        self.assertEqual(sorted(reloaded.ids), ["b", "c"])
+        self.assertEqual(reloaded.search([1.0, 1.0], k=1)[0][1], {"n": 3})
+        self.assertTrue(os.path.exists(os.path.join(directory, "meta.json")))
+        self.assertFalse(os.path.exists(os.path.join(directory, "meta.log.jsonl")))
+
+        with patch("core.vector_index.COMPACT_MIN_ENTRIES", 3):
+            for i in range(4):
+                reloaded.add([("x", {"i": i}, [-1.0, 0.0])])
+        self.assertEqual(reloaded._log_entries, 0)
+        self.assertEqual(VectorIndex(directory).search([-1.0, 0.0], k=1)[0][1], {"i": 3})
+
+    def test_dimension_mismatch_is_rejected(self):
+        index = VectorIndex(os.path.join(self.tmp.name, "acervo"))
+        index.add([("a", {}, [1.0, 0.0])])
+        with self.assertRaises(ValueError):
+            index.add([("b", {}, [1.0, 0.0, 0.0])])
+
+    def test_chatbot_retrieves_from_local_index(self):
+        semantic_index = SemanticIndex(self.tmp.name, bag_of_words_embedder, min_score=0.1)
+        chatbot = ChatbotService(sparql_client=NoSPARQLClient(), semantic_index=semantic_index)
+
+        async def run():
+            indexed = await semantic_index.backfill("acervo", iter([
+                binding("uri:14bis", "14-bis", "Avião que voou em Paris."),
+                binding("uri:foto", "Retrato", "Fotografia tirada em Lisboa."),
+            ]), batch_size=1)
+            return indexed, await chatbot._retrieve("Que avião voou em Paris?", "acervo")
+
+        indexed, results = asyncio.run(run())
+        self.assertEqual(indexed, 2)
+        self.assertEqual([item["obj"]["value"] for item in results], ["uri:14bis"])
+        self.assertEqual(semantic_index.stats()["searches"], 1)
+        self.assertTrue(SemanticIndex(self.tmp.name, bag_of_words_embedder).is_complete("acervo"))
+
+    def test_loading_and_search_run_off_the_event_loop(self):
+        asyncio.run(SemanticIndex(self.tmp.name, bag_of_words_embedder).add_items("acervo", [
+            ("uri:14bis", binding("uri:14bis", "14-bis", "Avião que voou em Paris.")),
+        ]))
+        semantic_index = SemanticIndex(self.tmp.name, bag_of_words_embedder)
+        threads = []
+
+        def record(method):
+            def wrapper(*args, **kwargs):
+                threads.append(threading.get_ident())
+                return method(*args, **kwargs)
+            return wrapper
+
+        async def run():
+            with patch.object(VectorIndex, "_load", record(VectorIndex._load)), \
+                    patch.object(VectorIndex, "search", record(VectorIndex.search)):
+                results = await semantic_index.search("acervo", "avião", k=1)
+            return results, threading.get_ident()
+
+        results, loop_thread = asyncio.run(run())
+        self.assertEqual(results[0]["obj"]["value"], "uri:14bis")
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(loop_thread, threads)
+
+    def test_failed_backfill_is_not_marked_complete(self):
+        semantic_index = SemanticIndex(self.tmp.name, bag_of_words_embedder)
+
+        def objects():
+            yield binding("uri:14bis", "14-bis", "Avião que voou em Paris.")
+            raise ConnectionError("Guará indisponível")
+
+        with self.assertRaises(ConnectionError):
+            asyncio.run(semantic_index.backfill("acervo", objects(), batch_size=1))
+        self.assertFalse(semantic_index.is_complete("acervo"))
+        self.assertEqual(len(asyncio.run(semantic_index.index_for("acervo"))), 1)
+
+    def test_incomplete_index_is_merged_with_guara_results(self):
+        class GuaraClient:
+            def list_objects(self, query, repo_config):
+                return [binding("uri:14bis", "14-bis", "Avião que voou em Paris."),
+                        binding("uri:demoiselle", "Demoiselle", "Avião antigo, nunca indexado.")]
+
+        semantic_index = SemanticIndex(self.tmp.name, bag_of_words_embedder, min_score=0.1)
+        chatbot = ChatbotService(sparql_client=GuaraClient(), semantic_index=semantic_index)
+
+        async def run():
+            await semantic_index.add_items("acervo", [
+                ("uri:14bis", binding("uri:14bis", "14-bis", "Avião que voou em Paris.")),
+            ])
+            return await chatbot._retrieve("Que avião voou em Paris?", "acervo")
+
+        results = asyncio.run(run())
+        self.assertFalse(semantic_index.is_complete("acervo"))
+        self.assertEqual([item["obj"]["value"] for item in results], ["uri:14bis", "uri:demoiselle"])
+        self.assertIn("score", results[0])
+
+
+if __name__ == '__main__':
+    unittest.main()